@@ -1,6 +1,9 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, send_file
+import functools
+import hashlib
 import os
 import logging
+import threading
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -8,6 +11,11 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
+# orjson for every jsonify() when it is installed
+from model.json_provider import install_json_provider
+if install_json_provider(app):
+    logger.info("Serializing JSON with orjson")
+
 # Use the new narrative story generator
 try:
     from model.narrative_story_generator import narrative_generator
@@ -37,8 +45,7 @@ except Exception as e:
 
 # Try to import and load enhanced story generator
 try:
-    sys.path.append(os.path.join(os.path.dirname(__file__), 'model'))
-    from enhanced_story_generator import enhanced_story_generator
+    from model.enhanced_story_generator import enhanced_story_generator
     STORY_GENERATOR = enhanced_story_generator
     logger.info("Enhanced story generator loaded successfully with CSV data!")
 except Exception as e:
@@ -48,6 +55,116 @@ except Exception as e:
     STORY_GENERATOR = story_generator
     logger.info("Using basic story generator")
 
+from model.comic_layout import story_cache, comic_paginator
+from model.comic_renderer import comic_renderer
+from model.hot_reload import CorpusReloader
+from model.single_flight import SingleFlight
+from model.admission import AdmissionController, Overloaded
+from model.story_generator import story_generator as template_story_generator
+from model.jobs import JobManager, JobQueueFull, generate_in_worker
+from model.http_cache import IMMUTABLE_MAX_AGE, ResponseCompressor, StaticFingerprints
+from model.execution import create_backend, load_object, object_spec
+from model.conditioning import GENRE_MAPPING, LENGTH_MAPPING
+from data.story_store import StoryExistsError, story_store
+
+# Generation runs inline until create_app() starts the configured backend
+generation_backend = create_backend('inline', STORY_GENERATOR)
+
+# Pick up corpus changes without a restart: on file change, SIGHUP or POST /admin/reload
+corpus_reloader = CorpusReloader([generator for generator in (STORY_GENERATOR,) if hasattr(generator, 'load_stories')],
+                                 watch_paths=[story_store.csv_path, story_store.wal_path])
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+# Concurrent identical /generate_story requests share one generation
+story_flight = SingleFlight()
+
+# Generations beyond the concurrency limit wait in a bounded queue; the rest are shed with 503,
+# or answered from the cheap template generator in degraded mode
+generate_admission = AdmissionController(
+    max_concurrency=int(os.environ.get('GENERATE_MAX_CONCURRENCY', 4)),
+    max_queue=int(os.environ.get('GENERATE_MAX_QUEUE', 16)),
+    max_wait_ms=float(os.environ.get('GENERATE_MAX_WAIT_MS', 1000))
+)
+DEGRADED_MODE = os.environ.get('GENERATE_DEGRADED_MODE', '').lower() in ('1', 'true', 'yes')
+
+# Exported with `python -m model.mapped_model`; every worker maps this one read-only file
+STORY_MODEL_WEIGHTS = os.environ.get('STORY_MODEL_WEIGHTS', 'model/trained_model/story_model.weights')
+_story_model = None
+_story_model_lock = threading.Lock()
+
+def get_story_model():
+    """The trained model, loaded on the first model-backed request rather than at import; None if not exported"""
+    global _story_model
+    if _story_model is None:
+        with _story_model_lock:
+            if _story_model is None and os.path.exists(STORY_MODEL_WEIGHTS):
+                from model.mapped_model import MappedStoryModel
+                _story_model = MappedStoryModel(STORY_MODEL_WEIGHTS)
+                logger.info(f"Mapped trained model weights from {STORY_MODEL_WEIGHTS}")
+    return _story_model
+
+def run_job_item(item):
+    """Generate one job item on a job worker thread"""
+    if item['engine'] == 'model':
+        generator = get_story_model()
+        if generator is None:
+            raise RuntimeError('No trained model is available on this server')
+    else:
+        generator = STORY_GENERATOR
+    return generator.generate_story(item['prompt'], item['genre'], item['length'])
+
+def finish_job_story(story):
+    story['story_id'] = story_cache.put(story)
+    return story
+
+# Process workers import STORY_GENERATOR from its own module rather than this one
+# (None for the fallback defined here, which workers could only reach by importing this module)
+WORKER_GENERATOR = os.environ.get('GENERATE_WORKER_GENERATOR') or \
+    (object_spec(STORY_GENERATOR) if type(STORY_GENERATOR).__module__ != __name__ else None)
+
+# Long and batch generations run as background jobs: POST /jobs, then poll GET /jobs/<id>
+JOB_EXECUTOR = os.environ.get('JOB_EXECUTOR', 'thread')
+if JOB_EXECUTOR == 'process' and not os.environ.get('JOB_TEMPLATE_GENERATOR', WORKER_GENERATOR):
+    logger.warning(f"{type(STORY_GENERATOR).__name__} cannot be loaded in worker processes; running jobs on threads")
+    JOB_EXECUTOR = 'thread'
+JOB_MAX_BATCH = int(os.environ.get('JOB_MAX_BATCH', 100))
+JOB_ENGINES = ('template', 'model')
+job_manager = JobManager(
+    run_job_item if JOB_EXECUTOR == 'thread' else
+    functools.partial(generate_in_worker, template_generator=os.environ.get('JOB_TEMPLATE_GENERATOR', WORKER_GENERATOR)),
+    workers=int(os.environ.get('JOB_WORKERS', 2)),
+    executor=JOB_EXECUTOR,
+    ttl=float(os.environ.get('JOB_TTL_SECONDS', 3600)),
+    max_pending=int(os.environ.get('JOB_MAX_PENDING', 1000)),
+    postprocess=finish_job_story
+)
+
+# url_for('static', ...) adds ?v=<content hash>, so those URLs can be cached forever
+static_fingerprints = StaticFingerprints(app.static_folder)
+response_compressor = ResponseCompressor()
+
+@app.url_defaults
+def fingerprint_static_url(endpoint, values):
+    if endpoint == 'static' and 'filename' in values and 'v' not in values:
+        fingerprint = static_fingerprints.get(values['filename'])
+        if fingerprint:
+            values['v'] = fingerprint
+
+@app.after_request
+def compress_and_cache(response):
+    """Compress text responses for clients that accept it; fingerprinted static files are immutable"""
+    if request.endpoint == 'static' and response.status_code in (200, 304) and request.args.get('v') and \
+            request.args['v'] == static_fingerprints.get(request.view_args['filename']):
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+        response.cache_control.no_cache = None
+    response = response_compressor.compress(response, request.accept_encodings)
+    if request.if_none_match and 'Content-Encoding' in response.headers and response.get_etag()[0]:
+        # Revalidate against the compressed representation's ETag
+        response.make_conditional(request)
+    return response
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -59,46 +176,303 @@ def generate_story():
         prompt = data.get('prompt', '').strip()
         genre = data.get('genre', 'fantasy')
         length = data.get('length', 'medium')
+        engine = data.get('engine', 'template')
         
-        logger.info(f"Generating story: prompt='{prompt}', genre={genre}, length={length}")
+        logger.info(f"Generating story: prompt='{prompt}', genre={genre}, length={length}, engine={engine}")
         
         if not prompt:
             return jsonify({'error': 'Please enter a story prompt'}), 400
         
-        # Generate story using the available generator
-        story = STORY_GENERATOR.generate_story(prompt, genre, length)
+        if engine == 'model':
+            # The model looks genre and length up in its conditioning ids; anything else is the client's mistake
+            for name, value, allowed in (('genre', genre, GENRE_MAPPING), ('length', length, LENGTH_MAPPING)):
+                if not isinstance(value, str) or value not in allowed:
+                    return jsonify({'error': f"Unknown {name} {value!r}; expected one of {', '.join(allowed)}"}), 400
+            generator = get_story_model()
+            if generator is None:
+                return jsonify({'error': 'No trained model is available on this server'}), 503
+        else:
+            # Generate story using the available generator, on the configured backend
+            generator = generation_backend
+        
+        def generate():
+            story = generate_admission.run(generator.generate_story, prompt, genre, length)
+            story['story_id'] = story_cache.put(story)
+            return story
+        
+        # Identical requests already being generated wait for that one and share its story
+        key = (' '.join(prompt.split()), genre, length, engine, str(data.get('seed')))
+        try:
+            story, shared = story_flight.do(key, generate)
+        except Overloaded as e:
+            if not DEGRADED_MODE:
+                logger.warning(f"Shedding story request: {e}")
+                response = jsonify({'error': 'The server is busy, please try again shortly'})
+                response.headers['Retry-After'] = str(e.retry_after)
+                return response, 503
+            generate_admission.record_degraded()
+            story = template_story_generator.generate_story(prompt, genre, length)
+            story['degraded'] = True
+            story['story_id'] = story_cache.put(story)
+            response = jsonify(story)
+            response.headers['X-Degraded'] = '1'
+            return response
         
-        logger.info(f"Story generated successfully: {story['title']}")
-        return jsonify(story)
+        logger.info(f"Story generated successfully: {story['title']}" + (" (coalesced)" if shared else ""))
+        response = jsonify(story)
+        response.headers['X-Coalesced'] = '1' if shared else '0'
+        return response
         
     except Exception as e:
         logger.error(f"Story generation error: {e}")
         return jsonify({'error': f'Story generation failed: {str(e)}'}), 500
 
+# Every genre in every length; one call holds a single admission slot for all of them
+VARIANTS_MAX = int(os.environ.get('GENERATE_VARIANTS_MAX', len(GENRE_MAPPING) * len(LENGTH_MAPPING)))
+
+def parse_choices(value, allowed, name):
+    """Validate an optional list of distinct allowed keys; returns (choices, error message), all keys when omitted"""
+    if value is None:
+        return list(allowed), None
+    if not isinstance(value, list) or not value:
+        return None, f'{name} must be a non-empty list'
+    unknown = [choice for choice in value if not isinstance(choice, str) or choice not in allowed]
+    if unknown:
+        return None, f"Unknown {name} {unknown}; expected any of {', '.join(allowed)}"
+    if len(set(value)) != len(value):
+        return None, f'{name} must not repeat entries'
+    return value, None
+
+@app.route('/generate_variants', methods=['POST'])
+def generate_variants():
+    """Render one prompt in every genre and length (or a chosen subset) in a single call"""
+    try:
+        data = request.get_json(silent=True) or {}
+        prompt = data.get('prompt', '')
+        if not isinstance(prompt, str) or not prompt.strip():
+            return jsonify({'error': 'Please enter a story prompt'}), 400
+        prompt = prompt.strip()
+        genres, error = parse_choices(data.get('genres'), GENRE_MAPPING, 'genres')
+        if error:
+            return jsonify({'error': error}), 400
+        lengths, error = parse_choices(data.get('lengths'), LENGTH_MAPPING, 'lengths')
+        if error:
+            return jsonify({'error': error}), 400
+        if len(genres) * len(lengths) > VARIANTS_MAX:
+            return jsonify({'error': f'At most {VARIANTS_MAX} variants can be generated in one call'}), 400
+
+        logger.info(f"Generating variants: prompt='{prompt}', genres={genres}, lengths={lengths}")
+
+        try:
+            # One backend call for the whole set, so a process worker shares retrieval across the variants
+            variants = generate_admission.run(generation_backend.generate_variants, prompt, genres, lengths)
+        except Overloaded as e:
+            logger.warning(f"Shedding variants request: {e}")
+            response = jsonify({'error': 'The server is busy, please try again shortly'})
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response, 503
+        for story in variants:
+            story['story_id'] = story_cache.put(story)
+
+        return jsonify({'prompt': prompt, 'variants': variants})
+
+    except Exception as e:
+        logger.error(f"Variant generation error: {e}")
+        return jsonify({'error': f'Variant generation failed: {str(e)}'}), 500
+
+@app.route('/story/<story_id>/page/<int:page_number>')
+def get_story_page(story_id, page_number):
+    """Lay out one comic page of a previously generated story"""
+    if story_cache.get(story_id) is None:
+        return jsonify({'error': 'Story not found or expired, please generate it again'}), 404
+
+    page = comic_paginator.get_page(story_id, page_number)
+    if page is None:
+        return jsonify({'error': f'Page {page_number} does not exist for this story'}), 404
+
+    return jsonify(page)
+
+@app.route('/story/<story_id>/page/<int:page_number>.png')
+def get_story_page_image(story_id, page_number):
+    """Render one comic page to PNG; repeat views are served straight from disk"""
+    page = comic_paginator.get_page(story_id, page_number)
+    if page is None:
+        return jsonify({'error': 'Story or page not found'}), 404
+
+    try:
+        try:
+            response = send_file(os.path.abspath(comic_renderer.render_page(page)), mimetype='image/png', conditional=True)
+        except FileNotFoundError:
+            # Another worker evicted the file between rendering and sending; draw it once more
+            response = send_file(os.path.abspath(comic_renderer.render_page(page)), mimetype='image/png', conditional=True)
+    except Exception as e:
+        logger.error(f"Page rendering error: {e}")
+        return jsonify({'error': f'Page rendering failed: {str(e)}'}), 500
+
+    response.cache_control.public = True
+    response.cache_control.max_age = 86400
+    return response
+
+EXAMPLE_PROMPTS = [
+    {"prompt": "A time traveler who accidentally changes a minor historical event", "genre": "sci-fi"},
+    {"prompt": "A detective who can speak to ghosts", "genre": "mystery"},
+    {"prompt": "A world where dreams become reality", "genre": "fantasy"},
+    {"prompt": "A chef who discovers magical ingredients", "genre": "fantasy"},
+    {"prompt": "A robot who falls in love with a human", "genre": "sci-fi"},
+    {"prompt": "A librarian who finds a book that writes itself", "genre": "mystery"},
+    {"prompt": "An explorer who finds a map of possibilities", "genre": "adventure"},
+    {"prompt": "A reflection that develops its own consciousness", "genre": "horror"}
+]
+# Serialized and hashed once; the list only changes with a deploy
+_example_prompts_body = app.json.dumps(EXAMPLE_PROMPTS).encode('utf-8')
+_example_prompts_etag = hashlib.sha1(_example_prompts_body).hexdigest()
+
 @app.route('/example_prompts')
 def get_example_prompts():
-    examples = [
-        {"prompt": "A time traveler who accidentally changes a minor historical event", "genre": "sci-fi"},
-        {"prompt": "A detective who can speak to ghosts", "genre": "mystery"},
-        {"prompt": "A world where dreams become reality", "genre": "fantasy"},
-        {"prompt": "A chef who discovers magical ingredients", "genre": "fantasy"},
-        {"prompt": "A robot who falls in love with a human", "genre": "sci-fi"},
-        {"prompt": "A librarian who finds a book that writes itself", "genre": "mystery"},
-        {"prompt": "An explorer who finds a map of possibilities", "genre": "adventure"},
-        {"prompt": "A reflection that develops its own consciousness", "genre": "horror"}
-    ]
-    return jsonify(examples)
+    """The prompts rarely change, so browsers cache them and revalidate with If-None-Match"""
+    response = app.response_class(_example_prompts_body, mimetype='application/json')
+    response.set_etag(_example_prompts_etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = 3600
+    if request.if_none_match:
+        response.make_conditional(request)
+    return response
 
 @app.route('/add_story', methods=['POST'])
 def add_story_to_csv():
-    """Endpoint to add new stories to CSV"""
+    """Endpoint to add new stories to CSV; replacing an existing id needs the admin token"""
     try:
         data = request.get_json()
-        # Implementation for adding stories to CSV
-        return jsonify({'message': 'Story added successfully'})
+        # Without ADMIN_TOKEN set, nobody may overwrite stories
+        is_admin = bool(ADMIN_TOKEN) and request.headers.get('X-Admin-Token') == ADMIN_TOKEN
+        story = story_store.put_story(data or {}, replace=is_admin)
+        logger.info(f"Story {story['id']} added to the corpus log")
+        return jsonify({'message': 'Story added successfully', 'story': story}), 201
+    except StoryExistsError as e:
+        return jsonify({'error': f'{e}; replacing a story requires the X-Admin-Token header'}), 409
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def parse_job_item(item):
+    """Validate one job request before it is queued; returns (item with defaults filled in, error message)"""
+    if not isinstance(item, dict):
+        return None, 'must be an object'
+    prompt = item.get('prompt', '')
+    if not isinstance(prompt, str) or not prompt.strip():
+        return None, 'has no story prompt'
+    parsed = {'prompt': prompt.strip()}
+    for name, default, allowed in (('genre', 'fantasy', GENRE_MAPPING), ('length', 'medium', LENGTH_MAPPING),
+                                   ('engine', 'template', JOB_ENGINES)):
+        value = item.get(name, default)
+        if not isinstance(value, str) or value not in allowed:
+            return None, f"unknown {name} {value!r}; expected one of {', '.join(allowed)}"
+        parsed[name] = value
+    return parsed, None
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Queue one story ({prompt, genre, length, engine}) or a batch ({"requests": [...]}) and return its job id"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'The body must be a JSON object'}), 400
+    batch = data['requests'] if 'requests' in data else [data]
+    if not isinstance(batch, list) or not batch:
+        return jsonify({'error': 'requests must be a non-empty list'}), 400
+    if len(batch) > JOB_MAX_BATCH:
+        return jsonify({'error': f'A job can hold at most {JOB_MAX_BATCH} requests'}), 400
+    
+    items = []
+    for index, item in enumerate(batch):
+        item, error = parse_job_item(item)
+        if error:
+            return jsonify({'error': f'Request {index}: {error}'}), 400
+        items.append(item)
+    
+    try:
+        job_id = job_manager.submit(items)
+    except JobQueueFull as e:
+        logger.warning(f"Rejecting job: {e}")
+        response = jsonify({'error': 'Too many jobs are waiting, please try again shortly'})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    
+    logger.info(f"Queued job {job_id} with {len(items)} request(s)")
+    response = jsonify({'id': job_id, 'status': 'queued', 'total': len(items), 'status_url': f'/jobs/{job_id}'})
+    response.headers['Location'] = f'/jobs/{job_id}'
+    return response, 202
+
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    """Status of a job, with every result finished so far; results are null until their story is ready"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found or expired'}), 404
+    return jsonify(job)
+
+@app.route('/metrics')
+def metrics():
+    """Serving counters since start-up"""
+    return jsonify({'generate_story': story_flight.stats(), 'admission': generate_admission.stats(),
+                    'generation': generation_backend.stats(), 'jobs': job_manager.stats(),
+                    'compression': response_compressor.stats()})
+
+@app.route('/admin/reload', methods=['GET', 'POST'])
+def reload_corpus():
+    """POST reloads the corpus and indexes in the background (?wait=1 to block for the report); GET shows the last report"""
+    # Fails closed: without ADMIN_TOKEN set, nobody may trigger or inspect reloads
+    if not ADMIN_TOKEN or request.headers.get('X-Admin-Token') != ADMIN_TOKEN:
+        return jsonify({'error': 'Forbidden'}), 403
+    if request.method == 'GET':
+        return jsonify({'reloads': corpus_reloader.reloads, 'last_report': corpus_reloader.last_report})
+    if not corpus_reloader.targets:
+        return jsonify({'error': 'The active story generator has no corpus to reload'}), 409
+    
+    if request.args.get('wait'):
+        report = corpus_reloader.request_reload('admin', wait=True, timeout=float(request.args.get('timeout', 60)))
+        return jsonify(report)
+    corpus_reloader.request_reload('admin')
+    return jsonify({'message': 'Reload started'}), 202
+
+_started = False
+
+def create_app():
+    """Start the background services and return the app; serve `app:create_app()`, once per server process
+
+    Importing this module starts nothing, so spawned pool workers and scripts
+    that only need the routes do not run the compactor, reload watcher or pools.
+    """
+    global _started, generation_backend
+    if _started:
+        return app
+    _started = True
+
+    # Fold appended stories into the base CSV in the background; safe with several workers running it
+    story_store.start_compactor(interval=float(os.environ.get('STORY_COMPACT_INTERVAL', 30)))
+
+    # Where template generation runs: 'inline' on the web thread, a 'thread' pool, or a 'process' pool of
+    # warm workers that each load the same generator, so CPU-bound retrieval is not limited by one GIL
+    backend = os.environ.get('GENERATE_BACKEND', 'inline')
+    if backend == 'process' and WORKER_GENERATOR is None:
+        logger.warning(f"{type(STORY_GENERATOR).__name__} cannot be loaded in worker processes; generating inline")
+        backend = 'inline'
+    generation_backend = create_backend(
+        backend, STORY_GENERATOR,
+        factory=load_object,
+        factory_args=(WORKER_GENERATOR,),
+        workers=int(os.environ.get('GENERATE_WORKERS', 0)) or None
+    )
+    logger.info(f"Generating stories on the {generation_backend.name} backend with {generation_backend.workers} worker(s)"
+                + (f" running {WORKER_GENERATOR}" if generation_backend.name == 'process' else ""))
+    if hasattr(generation_backend, 'load_stories'):
+        corpus_reloader.targets.append(generation_backend)
+
+    if corpus_reloader.targets:
+        corpus_reloader.install_signal_handler()
+        corpus_reloader.start_watching(interval=float(os.environ.get('STORY_RELOAD_INTERVAL', 2)))
+    return app
+
 if __name__ == '__main__':
     # Ensure directories exist
     os.makedirs('data', exist_ok=True)
@@ -106,4 +480,7 @@ if __name__ == '__main__':
     
     logger.info("Starting BrainROT Comics with Enhanced Story Generator")
     logger.info("Available on: http://localhost:5000")
+    # In debug mode the reloader's parent process only watches files; the services belong in the serving child
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        create_app()
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
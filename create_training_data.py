@@ -1,30 +1,38 @@
-import json
+import argparse
 import os
 import sys
 
 # Add the current directory to Python path so we can import our modules
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from data.synthetic_data_generator import SyntheticDataGenerator
+from data.jsonl_io import DEFAULT_DATASET_PATH, write_jsonl
+from data.synthetic_data_generator import DEFAULT_SHARD_SIZE, SyntheticDataGenerator, generate_sharded
 
-def create_training_data():
+def create_training_data(num_samples=500, seed=None, output_path=DEFAULT_DATASET_PATH):
+    """Stream samples straight to JSONL (gzip when output_path ends in .gz); memory does not grow with num_samples"""
     print("Generating synthetic training data...")
-    generator = SyntheticDataGenerator()
+    generator = SyntheticDataGenerator(seed=seed)
     
-    # Generate a smaller dataset for demonstration
-    dataset = generator.generate_dataset(500)
+    count = write_jsonl(output_path, generator.iter_samples(num_samples))
     
-    # Ensure data directory exists
-    if not os.path.exists('data'):
-        os.makedirs('data')
-    
-    # Save the dataset
-    with open('data/training_data.json', 'w') as f:
-        json.dump(dataset, f, indent=2)
-    
-    print(f"Training data generated with {len(dataset)} samples")
-    print(f"Saved to: data/training_data.json")
-    return dataset
+    print(f"Training data generated with {count} samples")
+    print(f"Saved to: {output_path}")
+    return count
 
 if __name__ == "__main__":
-    create_training_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate synthetic training stories")
+    parser.add_argument('--num-samples', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--output', default=DEFAULT_DATASET_PATH, help="JSONL file; a .gz suffix compresses it")
+    parser.add_argument('--shard-dir', default=None,
+                        help="generate in parallel as JSONL shards plus manifest.json in this directory")
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE)
+    parser.add_argument('--compress', action='store_true', help="gzip each shard")
+    parser.add_argument('--workers', type=int, default=None, help="defaults to one per core")
+    args = parser.parse_args()
+    
+    if args.shard_dir:
+        generate_sharded(args.num_samples, args.shard_dir, seed=args.seed or 0, shard_size=args.shard_size,
+                         workers=args.workers, compress=args.compress)
+    else:
+        create_training_data(args.num_samples, args.seed, args.output)
@@ -0,0 +1 @@
+# This file makes the data directory a Python package
@@ -1,6 +1,11 @@
-import pandas as pd
 import random
 
+try:
+    from data.story_store import story_store
+except ImportError:
+    # Running as a script from inside data/
+    from story_store import story_store
+
 def expand_dataset():
     # Sample additional stories to add to your CSV
     additional_stories = [
@@ -25,19 +30,10 @@ def expand_dataset():
     # Add more stories as needed...
     
     try:
-        # Load existing CSV or create new
-        try:
-            df = pd.read_csv('data/stories_dataset.csv')
-        except FileNotFoundError:
-            df = pd.DataFrame()
-            
-        # Add new stories
-        new_df = pd.DataFrame(additional_stories)
-        expanded_df = pd.concat([df, new_df], ignore_index=True)
-        
-        # Save expanded dataset
-        expanded_df.to_csv('data/stories_dataset.csv', index=False)
-        print(f"Dataset expanded! Total stories: {len(expanded_df)}")
+        # Appended to the corpus write-ahead log: safe alongside other writers and
+        # the running app, and the cost does not grow with the corpus
+        added = story_store.put_stories(additional_stories)
+        print(f"Dataset expanded! Added {len(added)} stories, total stories: {len(story_store.dataframe())}")
         
     except Exception as e:
         print(f"Error expanding dataset: {e}")
@@ -0,0 +1,141 @@
+import gzip
+import hashlib
+import io
+import json
+import os
+
+DEFAULT_DATASET_PATH = 'data/training_data.jsonl'
+
+
+def open_text(path, mode='r', compressed=None, compresslevel=6):
+    """Open a UTF-8 text file, gzip-compressed when the path ends in .gz (or `compressed` says so)
+
+    Compressed output is written with a zero timestamp, so identical records give identical bytes.
+    """
+    if compressed is None:
+        compressed = path.endswith('.gz')
+    if not compressed:
+        return open(path, mode, encoding='utf-8')
+    if mode == 'r':
+        return gzip.open(path, 'rt', encoding='utf-8')
+    raw = open(path, mode + 'b')
+    stream = gzip.GzipFile(filename='', mode=mode + 'b', fileobj=raw, compresslevel=compresslevel, mtime=0)
+    # GzipFile only closes files it opened itself
+    stream.myfileobj = raw
+    return io.TextIOWrapper(stream, encoding='utf-8')
+
+
+class JsonlWriter:
+    """Stream records to a JSONL file, one compact line per record, without holding them
+
+    Lines go to a temporary file that is renamed into place on close, so readers
+    never see a partial dataset. `sha256` covers the uncompressed lines.
+    """
+
+    def __init__(self, path, compresslevel=6):
+        self.path = path
+        self.count = 0
+        self._digest = hashlib.sha256()
+        self._staging_path = path + '.tmp'
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open_text(self._staging_path, 'w', compressed=path.endswith('.gz'), compresslevel=compresslevel)
+
+    def write(self, record):
+        self.write_line(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+
+    def write_line(self, line):
+        """Write one already-serialized record, newline included"""
+        self._digest.update(line.encode('utf-8'))
+        self._file.write(line)
+        self.count += 1
+
+    def write_all(self, records):
+        for record in records:
+            self.write(record)
+        return self.count
+
+    @property
+    def sha256(self):
+        return self._digest.hexdigest()
+
+    def close(self):
+        self._file.close()
+        os.replace(self._staging_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+            os.remove(self._staging_path)
+
+
+def write_jsonl(path, records, compresslevel=6):
+    """Write any iterable of records; returns how many were written"""
+    with JsonlWriter(path, compresslevel) as writer:
+        return writer.write_all(records)
+
+
+def write_manifest(directory, manifest):
+    """Write a shard directory's manifest.json last and atomically, once every shard it lists exists"""
+    path = os.path.join(directory, 'manifest.json')
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def iter_records(path, chunk_size=1 << 16):
+    """Yield story dicts one at a time from a dataset on disk
+
+    Accepts JSONL (read line by line), a top-level JSON array (decoded object by
+    object from a sliding text buffer), either of them gzip-compressed, or a
+    shard manifest.json (or its directory), whose shards are read in order.
+    Nothing is ever fully loaded.
+    """
+    if os.path.isdir(path):
+        path = os.path.join(path, 'manifest.json')
+    if os.path.basename(path) == 'manifest.json':
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+        for shard in manifest['shards']:
+            yield from iter_records(os.path.join(os.path.dirname(path), shard['path']), chunk_size)
+        return
+
+    with open_text(path) as f:
+        if path.endswith(('.jsonl', '.jsonl.gz')):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+
+        decoder = json.JSONDecoder()
+        buffer = f.read(chunk_size).lstrip()
+        if not buffer.startswith('['):
+            raise ValueError(f"{path} is neither JSONL nor a JSON array")
+        position = 1
+        while True:
+            # Skip whitespace and the commas between records
+            while position < len(buffer) and (buffer[position].isspace() or buffer[position] == ','):
+                position += 1
+            if position < len(buffer) and buffer[position] == ']':
+                return
+            try:
+                record, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # The next record runs past the end of the buffer
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    if buffer[position:].strip():
+                        raise
+                    return
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+            yield record
+            position = end
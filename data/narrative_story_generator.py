@@ -1,18 +1,25 @@
 import pandas as pd
 import random
-import os
+
+try:
+    from data.story_store import StoryStore
+except ImportError:
+    # Running as a script from inside data/
+    from story_store import StoryStore
 
 class NarrativeStoryGenerator:
     def __init__(self, csv_path='data/stories_dataset.csv'):
         self.csv_path = csv_path
+        # Base CSV plus any stories added through the write-ahead log
+        self.store = StoryStore(csv_path)
         self.stories_df = None
         self.load_stories()
         
     def load_stories(self):
         """Load stories from CSV"""
-        if os.path.exists(self.csv_path):
+        if self.store.exists():
             try:
-                self.stories_df = pd.read_csv(self.csv_path)
+                self.stories_df = self.store.dataframe()
                 print(f"✅ Loaded {len(self.stories_df)} stories from CSV")
             except Exception as e:
                 print(f"❌ Error loading CSV: {e}")
@@ -0,0 +1,174 @@
+import argparse
+import glob
+import hashlib
+import json
+import math
+import os
+import random
+import shutil
+import tempfile
+from datetime import datetime
+
+try:
+    from data.jsonl_io import JsonlWriter, iter_records, write_manifest
+except ImportError:
+    # Running as a script from inside data/
+    from jsonl_io import JsonlWriter, iter_records, write_manifest
+
+SPLITS = ('train', 'validation', 'test')
+DEFAULT_SPLIT_DIR = 'data/splits'
+DEFAULT_SHARD_SIZE = 100000
+# Upper bound on buckets per split, which keeps the open temp files under the usual fd limit
+MAX_BUCKETS = 256
+
+
+def _estimate_bytes(path):
+    """Rough uncompressed size of a dataset, used only to size the buckets"""
+    if os.path.isdir(path):
+        path = os.path.join(path, 'manifest.json')
+    if os.path.basename(path) == 'manifest.json':
+        with open(path, 'r') as f:
+            shards = json.load(f)['shards']
+        return sum(_estimate_bytes(os.path.join(os.path.dirname(path), shard['path'])) for shard in shards)
+    # JSON text typically compresses about 10x
+    return os.path.getsize(path) * (10 if path.endswith('.gz') else 1)
+
+
+def assign_split(line, fractions):
+    """Split of a serialized record, from a hash of its content alone
+
+    The assignment does not depend on the shuffle seed or on where the record
+    sits in the input, so the test set stays fixed across reshuffles and
+    regenerated inputs, and duplicate records never straddle two splits.
+    """
+    point = int.from_bytes(hashlib.blake2b(line.encode('utf-8'), digest_size=8).digest(), 'big') / 2 ** 64
+    for split, cumulative in zip(SPLITS, fractions):
+        if point < cumulative:
+            return split
+    return SPLITS[-1]
+
+
+def shuffle_split(input_path, output_dir=DEFAULT_SPLIT_DIR, validation_fraction=0.1, test_fraction=0.1, seed=0,
+                  shard_size=DEFAULT_SHARD_SIZE, bucket_mb=64, compress=False, tmp_dir=None):
+    """Shuffle a dataset of any size on disk and split it into train/validation/test shard directories
+
+    Pass 1 streams the input once, sending each record to its split and to a
+    random bucket file (by a seeded hash). Pass 2 loads one bucket at a time,
+    shuffles it in memory and appends it to the split's shards. Peak memory is
+    about one bucket, `bucket_mb`, whatever the size of the input. Each split is
+    written as <output_dir>/<split>/ with JSONL shards and a manifest.json,
+    which iter_records and the training entry points read directly.
+    """
+    if not 0 <= validation_fraction + test_fraction < 1:
+        raise ValueError("validation_fraction + test_fraction must be in [0, 1)")
+    train_fraction = 1 - validation_fraction - test_fraction
+    fractions = (train_fraction, train_fraction + validation_fraction, 1.0)
+    num_buckets = min(MAX_BUCKETS, max(1, math.ceil(_estimate_bytes(input_path) / (bucket_mb * 1024 * 1024))))
+    bucket_key = hashlib.sha256(f'shuffle-{seed}'.encode('utf-8')).digest()[:16]
+
+    started = datetime.now()
+    os.makedirs(output_dir, exist_ok=True)
+    work_dir = tempfile.mkdtemp(prefix='shuffle-', dir=tmp_dir or output_dir)
+    try:
+        buckets = {split: [open(os.path.join(work_dir, f'{split}-{index:03d}.jsonl'), 'w', encoding='utf-8')
+                           for index in range(num_buckets)] for split in SPLITS}
+        try:
+            for record in iter_records(input_path):
+                line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+                digest = hashlib.blake2b(line.encode('utf-8'), digest_size=8, key=bucket_key).digest()
+                buckets[assign_split(line, fractions)][int.from_bytes(digest, 'big') % num_buckets].write(line)
+        finally:
+            for files in buckets.values():
+                for f in files:
+                    f.close()
+
+        counts = {}
+        for split in SPLITS:
+            bucket_paths = [os.path.join(work_dir, f'{split}-{index:03d}.jsonl') for index in range(num_buckets)]
+            counts[split] = _write_split(bucket_paths, os.path.join(output_dir, split), split, seed, shard_size,
+                                         compress, started, input_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    summary = {
+        'source': input_path,
+        'seed': seed,
+        'fractions': dict(zip(SPLITS, (train_fraction, validation_fraction, test_fraction))),
+        'counts': counts,
+        'buckets': num_buckets,
+        'created': started.isoformat(timespec='seconds')
+    }
+    with open(os.path.join(output_dir, 'splits.json'), 'w') as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"Shuffled {sum(counts.values())} records from {input_path} into {output_dir}: "
+          + ', '.join(f"{split} {count}" for split, count in counts.items()))
+    return summary
+
+
+def _write_split(bucket_paths, split_dir, split, seed, shard_size, compress, started, source):
+    """Shuffle each bucket in memory and stream the buckets, in order, into fixed-size shards"""
+    os.makedirs(split_dir, exist_ok=True)
+    # Drop the old manifest first, so a reader never sees it list shards that are being replaced
+    for stale in glob.glob(os.path.join(split_dir, 'manifest.json')) + glob.glob(os.path.join(split_dir, 'shard-*.jsonl*')):
+        os.remove(stale)
+
+    shards = []
+    writer = None
+    for index, bucket_path in enumerate(bucket_paths):
+        with open(bucket_path, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+        os.remove(bucket_path)
+        random.Random(f'{seed}-{split}-{index}').shuffle(lines)
+        for line in lines:
+            if writer is None:
+                path = os.path.join(split_dir, f"shard-{len(shards):05d}.jsonl{'.gz' if compress else ''}")
+                writer = JsonlWriter(path)
+            writer.write_line(line)
+            if writer.count == shard_size:
+                shards.append(_close_shard(writer))
+                writer = None
+    if writer is not None:
+        shards.append(_close_shard(writer))
+
+    write_manifest(split_dir, {
+        'num_samples': sum(shard['samples'] for shard in shards),
+        'seed': seed,
+        'shard_size': shard_size,
+        'format': 'jsonl.gz' if compress else 'jsonl',
+        'split': split,
+        'source': source,
+        'created': started.isoformat(timespec='seconds'),
+        'shards': shards
+    })
+    return sum(shard['samples'] for shard in shards)
+
+
+def _close_shard(writer):
+    writer.close()
+    return {'path': os.path.basename(writer.path), 'samples': writer.count,
+            'bytes': os.path.getsize(writer.path), 'sha256': writer.sha256}
+
+
+def split_paths(split_dir):
+    """{'train': ..., 'validation': ..., 'test': ...} for a directory written by shuffle_split, or None"""
+    if not os.path.isfile(os.path.join(split_dir, 'splits.json')):
+        return None
+    return {split: os.path.join(split_dir, split) for split in SPLITS}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Disk-backed shuffle and train/validation/test split of a JSONL dataset")
+    parser.add_argument('input', help="JSONL (optionally .gz) file, JSON array, or shard directory")
+    parser.add_argument('--output-dir', default=DEFAULT_SPLIT_DIR)
+    parser.add_argument('--validation-fraction', type=float, default=0.1)
+    parser.add_argument('--test-fraction', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=0, help="shuffle order; split membership depends only on content")
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE)
+    parser.add_argument('--bucket-mb', type=int, default=64, help="approximate memory used to shuffle one bucket")
+    parser.add_argument('--compress', action='store_true', help="gzip the output shards")
+    parser.add_argument('--tmp-dir', default=None, help="where bucket files go; defaults to inside --output-dir")
+    args = parser.parse_args()
+
+    shuffle_split(args.input, args.output_dir, args.validation_fraction, args.test_fraction, args.seed,
+                  args.shard_size, args.bucket_mb, args.compress, args.tmp_dir)
@@ -0,0 +1,296 @@
+import fcntl
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import pandas as pd
+
+COLUMNS = ['id', 'genre', 'title', 'prompt', 'content', 'length', 'rating']
+REQUIRED_FIELDS = ('genre', 'title', 'prompt', 'content')
+DEFAULT_CSV_PATH = 'data/stories_dataset.csv'
+# Compact once the log holds this many entries
+DEFAULT_COMPACT_THRESHOLD = 1000
+
+
+def _fsync_directory(path):
+    """Make a rename inside `path` durable"""
+    fd = os.open(path or '.', os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def coerce_story_id(value):
+    """A story id as an int; ids arrive from JSON and CSV as ints, integral floats or digit strings"""
+    if isinstance(value, bool):
+        raise ValueError(f"Story id must be an integer, got {value!r}")
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    raise ValueError(f"Story id must be an integer, got {value!r}")
+
+
+class StoryExistsError(Exception):
+    """Raised by put_stories(replace=False) for an id that is already in the corpus"""
+
+
+def _file_identity(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class StoryStore:
+    """The story corpus as a base CSV plus a write-ahead log of added, edited and deleted stories
+
+    Writers append one fsync'd JSON line per change to <csv>.wal under an
+    exclusive flock on <csv>.lock, so a write costs O(record) and any number of
+    processes can ingest at once. Readers take a shared lock and see the base
+    merged with the log. compact() folds the log into a new base CSV, written to
+    a temporary file and renamed into place. Log entries are whole-record
+    upserts and deletes, so replaying them twice is harmless: a crash between
+    the rename and the log reset loses nothing.
+    """
+
+    def __init__(self, csv_path=DEFAULT_CSV_PATH):
+        self.csv_path = csv_path
+        self.wal_path = csv_path + '.wal'
+        self.lock_path = csv_path + '.lock'
+        self._thread_lock = threading.Lock()
+        self._lock_file = None
+        self._records = OrderedDict()
+        self._loaded = False
+        self._base_identity = None
+        self._wal_identity = None
+        self._wal_offset = 0
+        self._wal_entries = 0
+        self._next_id = 1
+        self._dataframe = None
+        self._compactor = None
+        self._stop_compactor = threading.Event()
+
+    @contextmanager
+    def _locked(self, exclusive):
+        """Cross-process flock plus an in-process lock, since flock does not exclude threads sharing the fd"""
+        with self._thread_lock:
+            if self._lock_file is None:
+                directory = os.path.dirname(self.lock_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._lock_file = open(self.lock_path, 'a')
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def exists(self):
+        return os.path.exists(self.csv_path) or os.path.exists(self.wal_path)
+
+    def _apply(self, entry):
+        if entry['op'] == 'put':
+            story = entry['story']
+            try:
+                # Older log entries may hold "3" for 3; both must land on the same record
+                story['id'] = coerce_story_id(story['id'])
+            except ValueError:
+                pass
+            self._records[story['id']] = story
+            if isinstance(story['id'], int):
+                self._next_id = max(self._next_id, story['id'] + 1)
+        elif entry['op'] == 'delete':
+            try:
+                self._records.pop(coerce_story_id(entry['id']), None)
+            except ValueError:
+                self._records.pop(entry['id'], None)
+
+    def _refresh_locked(self):
+        """Bring the in-memory view up to date; the caller holds the flock
+
+        An unchanged base only costs reading the log entries appended since the
+        last refresh. A new base (after compaction) or a replaced log reloads both.
+        """
+        base_identity = _file_identity(self.csv_path)
+        wal_identity = _file_identity(self.wal_path)
+        wal_replaced = (self._wal_identity is not None and (wal_identity is None or wal_identity[0] != self._wal_identity[0])
+                        or wal_identity is not None and wal_identity[2] < self._wal_offset)
+        if not self._loaded or base_identity != self._base_identity or wal_replaced:
+            self._records = OrderedDict()
+            self._next_id = 1
+            if base_identity is not None:
+                base = pd.read_csv(self.csv_path)
+                for story in base.astype(object).where(base.notna(), None).to_dict('records'):
+                    self._apply({'op': 'put', 'story': story})
+            self._base_identity = base_identity
+            self._loaded = True
+            self._wal_offset = 0
+            self._wal_entries = 0
+            self._dataframe = None
+
+        if wal_identity is not None and wal_identity[2] > self._wal_offset:
+            with open(self.wal_path, 'rb') as f:
+                f.seek(self._wal_offset)
+                for line in f:
+                    # A line without its newline is a torn append from a crashed writer
+                    if not line.endswith(b'\n'):
+                        break
+                    self._wal_offset += len(line)
+                    self._apply(json.loads(line))
+                    self._wal_entries += 1
+            self._dataframe = None
+        self._wal_identity = wal_identity
+
+    def refresh(self):
+        with self._locked(exclusive=False):
+            self._refresh_locked()
+
+    def dataframe(self):
+        """Base corpus merged with the log, as a DataFrame with the CSV's columns"""
+        with self._locked(exclusive=False):
+            self._refresh_locked()
+            if self._dataframe is None:
+                self._dataframe = pd.DataFrame(list(self._records.values()), columns=COLUMNS)
+            return self._dataframe
+
+    def get_story(self, story_id):
+        with self._locked(exclusive=False):
+            self._refresh_locked()
+            return self._records.get(coerce_story_id(story_id))
+
+    def _append_locked(self, entries):
+        """Append entries as one write and fsync it; the caller holds the exclusive flock"""
+        payload = ''.join(json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n' for entry in entries)
+        created = not os.path.exists(self.wal_path)
+        with open(self.wal_path, 'ab') as f:
+            size = f.seek(0, os.SEEK_END)
+            if size:
+                # Drop a torn tail left by a writer that crashed mid-append
+                with open(self.wal_path, 'rb') as tail:
+                    tail.seek(max(0, size - 1))
+                    if tail.read(1) != b'\n':
+                        tail.seek(0)
+                        f.truncate(tail.read().rfind(b'\n') + 1)
+            f.write(payload.encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+        if created:
+            _fsync_directory(os.path.dirname(self.wal_path))
+        self._refresh_locked()
+
+    def put_stories(self, stories, replace=True):
+        """Add or edit stories with a single fsync; stories without an id get the next free one
+
+        Ids are stored as ints. With replace=False an id already in the corpus
+        raises StoryExistsError and nothing is written.
+        """
+        entries = []
+        with self._locked(exclusive=True):
+            self._refresh_locked()
+            next_id = self._next_id
+            for story in stories:
+                missing = [field for field in REQUIRED_FIELDS if not story.get(field)]
+                if missing:
+                    raise ValueError(f"Story is missing {', '.join(missing)}")
+                record = {column: story.get(column) for column in COLUMNS}
+                record['length'] = record['length'] or 'medium'
+                if record['id'] is None:
+                    record['id'] = next_id
+                    next_id += 1
+                else:
+                    record['id'] = coerce_story_id(record['id'])
+                    if not replace and record['id'] in self._records:
+                        raise StoryExistsError(f"Story {record['id']} already exists")
+                entries.append({'op': 'put', 'story': record, 'ts': time.time()})
+            self._append_locked(entries)
+        return [entry['story'] for entry in entries]
+
+    def put_story(self, story, replace=True):
+        return self.put_stories([story], replace)[0]
+
+    def delete_story(self, story_id):
+        story_id = coerce_story_id(story_id)
+        with self._locked(exclusive=True):
+            self._refresh_locked()
+            if story_id not in self._records:
+                return False
+            self._append_locked([{'op': 'delete', 'id': story_id, 'ts': time.time()}])
+        return True
+
+    def pending_entries(self):
+        """Log entries not yet folded into the base CSV"""
+        with self._locked(exclusive=False):
+            self._refresh_locked()
+            return self._wal_entries
+
+    def compact(self, min_entries=1):
+        """Fold the log into the base CSV atomically; returns how many entries were folded"""
+        with self._locked(exclusive=True):
+            self._refresh_locked()
+            entries = self._wal_entries
+            if entries < min_entries:
+                return 0
+
+            staging_path = self.csv_path + '.tmp'
+            pd.DataFrame(list(self._records.values()), columns=COLUMNS).to_csv(staging_path, index=False)
+            with open(staging_path, 'rb') as f:
+                os.fsync(f.fileno())
+            os.replace(staging_path, self.csv_path)
+
+            # Start a new, empty log; until this rename, replaying the old one is a no-op
+            with open(self.wal_path + '.tmp', 'wb') as f:
+                os.fsync(f.fileno())
+            os.replace(self.wal_path + '.tmp', self.wal_path)
+            _fsync_directory(os.path.dirname(self.csv_path))
+            self._refresh_locked()
+
+        print(f"Compacted {entries} log entries into {self.csv_path}")
+        return entries
+
+    def start_compactor(self, interval=30.0, threshold=DEFAULT_COMPACT_THRESHOLD):
+        """Compact in a daemon thread whenever the log has reached `threshold` entries"""
+        if self._compactor is not None:
+            return self._compactor
+
+        def run():
+            while not self._stop_compactor.wait(interval):
+                try:
+                    self.compact(min_entries=threshold)
+                except Exception as e:
+                    print(f"Story log compaction failed: {e}")
+
+        self._stop_compactor.clear()
+        self._compactor = threading.Thread(target=run, name='story-compactor', daemon=True)
+        self._compactor.start()
+        return self._compactor
+
+    def stop_compactor(self):
+        if self._compactor is not None:
+            self._stop_compactor.set()
+            self._compactor.join()
+            self._compactor = None
+
+
+story_store = StoryStore()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or compact the story corpus write-ahead log")
+    parser.add_argument('command', choices=['status', 'compact'])
+    parser.add_argument('--csv-path', default=DEFAULT_CSV_PATH)
+    args = parser.parse_args()
+
+    store = StoryStore(args.csv_path)
+    if args.command == 'compact':
+        store.compact()
+    else:
+        print(f"{len(store.dataframe())} stories, {store.pending_entries()} log entries pending compaction")
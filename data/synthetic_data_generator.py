@@ -1,9 +1,24 @@
-import json
+import os
 import random
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
+import numpy as np
+
+try:
+    from data.jsonl_io import JsonlWriter, write_jsonl, write_manifest
+except ImportError:
+    # Running as a script from inside data/
+    from jsonl_io import JsonlWriter, write_jsonl, write_manifest
+
+# Stop words dropped from a prompt before picking title words
+TITLE_STOPWORDS = frozenset(['a', 'the', 'of', 'in', 'who', 'discovers', 'finds'])
+DEFAULT_SHARD_SIZE = 100000
+
 class SyntheticDataGenerator:
-    def __init__(self):
+    def __init__(self, seed=None):
+        # A private RNG, so a seeded generator is reproducible regardless of other random users
+        self.rng = random.Random(seed)
         self.genres = ['fantasy', 'sci-fi', 'mystery', 'adventure', 'romance', 'comedy', 'horror']
         self.themes = {
             'fantasy': ['dragons', 'magic', 'kingdoms', 'quests', 'mythical creatures'],
@@ -31,11 +46,15 @@ class SyntheticDataGenerator:
             'magical academy', 'underground bunker', 'floating islands', 'crystal caves',
             'digital realm', 'parallel universe', 'dream world', 'time vortex'
         ]
+        
+        # Membership lookups used for every generated story
+        self.character_set = frozenset(self.characters)
+        self.theme_set = frozenset(theme for themes in self.themes.values() for theme in themes)
 
     def generate_prompt(self, genre):
-        theme = random.choice(self.themes[genre])
-        character = random.choice(self.characters)
-        location = random.choice(self.locations)
+        theme = self.rng.choice(self.themes[genre])
+        character = self.rng.choice(self.characters)
+        location = self.rng.choice(self.locations)
         
         prompts = [
             f"A {character} who discovers {theme} in the {location}",
@@ -45,14 +64,14 @@ class SyntheticDataGenerator:
             f"How {character}'s encounter with {theme} changes the {location} forever"
         ]
         
-        return random.choice(prompts)
+        return self.rng.choice(prompts)
 
     def generate_story(self, prompt, genre, length):
         words = prompt.split()
-        character = next((word for word in words if word in self.characters), random.choice(self.characters))
-        theme = next((word for word in words if word in sum(self.themes.values(), [])), random.choice(self.themes[genre]))
+        character = next((word for word in words if word in self.character_set), self.rng.choice(self.characters))
+        theme = next((word for word in words if word in self.theme_set), self.rng.choice(self.themes[genre]))
         
-        paragraphs = random.randint(*self.story_structures[length])
+        paragraphs = self.rng.randint(*self.story_structures[length])
         story = []
         
         for i in range(paragraphs):
@@ -79,7 +98,7 @@ class SyntheticDataGenerator:
                 f"Little did {character} know that {theme} would change everything,",
                 f"When {character} first encountered {theme}, it seemed ordinary,"
             ]
-            content = f"{random.choice(openings)} they couldn't have imagined the adventure that awaited."
+            content = f"{self.rng.choice(openings)} they couldn't have imagined the adventure that awaited."
             
         elif paragraph_num == total_paragraphs - 1:
             # Conclusion
@@ -89,7 +108,7 @@ class SyntheticDataGenerator:
                 f"The mystery of {theme} had been solved, but new questions emerged.",
                 f"{character} knew that their journey with {theme} was far from over."
             ]
-            content = random.choice(endings)
+            content = self.rng.choice(endings)
             
         else:
             # Middle paragraphs
@@ -105,13 +124,13 @@ class SyntheticDataGenerator:
                 "a secret that had been buried for centuries.",
                 "a mystery that defied all explanation."
             ]
-            content = f"{random.choice(developments)} {random.choice(discoveries)}"
+            content = f"{self.rng.choice(developments)} {self.rng.choice(discoveries)}"
         
         return content
 
     def _generate_title(self, prompt, genre):
         words = prompt.split()
-        key_words = [word for word in words if word.lower() not in ['a', 'the', 'of', 'in', 'who', 'discovers', 'finds']]
+        key_words = [word for word in words if word.lower() not in TITLE_STOPWORDS]
         
         if len(key_words) >= 2:
             title_formats = [
@@ -123,21 +142,24 @@ class SyntheticDataGenerator:
         else:
             title_formats = [
                 f"The {genre.title()} Adventure",
-                f"Secrets of the {random.choice(self.themes[genre])}",
-                f"{random.choice(self.characters)}'s Journey"
+                f"Secrets of the {self.rng.choice(self.themes[genre])}",
+                f"{self.rng.choice(self.characters)}'s Journey"
             ]
         
-        return random.choice(title_formats)
+        return self.rng.choice(title_formats)
+
+    def iter_samples(self, num_samples):
+        """Yield samples one at a time, without holding the dataset"""
+        for _ in range(num_samples):
+            genre = self.rng.choice(self.genres)
+            prompt = self.generate_prompt(genre)
+            length = self.rng.choice(['short', 'medium', 'long'])
+            yield self.generate_story(prompt, genre, length)
 
     def generate_dataset(self, num_samples=1000):
         dataset = []
         
-        for i in range(num_samples):
-            genre = random.choice(self.genres)
-            prompt = self.generate_prompt(genre)
-            length = random.choice(['short', 'medium', 'long'])
-            
-            story = self.generate_story(prompt, genre, length)
+        for i, story in enumerate(self.iter_samples(num_samples)):
             dataset.append(story)
             
             if (i + 1) % 100 == 0:
@@ -145,13 +167,52 @@ class SyntheticDataGenerator:
         
         return dataset
 
-    def save_dataset(self, dataset, filename='training_data.json'):
-        with open(f'data/{filename}', 'w') as f:
-            json.dump(dataset, f, indent=2)
+    def save_dataset(self, dataset, filename='training_data.jsonl'):
+        """Stream any iterable of samples (a list, or iter_samples) to data/<filename>; .gz compresses"""
+        count = write_jsonl(f'data/{filename}', dataset)
         
-        print(f"Dataset saved with {len(dataset)} samples")
+        print(f"Dataset saved with {count} samples")
+
+def _write_shard(output_dir, index, num_samples, seed, compress):
+    """Generate one shard as JSONL; the file only appears under its final name once complete"""
+    path = os.path.join(output_dir, f"shard-{index:05d}.jsonl{'.gz' if compress else ''}")
+    generator = SyntheticDataGenerator(seed=seed)
+    with JsonlWriter(path) as writer:
+        writer.write_all(generator.iter_samples(num_samples))
+    return {'path': os.path.basename(path), 'samples': num_samples, 'seed': seed,
+            'bytes': os.path.getsize(path), 'sha256': writer.sha256}
+
+def generate_sharded(num_samples, output_dir, seed=0, shard_size=DEFAULT_SHARD_SIZE, workers=None, compress=False):
+    """Generate num_samples across a process pool as independent JSONL shards plus manifest.json
+
+    Shard boundaries and per-shard seeds depend only on num_samples, shard_size
+    and seed, so a run is reproducible whatever the number of workers. `compress`
+    gzips each shard; the manifest's sha256 is of the uncompressed lines.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    counts = [min(shard_size, num_samples - start) for start in range(0, num_samples, shard_size)]
+    # Independent, well-mixed seeds per shard derived from the run seed
+    seeds = [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(seed).spawn(len(counts))]
+    
+    started = datetime.now()
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = [pool.submit(_write_shard, output_dir, index, count, shard_seed, compress)
+                   for index, (count, shard_seed) in enumerate(zip(counts, seeds))]
+        shards = [future.result() for future in futures]
+    
+    manifest = {
+        'num_samples': num_samples,
+        'seed': seed,
+        'shard_size': shard_size,
+        'format': 'jsonl.gz' if compress else 'jsonl',
+        'created': started.isoformat(timespec='seconds'),
+        'shards': shards
+    }
+    write_manifest(output_dir, manifest)
+    
+    print(f"Generated {num_samples} samples in {len(shards)} shards under {output_dir}")
+    return manifest
 
 if __name__ == "__main__":
     generator = SyntheticDataGenerator()
-    dataset = generator.generate_dataset(1000)
-    generator.save_dataset(dataset)
\ No newline at end of file
+    generator.save_dataset(generator.iter_samples(1000))
\ No newline at end of file
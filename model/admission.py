@@ -0,0 +1,114 @@
+import math
+import threading
+import time
+from collections import deque
+
+
+class Overloaded(Exception):
+    """Raised instead of queueing a request the server cannot start in time"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Server overloaded ({reason}), retry in {retry_after} s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounded concurrency with a bounded FIFO queue in front of an expensive call
+
+    At most `max_concurrency` calls run at once. Up to `max_queue` more wait, each
+    for at most `max_wait_ms`; anything beyond that is rejected immediately with
+    Overloaded, so latency stays bounded under overload instead of growing with
+    the backlog. A finished call hands its slot straight to the oldest waiter.
+    """
+
+    def __init__(self, max_concurrency=4, max_queue=16, max_wait_ms=1000):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait_ms / 1000.0
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiters = deque()
+        self._admitted = 0
+        self._shed = {'queue_full': 0, 'queue_timeout': 0}
+        self._degraded = 0
+        self._queue_waits = deque(maxlen=10000)
+        # Moving average of how long an admitted call holds its slot, for Retry-After
+        self._service_time = 0.0
+
+    def retry_after(self):
+        """Seconds until a slot is likely to be free: the backlog divided among the slots"""
+        backlog = len(self._waiters) + self._in_flight
+        return max(1, math.ceil(backlog * self._service_time / self.max_concurrency))
+
+    def acquire(self):
+        """Take a slot, waiting in line if needed; raises Overloaded when the line is full or too slow"""
+        enqueued = time.perf_counter()
+        with self._lock:
+            if self._in_flight < self.max_concurrency and not self._waiters:
+                self._in_flight += 1
+                self._admitted += 1
+                self._queue_waits.append(0.0)
+                return
+            if len(self._waiters) >= self.max_queue:
+                self._shed['queue_full'] += 1
+                raise Overloaded('queue full', self.retry_after())
+            turn = threading.Event()
+            self._waiters.append(turn)
+
+        if not turn.wait(self.max_wait):
+            with self._lock:
+                # The slot may have been handed over between the timeout and taking the lock
+                if not turn.is_set():
+                    self._waiters.remove(turn)
+                    self._shed['queue_timeout'] += 1
+                    raise Overloaded('queue wait exceeded', self.retry_after())
+        with self._lock:
+            self._admitted += 1
+            self._queue_waits.append(time.perf_counter() - enqueued)
+
+    def release(self, service_time=None):
+        with self._lock:
+            if service_time is not None:
+                self._service_time = service_time if not self._service_time else 0.9 * self._service_time + 0.1 * service_time
+            if self._waiters:
+                # The slot passes to the oldest waiter; in_flight is unchanged
+                self._waiters.popleft().set()
+            else:
+                self._in_flight -= 1
+
+    def record_degraded(self):
+        """Count a shed request that was answered by a cheaper fallback instead of an error"""
+        with self._lock:
+            self._degraded += 1
+
+    def run(self, fn, *args, **kwargs):
+        """Call fn inside a slot"""
+        self.acquire()
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.release(time.perf_counter() - started)
+
+    def stats(self):
+        with self._lock:
+            waits = sorted(self._queue_waits)
+
+            def percentile(p):
+                if not waits:
+                    return 0.0
+                return waits[min(len(waits) - 1, int(p / 100.0 * len(waits)))] * 1000
+
+            return {
+                'max_concurrency': self.max_concurrency,
+                'max_queue': self.max_queue,
+                'max_wait_ms': self.max_wait * 1000,
+                'in_flight': self._in_flight,
+                'queue_depth': len(self._waiters),
+                'admitted': self._admitted,
+                'shed': dict(self._shed, total=sum(self._shed.values())),
+                'degraded': self._degraded,
+                'queue_wait_ms': {'p50': percentile(50), 'p99': percentile(99), 'max': waits[-1] * 1000 if waits else 0.0},
+                'service_time_ms': self._service_time * 1000
+            }
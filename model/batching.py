@@ -0,0 +1,117 @@
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """Collects concurrent requests into small batches and runs them through one call of `batch_fn`
+
+    `batch_fn` receives a list of request items and must return a list of results
+    in the same order. A batch is dispatched as soon as `max_batch_size` items are
+    waiting or the oldest item has waited `max_wait_ms`, whichever comes first.
+    If a batch raises, its items are rerun one at a time, so a bad request fails
+    only its own caller.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=32, max_wait_ms=5, name='micro-batcher'):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._queue_waits = deque(maxlen=10000)
+        self._requests = 0
+        self._failed_batches = 0
+        self._worker = threading.Thread(target=self._run, name=name, daemon=True)
+        self._worker.start()
+
+    def submit(self, item):
+        """Queue one request and return a Future for its result"""
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def process(self, item, timeout=None):
+        """Queue one request and block until its batch has run"""
+        return self.submit(item).result(timeout=timeout)
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = batch[0][2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                # Requests that are already queued are always taken, even past the deadline
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            started = time.perf_counter()
+            with self._stats_lock:
+                self._batch_sizes[len(batch)] += 1
+                self._requests += len(batch)
+                self._queue_waits.extend(started - enqueued for _, _, enqueued in batch)
+
+            try:
+                results = self._call_batch_fn([item for item, _, _ in batch])
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0][1].set_exception(e)
+                    continue
+                with self._stats_lock:
+                    self._failed_batches += 1
+                for item, future, _ in batch:
+                    try:
+                        future.set_result(self._call_batch_fn([item])[0])
+                    except Exception as item_error:
+                        future.set_exception(item_error)
+                continue
+
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+
+    def _call_batch_fn(self, items):
+        results = self.batch_fn(items)
+        if len(results) != len(items):
+            raise RuntimeError(f"batch_fn returned {len(results)} results for {len(items)} requests")
+        return results
+
+    def stats(self):
+        """Batch-size histogram, batches rerun item by item, and queue-wait percentiles (milliseconds) since start-up"""
+        with self._stats_lock:
+            histogram = dict(sorted(self._batch_sizes.items()))
+            waits = sorted(self._queue_waits)
+            requests = self._requests
+            failed_batches = self._failed_batches
+
+        batches = sum(histogram.values())
+
+        def percentile(p):
+            if not waits:
+                return 0.0
+            return waits[min(len(waits) - 1, int(p / 100.0 * len(waits)))] * 1000
+
+        return {
+            'requests': requests,
+            'batches': batches,
+            'mean_batch_size': requests / batches if batches else 0.0,
+            'batch_size_histogram': histogram,
+            'failed_batches': failed_batches,
+            'queue_wait_ms': {
+                'mean': sum(waits) / len(waits) * 1000 if waits else 0.0,
+                'p50': percentile(50),
+                'p99': percentile(99),
+                'max': waits[-1] * 1000 if waits else 0.0
+            },
+            'queue_depth': self._queue.qsize()
+        }
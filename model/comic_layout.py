@@ -0,0 +1,227 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+# Panel boxes are expressed as fractions of the page so the front end (or a
+# renderer) can scale them to any page size.
+PAGE_LAYOUTS = {
+    1: [(0.0, 0.0, 1.0, 1.0)],
+    2: [(0.0, 0.0, 1.0, 0.5), (0.0, 0.5, 1.0, 0.5)],
+    3: [(0.0, 0.0, 1.0, 0.4), (0.0, 0.4, 0.5, 0.6), (0.5, 0.4, 0.5, 0.6)],
+    4: [(0.0, 0.0, 0.5, 0.5), (0.5, 0.0, 0.5, 0.5), (0.0, 0.5, 0.5, 0.5), (0.5, 0.5, 0.5, 0.5)]
+}
+
+SENTENCE_PATTERN = re.compile(r'[^.!?]+[.!?]+["”\']?|[^.!?]+$')
+DIALOGUE_PATTERN = re.compile(r'["“]([^"”]+)["”]')
+SPEAKER_PATTERN = re.compile(r'\b([A-Z][a-z]+(?: [A-Z][a-z]+)?)\s+(?:said|asked|whispered|shouted|replied|cried)\b')
+
+
+def split_sentences(paragraph):
+    """Split a paragraph into sentences, keeping quoted speech with its attribution"""
+    sentences = []
+    for sentence in SENTENCE_PATTERN.findall(paragraph):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if sentences and sentences[-1][-1] in '"”' and SPEAKER_PATTERN.match(sentence):
+            sentences[-1] = f"{sentences[-1]} {sentence}"
+        else:
+            sentences.append(sentence)
+    return sentences
+
+
+def make_story_id(story):
+    """Build a stable id for a generated story from its title and content"""
+    digest = hashlib.sha1(f"{story.get('title', '')}\n{story.get('content', '')}".encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+class StoryCache:
+    """Thread-safe LRU cache of generated stories keyed by story id"""
+
+    def __init__(self, max_stories=256):
+        self.max_stories = max_stories
+        self._stories = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, story):
+        story_id = make_story_id(story)
+        with self._lock:
+            self._stories[story_id] = story
+            self._stories.move_to_end(story_id)
+            while len(self._stories) > self.max_stories:
+                self._stories.popitem(last=False)
+        return story_id
+
+    def get(self, story_id):
+        with self._lock:
+            story = self._stories.get(story_id)
+            if story is not None:
+                self._stories.move_to_end(story_id)
+            return story
+
+
+class ComicLayout:
+    """Lazily splits one story into comic pages made of caption and dialogue panels"""
+
+    def __init__(self, story, panels_per_page=4, max_panel_chars=180):
+        self.story = story
+        self.panels_per_page = panels_per_page
+        self.max_panel_chars = max_panel_chars
+        self.pages = []
+        self._panels = self._iter_panels()
+        self._lookahead = None
+        self._exhausted = False
+        self._lock = threading.Lock()
+
+    def _iter_panels(self):
+        """Yield panel dicts in reading order, one sentence (or fragment) at a time"""
+        paragraphs = [p.strip() for p in self.story.get('content', '').split('\n\n') if p.strip()]
+        for paragraph_index, paragraph in enumerate(paragraphs):
+            for sentence in split_sentences(paragraph):
+                for chunk in self._split_long_text(sentence):
+                    yield self._build_panel(chunk, paragraph_index)
+
+    def _split_long_text(self, text):
+        """Break text that would overflow a panel on word boundaries"""
+        if len(text) <= self.max_panel_chars:
+            return [text]
+
+        chunks = []
+        current = []
+        current_len = 0
+        for word in text.split():
+            if current and current_len + len(word) + 1 > self.max_panel_chars:
+                chunks.append(' '.join(current))
+                current = []
+                current_len = 0
+            current.append(word)
+            current_len += len(word) + 1
+        if current:
+            chunks.append(' '.join(current))
+        return chunks
+
+    def _build_panel(self, text, paragraph_index):
+        """Classify a chunk of text as a caption or a dialogue box"""
+        dialogue = DIALOGUE_PATTERN.search(text)
+        if dialogue:
+            speaker = SPEAKER_PATTERN.search(text)
+            return {
+                'kind': 'dialogue',
+                'text': dialogue.group(1).strip(),
+                'caption': DIALOGUE_PATTERN.sub('', text).strip(' ,') or None,
+                'speaker': speaker.group(1) if speaker else None,
+                'paragraph': paragraph_index
+            }
+        return {
+            'kind': 'caption',
+            'text': text,
+            'caption': None,
+            'speaker': None,
+            'paragraph': paragraph_index
+        }
+
+    def _next_panel(self):
+        if self._lookahead is not None:
+            panel, self._lookahead = self._lookahead, None
+            return panel
+        return next(self._panels, None)
+
+    def _has_more_panels(self):
+        if self._lookahead is None:
+            self._lookahead = next(self._panels, None)
+        return self._lookahead is not None
+
+    def _layout_next_page(self):
+        """Consume panels for exactly one more page; returns False when the story is exhausted"""
+        panels = []
+        while len(panels) < self.panels_per_page:
+            panel = self._next_panel()
+            if panel is None:
+                break
+            panels.append(panel)
+
+        if not panels:
+            self._exhausted = True
+            return False
+
+        boxes = PAGE_LAYOUTS.get(len(panels)) or [
+            (0.0, row / len(panels), 1.0, 1.0 / len(panels)) for row in range(len(panels))
+        ]
+        page_number = len(self.pages)
+        laid_out = []
+        for index, (panel, (x, y, width, height)) in enumerate(zip(panels, boxes)):
+            laid_out.append(dict(panel, index=index, box={'x': x, 'y': y, 'width': width, 'height': height}))
+
+        self.pages.append({
+            'page': page_number,
+            'title': self.story.get('title', '') if page_number == 0 else None,
+            'layout': f"{len(panels)}-panel",
+            'panels': laid_out
+        })
+
+        if not self._has_more_panels():
+            self._exhausted = True
+        return True
+
+    def get_page(self, page_number):
+        """Return a laid-out page, computing only the pages up to it that are not cached yet"""
+        if page_number < 0:
+            return None
+
+        with self._lock:
+            while len(self.pages) <= page_number and not self._exhausted:
+                self._layout_next_page()
+
+            if page_number >= len(self.pages):
+                return None
+
+            page = dict(self.pages[page_number])
+            page['has_next'] = page_number + 1 < len(self.pages) or not self._exhausted
+            page['total_pages'] = len(self.pages) if self._exhausted else None
+            return page
+
+
+class ComicPaginator:
+    """Keeps memoized layouts for recently viewed stories"""
+
+    def __init__(self, story_cache, max_layouts=128, panels_per_page=4):
+        self.story_cache = story_cache
+        self.max_layouts = max_layouts
+        self.panels_per_page = panels_per_page
+        self._layouts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_layout(self, story_id):
+        with self._lock:
+            layout = self._layouts.get(story_id)
+            if layout is not None:
+                self._layouts.move_to_end(story_id)
+                return layout
+
+        story = self.story_cache.get(story_id)
+        if story is None:
+            return None
+
+        with self._lock:
+            layout = self._layouts.setdefault(story_id, ComicLayout(story, self.panels_per_page))
+            self._layouts.move_to_end(story_id)
+            while len(self._layouts) > self.max_layouts:
+                self._layouts.popitem(last=False)
+            return layout
+
+    def get_page(self, story_id, page_number):
+        """Return page `page_number` of a cached story, or None if either is unknown"""
+        layout = self.get_layout(story_id)
+        if layout is None:
+            return None
+        page = layout.get_page(page_number)
+        if page is not None:
+            page['story_id'] = story_id
+        return page
+
+
+# Create global instances
+story_cache = StoryCache()
+comic_paginator = ComicPaginator(story_cache)
@@ -0,0 +1,256 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from PIL import Image, ImageDraw, ImageFont
+
+# Bump when drawing code changes so stale files on disk are not served
+RENDERER_VERSION = 1
+
+PAGE_SIZE = (800, 1200)
+PAGE_MARGIN = 24
+PANEL_GUTTER = 16
+PANEL_PADDING = 18
+BACKGROUND = (250, 247, 240)
+# Rendered pages kept on disk before the least recently served are deleted
+DEFAULT_CACHE_BYTES = 512 * 1024 * 1024
+FONT_CANDIDATES = ['DejaVuSans.ttf', 'Arial.ttf', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf']
+
+
+@lru_cache(maxsize=16)
+def _load_font(size, bold=False):
+    """Load a TrueType font once per process, falling back to Pillow's bundled font"""
+    candidates = ['DejaVuSans-Bold.ttf'] + FONT_CANDIDATES if bold else FONT_CANDIDATES
+    for name in candidates:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(size)
+    except TypeError:
+        return ImageFont.load_default()
+
+
+@lru_cache(maxsize=4096)
+def _wrap_text(text, font_size, max_width, bold=False):
+    """Greedy word wrap measured with the real font; cached per string and box width"""
+    font = _load_font(font_size, bold)
+    lines = []
+    current = ''
+    for word in text.split():
+        candidate = f"{current} {word}" if current else word
+        if current and font.getlength(candidate) > max_width:
+            lines.append(current)
+            current = word
+        else:
+            current = candidate
+    if current:
+        lines.append(current)
+    return tuple(lines)
+
+
+@lru_cache(maxsize=2048)
+def _text_block(text, font_size, max_width, bold=False, color=(20, 20, 20)):
+    """Rasterize wrapped text to a transparent tile so recurring names and captions are drawn once"""
+    font = _load_font(font_size, bold)
+    lines = _wrap_text(text, font_size, max_width, bold)
+    line_height = int(font_size * 1.3)
+    width = max([int(font.getlength(line)) for line in lines] + [1])
+    tile = Image.new('RGBA', (width, max(line_height * len(lines), 1)), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(tile)
+    for row, line in enumerate(lines):
+        draw.text((0, row * line_height), line, font=font, fill=color + (255,))
+    return tile
+
+
+@lru_cache(maxsize=64)
+def _panel_frame(width, height, kind):
+    """Draw an empty panel frame; panels of the same size and kind share one image"""
+    frame = Image.new('RGB', (width, height), (255, 255, 255))
+    draw = ImageDraw.Draw(frame)
+    draw.rectangle([0, 0, width - 1, height - 1], outline=(15, 15, 15), width=4)
+    if kind == 'dialogue':
+        bubble = [PANEL_PADDING // 2, PANEL_PADDING // 2, width - PANEL_PADDING // 2, int(height * 0.7)]
+        draw.rounded_rectangle(bubble, radius=28, fill=(255, 255, 255), outline=(40, 40, 40), width=3)
+    else:
+        draw.rectangle([4, 4, width - 5, height - 5], fill=(255, 244, 204))
+    return frame
+
+
+def _paste_text(page_image, text, font_size, x, y, max_width, bold=False):
+    tile = _text_block(text, font_size, max_width, bold)
+    page_image.paste(tile, (x, y), tile)
+    return tile.height
+
+
+def render_page_image(page, page_size=PAGE_SIZE):
+    """Draw one laid-out page (as produced by `ComicLayout`) to a Pillow image"""
+    page_width, page_height = page_size
+    image = Image.new('RGB', page_size, BACKGROUND)
+
+    top = PAGE_MARGIN
+    if page.get('title'):
+        top += _paste_text(image, page['title'], 40, PAGE_MARGIN, top, page_width - 2 * PAGE_MARGIN, bold=True)
+        top += PANEL_GUTTER
+
+    area_width = page_width - 2 * PAGE_MARGIN
+    area_height = page_height - top - PAGE_MARGIN
+
+    for panel in page.get('panels', []):
+        box = panel['box']
+        x = PAGE_MARGIN + int(box['x'] * area_width)
+        y = top + int(box['y'] * area_height)
+        width = int(box['width'] * area_width) - PANEL_GUTTER
+        height = int(box['height'] * area_height) - PANEL_GUTTER
+        image.paste(_panel_frame(width, height, panel['kind']), (x, y))
+
+        text_x = x + PANEL_PADDING
+        text_y = y + PANEL_PADDING
+        text_width = width - 2 * PANEL_PADDING
+        if panel.get('speaker'):
+            text_y += _paste_text(image, panel['speaker'].upper(), 18, text_x, text_y, text_width, bold=True)
+        text_y += _paste_text(image, panel['text'], 22, text_x, text_y, text_width)
+        if panel.get('caption'):
+            _paste_text(image, panel['caption'], 18, text_x, max(text_y + PANEL_GUTTER, y + int(height * 0.72)), text_width)
+
+    return image
+
+
+def page_fingerprint(page, page_size=PAGE_SIZE):
+    """Content address of a rendered page: identical layouts map to the same file"""
+    drawable = {
+        'version': RENDERER_VERSION,
+        'size': list(page_size),
+        'title': page.get('title'),
+        'panels': [
+            {key: panel.get(key) for key in ('kind', 'text', 'caption', 'speaker', 'box')}
+            for panel in page.get('panels', [])
+        ]
+    }
+    return hashlib.sha256(json.dumps(drawable, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _render_to_file(page, page_size, path):
+    """Process pool entry point: render and atomically publish one PNG"""
+    if os.path.exists(path):
+        return path
+    image = render_page_image(page, page_size)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    image.save(tmp_path, format='PNG', optimize=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+class ComicRenderer:
+    """Renders comic pages to content-addressed PNG files using a pool of worker processes
+
+    The files are a cache. Serving one sets its access time explicitly (so
+    noatime mounts do not matter, and the mtime behind its ETag stays put); once
+    they add up to more than `max_bytes` the least recently served are deleted
+    until the directory is back under 90% of it. A deleted page is drawn again.
+    """
+
+    def __init__(self, output_dir='static/rendered', page_size=PAGE_SIZE, workers=None, max_bytes=DEFAULT_CACHE_BYTES):
+        self.output_dir = output_dir
+        self.page_size = tuple(page_size)
+        self.workers = workers or os.cpu_count() or 1
+        self.max_bytes = max_bytes
+        self._pool = None
+        self._lock = threading.Lock()
+        self._cache_bytes = None
+        self._evicted = 0
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                os.makedirs(self.output_dir, exist_ok=True)
+                # Spawned, not forked: the pool is created from a threaded web server,
+                # and a fork could copy a lock another thread holds
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    def page_path(self, page):
+        return os.path.join(self.output_dir, f"{page_fingerprint(page, self.page_size)}.png")
+
+    def _cached_files(self):
+        files = []
+        for entry in os.scandir(self.output_dir):
+            if entry.name.endswith('.png'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_atime, stat.st_size, entry.path))
+        return files
+
+    @staticmethod
+    def _file_size(path):
+        try:
+            return os.stat(path).st_size
+        except FileNotFoundError:
+            # Already evicted by another worker sharing the directory
+            return 0
+
+    def _account(self, added_bytes):
+        """Track the directory size and evict the least recently served files once it exceeds max_bytes"""
+        with self._lock:
+            if self._cache_bytes is None:
+                self._cache_bytes = sum(size for _, size, _ in self._cached_files())
+            else:
+                self._cache_bytes += added_bytes
+            if self._cache_bytes <= self.max_bytes:
+                return
+            # Rescan: other workers share the directory, so the running total is only an estimate
+            files = sorted(self._cached_files())
+            total = sum(size for _, size, _ in files)
+            for _, size, path in files:
+                if total <= self.max_bytes * 0.9:
+                    break
+                try:
+                    os.remove(path)
+                    self._evicted += 1
+                except FileNotFoundError:
+                    pass
+                total -= size
+            self._cache_bytes = total
+
+    def render_pages(self, pages):
+        """Render pages in parallel, skipping any that already exist on disk; returns file paths"""
+        paths = [self.page_path(page) for page in pages]
+        missing = []
+        for page, path in zip(pages, paths):
+            try:
+                # Mark as recently served for eviction
+                os.utime(path, (time.time(), os.stat(path).st_mtime))
+            except FileNotFoundError:
+                missing.append((page, path))
+        if missing:
+            pool = self._get_pool()
+            futures = [pool.submit(_render_to_file, page, self.page_size, path) for page, path in missing]
+            for future in futures:
+                future.result()
+            self._account(sum(self._file_size(path) for _, path in missing))
+        return paths
+
+    def render_page(self, page):
+        return self.render_pages([page])[0]
+
+    def stats(self):
+        with self._lock:
+            return {'cache_bytes': self._cache_bytes, 'max_bytes': self.max_bytes, 'evicted': self._evicted}
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+
+# Create global instance
+comic_renderer = ComicRenderer(max_bytes=int(os.environ.get('COMIC_CACHE_MB', DEFAULT_CACHE_BYTES // (1024 * 1024))) * 1024 * 1024)
@@ -0,0 +1,10 @@
+# Genre and length ids the story model is conditioned on. They are baked into
+# trained and exported models, so every consumer imports them from here; this
+# module stays free of TensorFlow so serving code can use it too.
+GENRE_MAPPING = {
+    'fantasy': 0, 'sci-fi': 1, 'mystery': 2, 'adventure': 3,
+    'romance': 4, 'comedy': 5, 'horror': 6
+}
+LENGTH_MAPPING = {
+    'short': 0, 'medium': 1, 'long': 2
+}
@@ -0,0 +1,122 @@
+import os
+import re
+import sys
+
+import tensorflow as tf
+from tensorflow.keras.preprocessing.text import Tokenizer
+
+try:
+    from data.jsonl_io import iter_records
+    from data.shuffle_split import split_paths
+except ImportError:
+    # Running as a script from inside model/
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from data.jsonl_io import iter_records
+    from data.shuffle_split import split_paths
+
+# Prompt lengths at which batches are split into buckets; stories within a
+# bucket are only padded up to the longest prompt in their batch.
+BUCKET_BOUNDARIES = (8, 12, 16, 24, 32)
+
+
+def fit_tokenizer(path, vocab_size, chunk_records=1000):
+    """Fit the Keras tokenizer in chunks so only the word counts are held in memory"""
+    tokenizer = Tokenizer(num_words=vocab_size, oov_token='<OOV>')
+    texts = []
+    for record in iter_records(path):
+        texts.extend((record['prompt'], record['title'], record['content']))
+        if len(texts) >= chunk_records * 3:
+            tokenizer.fit_on_texts(texts)
+            texts = []
+    if texts:
+        tokenizer.fit_on_texts(texts)
+    return tokenizer
+
+
+def _vocabulary_table(tokenizer):
+    """Static word -> id table with the same num_words cut-off and OOV handling as texts_to_sequences"""
+    num_words = tokenizer.num_words
+    oov_index = tokenizer.word_index.get(tokenizer.oov_token, 0) if tokenizer.oov_token else 0
+    words, ids = [], []
+    for word, index in tokenizer.word_index.items():
+        if num_words and index >= num_words:
+            if not oov_index:
+                continue
+            index = oov_index
+        words.append(word)
+        ids.append(index)
+    initializer = tf.lookup.KeyValueTensorInitializer(
+        tf.constant(words, dtype=tf.string), tf.constant(ids, dtype=tf.int64))
+    # Unknown words map to OOV, or to 0 (dropped below) when there is no OOV token
+    return tf.lookup.StaticHashTable(initializer, default_value=oov_index)
+
+
+def make_text_encoder(tokenizer):
+    """Graph-mode equivalent of tokenizer.texts_to_sequences for a single string"""
+    table = _vocabulary_table(tokenizer)
+    filters_pattern = '[' + ''.join(re.escape(c) for c in tokenizer.filters) + ']' if tokenizer.filters else None
+    split = tokenizer.split
+    lower = tokenizer.lower
+
+    def encode(text, max_length):
+        if lower:
+            text = tf.strings.lower(text, encoding='utf-8')
+        if filters_pattern:
+            text = tf.strings.regex_replace(text, filters_pattern, split)
+        words = tf.strings.split(text, sep=split)
+        words = tf.boolean_mask(words, tf.strings.length(words) > 0)
+        ids = table.lookup(words)
+        ids = tf.boolean_mask(ids, ids > 0)
+        # pad_sequences truncates from the front by default
+        return ids[-max_length:]
+
+    return encode
+
+
+def build_dataset(path, tokenizer, genre_mapping, length_mapping, max_sequence_length, batch_size=32,
+                  shuffle_buffer=1000, prompt_length=None, holdout_every=None, validation=False, seed=None):
+    """Streaming ((prompt, genre, length), (title, content)) batches for StoryGeneratorModel
+
+    Records are read lazily, tokenized in parallel inside the tf.data graph,
+    shuffled through a bounded buffer and batched by prompt length so each batch
+    is only padded to its own longest prompt and story. Pass `prompt_length` to
+    pad prompts to a fixed width instead (for models with a fixed-size input).
+    With `holdout_every=k`, every k-th record is held out: the dataset yields
+    the other records, or only the held-out ones when `validation` is set.
+    """
+    def records():
+        for index, record in enumerate(iter_records(path)):
+            if holdout_every and (index % holdout_every == 0) != validation:
+                continue
+            yield (record['prompt'], genre_mapping[record['genre']], length_mapping[record['length']],
+                   record['title'], record['content'])
+
+    dataset = tf.data.Dataset.from_generator(records, output_signature=(
+        tf.TensorSpec([], tf.string), tf.TensorSpec([], tf.int64), tf.TensorSpec([], tf.int64),
+        tf.TensorSpec([], tf.string), tf.TensorSpec([], tf.string)
+    ))
+
+    encode_text = make_text_encoder(tokenizer)
+
+    def encode(prompt, genre, length, title, content):
+        prompt_ids = encode_text(prompt, max_sequence_length)
+        if prompt_length:
+            prompt_ids = tf.pad(prompt_ids, [[0, prompt_length - tf.shape(prompt_ids)[0]]])
+        inputs = (prompt_ids, tf.reshape(genre, [1]), tf.reshape(length, [1]))
+        targets = (encode_text(title, max_sequence_length), encode_text(content, max_sequence_length * 3))
+        return inputs, targets
+
+    if shuffle_buffer and not validation:
+        dataset = dataset.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+    dataset = dataset.map(encode, num_parallel_calls=tf.data.AUTOTUNE, deterministic=False)
+
+    if prompt_length:
+        dataset = dataset.padded_batch(batch_size)
+    else:
+        boundaries = [b for b in BUCKET_BOUNDARIES if b < max_sequence_length]
+        dataset = dataset.bucket_by_sequence_length(
+            lambda inputs, targets: tf.shape(inputs[0])[0],
+            bucket_boundaries=boundaries,
+            bucket_batch_sizes=[batch_size] * (len(boundaries) + 1)
+        )
+    return dataset.prefetch(tf.data.AUTOTUNE)
@@ -0,0 +1,163 @@
+import numpy as np
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def _log_softmax(logits):
+    shifted = logits - logits.max(axis=-1, keepdims=True)
+    return shifted - np.log(np.exp(shifted).sum(axis=-1, keepdims=True))
+
+
+class LSTMDecoder:
+    """Autoregressive decoding for the seq2seq story model in plain numpy
+
+    The recurrent state (h, c) is carried between steps, so every new token costs
+    one LSTM cell step plus the output projection instead of re-running the
+    decoder over the whole prefix. All requests and all beams are decoded as one
+    batch. Weights use the Keras layouts (LSTM gates ordered i, f, c, o).
+    """
+
+    def __init__(self, weights, start_id, end_id):
+        self.weights = weights
+        self.start_id = start_id
+        self.end_id = end_id
+        self.units = weights['decoder_lstm'][1].shape[0]
+        self.vocab_size = weights['decoder_output'][0].shape[1]
+
+    @classmethod
+    def from_keras_model(cls, decoder_model, start_id, end_id):
+        """Pull the numpy weights out of a model built by StoryGeneratorModel.build_decoder_model"""
+        names = [
+            'encoder_embedding', 'encoder_lstm', 'decoder_genre_embedding', 'decoder_length_embedding',
+            'decoder_init_h', 'decoder_init_c', 'decoder_embedding', 'decoder_lstm', 'decoder_output'
+        ]
+        weights = {name: [np.asarray(w) for w in decoder_model.get_layer(name).get_weights()] for name in names}
+        return cls(weights, start_id, end_id)
+
+    def _lstm_step(self, layer, x, h, c):
+        kernel, recurrent_kernel, bias = self.weights[layer]
+        z = x @ kernel + h @ recurrent_kernel + bias
+        i, f, g, o = np.split(z, 4, axis=-1)
+        c = _sigmoid(f) * c + _sigmoid(i) * np.tanh(g)
+        h = _sigmoid(o) * np.tanh(c)
+        return h, c
+
+    def encode(self, prompt_ids, genre_ids, length_ids):
+        """Run the prompt encoder once and return the decoder's initial (h, c)"""
+        prompt_ids = np.asarray(prompt_ids, dtype=np.int64)
+        embedded = self.weights['encoder_embedding'][0][prompt_ids]
+        batch_size = prompt_ids.shape[0]
+        h = np.zeros((batch_size, self.units), dtype=np.float32)
+        c = np.zeros((batch_size, self.units), dtype=np.float32)
+        # Padding is not masked in the Keras graph, so it is not skipped here either
+        for t in range(prompt_ids.shape[1]):
+            h, c = self._lstm_step('encoder_lstm', embedded[:, t], h, c)
+
+        genre = self.weights['decoder_genre_embedding'][0][np.asarray(genre_ids, dtype=np.int64).reshape(-1)]
+        length = self.weights['decoder_length_embedding'][0][np.asarray(length_ids, dtype=np.int64).reshape(-1)]
+        kernel_h, bias_h = self.weights['decoder_init_h']
+        kernel_c, bias_c = self.weights['decoder_init_c']
+        init_h = np.tanh(np.concatenate([h, genre, length], axis=-1) @ kernel_h + bias_h)
+        init_c = np.concatenate([c, genre, length], axis=-1) @ kernel_c + bias_c
+        return init_h.astype(np.float32), init_c.astype(np.float32)
+
+    def step(self, tokens, h, c):
+        """Advance every row by one token; returns log-probabilities over the vocabulary and the new state"""
+        embedded = self.weights['decoder_embedding'][0][tokens]
+        h, c = self._lstm_step('decoder_lstm', embedded, h, c)
+        kernel, bias = self.weights['decoder_output']
+        return _log_softmax(h @ kernel + bias), h, c
+
+    def decode(self, prompt_ids, genre_ids, length_ids, max_length=100, strategy='greedy',
+               top_k=10, beam_width=4, temperature=1.0, length_penalty=1.0, seed=None):
+        """Decode a batch of requests; returns one list of token ids per request (end token excluded)"""
+        h, c = self.encode(prompt_ids, genre_ids, length_ids)
+        if strategy == 'beam':
+            return self._beam_search(h, c, max_length, beam_width, length_penalty)
+        if strategy not in ('greedy', 'top_k'):
+            raise ValueError(f"Unknown decoding strategy: {strategy}")
+
+        rng = np.random.default_rng(seed)
+        batch_size = h.shape[0]
+        tokens = np.full(batch_size, self.start_id, dtype=np.int64)
+        finished = np.zeros(batch_size, dtype=bool)
+        outputs = [[] for _ in range(batch_size)]
+
+        for _ in range(max_length):
+            log_probs, h, c = self.step(tokens, h, c)
+            if strategy == 'greedy':
+                tokens = log_probs.argmax(axis=-1)
+            else:
+                tokens = self._sample_top_k(log_probs, top_k, temperature, rng)
+
+            for row in np.flatnonzero(~finished):
+                if tokens[row] == self.end_id:
+                    finished[row] = True
+                else:
+                    outputs[row].append(int(tokens[row]))
+            if finished.all():
+                break
+
+        return outputs
+
+    def _sample_top_k(self, log_probs, k, temperature, rng):
+        k = min(k, log_probs.shape[-1])
+        candidates = np.argpartition(log_probs, -k, axis=-1)[:, -k:]
+        candidate_scores = np.take_along_axis(log_probs, candidates, axis=-1) / max(temperature, 1e-6)
+        probs = np.exp(candidate_scores - candidate_scores.max(axis=-1, keepdims=True))
+        probs /= probs.sum(axis=-1, keepdims=True)
+        # Inverse-CDF sampling for every row at once
+        picks = (probs.cumsum(axis=-1) < rng.random((probs.shape[0], 1))).sum(axis=-1)
+        return candidates[np.arange(len(picks)), np.minimum(picks, k - 1)]
+
+    def _beam_search(self, h, c, max_length, beam_width, length_penalty):
+        batch_size = h.shape[0]
+        rows = batch_size * beam_width
+        h = np.repeat(h, beam_width, axis=0)
+        c = np.repeat(c, beam_width, axis=0)
+        tokens = np.full(rows, self.start_id, dtype=np.int64)
+
+        # Only the first beam of each request is live at the start, so the first
+        # expansion does not produce beam_width copies of the same hypothesis.
+        scores = np.full((batch_size, beam_width), -np.inf, dtype=np.float64)
+        scores[:, 0] = 0.0
+        finished = np.zeros((batch_size, beam_width), dtype=bool)
+        lengths = np.zeros((batch_size, beam_width), dtype=np.int64)
+        history = np.zeros((batch_size, beam_width, 0), dtype=np.int64)
+
+        for _ in range(max_length):
+            log_probs, h, c = self.step(tokens, h, c)
+            log_probs = log_probs.reshape(batch_size, beam_width, -1)
+
+            # A finished beam can only be carried forward unchanged
+            log_probs[finished] = -np.inf
+            log_probs[finished, self.end_id] = 0.0
+
+            candidates = (scores[:, :, None] + log_probs).reshape(batch_size, -1)
+            best = np.argpartition(candidates, -beam_width, axis=-1)[:, -beam_width:]
+            best = np.take_along_axis(best, np.argsort(-np.take_along_axis(candidates, best, axis=-1), axis=-1), axis=-1)
+            source_beam, next_tokens = np.divmod(best, self.vocab_size)
+
+            scores = np.take_along_axis(candidates, best, axis=-1)
+            was_finished = np.take_along_axis(finished, source_beam, axis=-1)
+            finished = was_finished | (next_tokens == self.end_id)
+            lengths = np.take_along_axis(lengths, source_beam, axis=-1) + (~finished).astype(np.int64)
+            history = np.concatenate([
+                np.take_along_axis(history, source_beam[:, :, None], axis=1), next_tokens[:, :, None]
+            ], axis=-1)
+
+            flat_source = (source_beam + np.arange(batch_size)[:, None] * beam_width).reshape(-1)
+            h, c = h[flat_source], c[flat_source]
+            tokens = next_tokens.reshape(-1)
+            if finished.all():
+                break
+
+        normalized = scores / np.maximum(lengths, 1) ** length_penalty
+        winners = normalized.argmax(axis=-1)
+        outputs = []
+        for request, beam in enumerate(winners):
+            sequence = history[request, beam, :lengths[request, beam]]
+            outputs.append([int(token) for token in sequence])
+        return outputs
@@ -2,51 +2,118 @@ import pandas as pd
 import random
 import json
 import os
+import sys
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 
+try:
+    from model.tokenizer import StoryTokenizer
+except ImportError:
+    # Imported with model/ on sys.path
+    from tokenizer import StoryTokenizer
+
+try:
+    from data.story_store import StoryStore
+except ImportError:
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from data.story_store import StoryStore
+
+class CorpusSnapshot:
+    """One version of the corpus and its TF-IDF index, never modified after it is built
+
+    A request reads every piece it needs from the same snapshot, so a reload
+    swapping in a new one can never mix a new DataFrame with an old index.
+    """
+
+    def __init__(self, stories_df, vectorizer=None, prompt_vectors=None):
+        self.stories_df = stories_df
+        self.vectorizer = vectorizer
+        self.prompt_vectors = prompt_vectors
+        self.genres = stories_df['genre'].to_numpy() if 'genre' in stories_df else np.array([], dtype=object)
+
+    @property
+    def nbytes(self):
+        size = int(self.stories_df.memory_usage(deep=True).sum())
+        if self.prompt_vectors is not None:
+            size += sum(a.nbytes for a in (self.prompt_vectors.data, self.prompt_vectors.indices, self.prompt_vectors.indptr))
+        return size
+
+
 class EnhancedStoryGenerator:
     def __init__(self, csv_path='data/stories_dataset.csv'):
         self.csv_path = csv_path
-        self.stories_df = None
-        self.vectorizer = None
-        self.prompt_vectors = None
+        # Base CSV plus any stories added through the write-ahead log
+        self.store = StoryStore(csv_path)
+        self.snapshot = CorpusSnapshot(pd.DataFrame())
         self.load_stories()
+
+    @property
+    def stories_df(self):
+        return self.snapshot.stories_df
+
+    @property
+    def vectorizer(self):
+        return self.snapshot.vectorizer
+
+    @property
+    def prompt_vectors(self):
+        return self.snapshot.prompt_vectors
         
     def load_stories(self):
-        """Load stories from CSV and prepare similarity search"""
-        if os.path.exists(self.csv_path):
-            self.stories_df = pd.read_csv(self.csv_path)
-            print(f"Loaded {len(self.stories_df)} stories from CSV")
-            
-            # Prepare TF-IDF vectors for similarity search
-            self.vectorizer = TfidfVectorizer(stop_words='english', max_features=1000)
-            self.prompt_vectors = self.vectorizer.fit_transform(self.stories_df['prompt'].fillna(''))
-        else:
+        """Load stories from CSV and prepare similarity search, then swap them in as the current snapshot
+
+        The new snapshot is built off to the side; requests already running
+        keep the one they started with.
+        """
+        self.snapshot = self.build_snapshot()
+        return self.snapshot
+
+    def build_snapshot(self):
+        if not self.store.exists():
             print("CSV file not found, using fallback generator")
-            self.stories_df = pd.DataFrame()
+            return CorpusSnapshot(pd.DataFrame())
+        try:
+            stories_df = self.store.dataframe()
+        except Exception as e:
+            print(f"Error loading CSV, using fallback generator: {e}")
+            return CorpusSnapshot(pd.DataFrame())
+        print(f"Loaded {len(stories_df)} stories from CSV")
+        
+        # Prepare TF-IDF vectors for similarity search
+        # Words are split exactly as the story model's tokenizer splits them
+        vectorizer = TfidfVectorizer(
+            tokenizer=StoryTokenizer().split_words, lowercase=False, token_pattern=None,
+            stop_words='english', max_features=1000
+        )
+        prompt_vectors = vectorizer.fit_transform(stories_df['prompt'].fillna(''))
+        return CorpusSnapshot(stories_df, vectorizer, prompt_vectors)
 
     def find_similar_stories(self, prompt, genre=None, n=3):
         """Find similar stories based on prompt similarity"""
-        if self.stories_df.empty:
+        snapshot = self.snapshot
+        if snapshot.stories_df.empty:
             return []
             
+        ranked_indices = self.rank_stories(prompt, snapshot)
+        return snapshot.stories_df.iloc[self.top_indices_for_genre(ranked_indices, genre, n, snapshot)]
+
+    def rank_stories(self, prompt, snapshot=None):
+        """Return corpus row indices ordered from most to least similar to the prompt"""
+        snapshot = snapshot or self.snapshot
         # Transform input prompt
-        prompt_vector = self.vectorizer.transform([prompt])
+        prompt_vector = snapshot.vectorizer.transform([prompt])
         
         # Calculate similarities
-        similarities = cosine_similarity(prompt_vector, self.prompt_vectors).flatten()
-        
-        # Filter by genre if specified
+        similarities = cosine_similarity(prompt_vector, snapshot.prompt_vectors).flatten()
+        return similarities.argsort()[::-1]
+
+    def top_indices_for_genre(self, ranked_indices, genre=None, n=3, snapshot=None):
+        """Slice an existing similarity ranking down to the best n stories of one genre"""
         if genre:
-            genre_mask = self.stories_df['genre'] == genre
-            similar_indices = similarities.argsort()[::-1]
-            similar_indices = [idx for idx in similar_indices if genre_mask.iloc[idx]][:n]
-        else:
-            similar_indices = similarities.argsort()[::-1][:n]
-            
-        return self.stories_df.iloc[similar_indices]
+            genre_mask = (snapshot or self.snapshot).genres == genre
+            return ranked_indices[genre_mask[ranked_indices]][:n]
+        return ranked_indices[:n]
 
     def generate_story(self, prompt, genre='fantasy', length='medium'):
         """Generate story based on similar patterns from CSV data"""
@@ -69,6 +136,43 @@ class EnhancedStoryGenerator:
             print(f"Error in story generation: {e}")
             return self.fallback_generation(prompt, genre, length)
 
+    def generate_variants(self, prompt, genres=None, lengths=None):
+        """Generate the prompt in every requested genre and length from a single similarity ranking
+
+        The TF-IDF transform and cosine similarities are computed once; each genre
+        only slices the shared ranking, and each length only re-adapts the base story.
+        """
+        genres = genres or ['fantasy', 'sci-fi', 'mystery', 'adventure', 'romance', 'comedy', 'horror']
+        lengths = lengths or ['short', 'medium', 'long']
+        
+        snapshot = self.snapshot
+        ranked_indices = None
+        if not snapshot.stories_df.empty:
+            try:
+                ranked_indices = self.rank_stories(prompt, snapshot)
+            except Exception as e:
+                print(f"Error ranking stories: {e}")
+        
+        variants = []
+        for genre in genres:
+            base_story = None
+            if ranked_indices is not None:
+                top_indices = self.top_indices_for_genre(ranked_indices, genre, n=5, snapshot=snapshot)
+                if len(top_indices):
+                    base_story = snapshot.stories_df.iloc[top_indices[0]]
+            
+            for length in lengths:
+                try:
+                    if base_story is not None:
+                        variants.append(self.adapt_story(base_story, prompt, genre, length))
+                    else:
+                        variants.append(self.fallback_generation(prompt, genre, length))
+                except Exception as e:
+                    print(f"Error in story generation: {e}")
+                    variants.append(self.fallback_generation(prompt, genre, length))
+        
+        return variants
+
     def adapt_story(self, base_story, new_prompt, genre, length):
         """Adapt an existing story to new prompt"""
         # Extract key elements from base story
@@ -94,7 +198,10 @@ class EnhancedStoryGenerator:
         """Generate a creative title based on prompt and genre"""
         words = prompt.split()
         key_words = [w for w in words if len(w) > 3][:2]
-        
+        # Short prompts ("A mage") still need two words for the templates
+        key_words += [w for w in words if w not in key_words][:2 - len(key_words)]
+        key_words += ['Story', 'Tale'][len(key_words):]
+
         title_templates = {
             'fantasy': [f"The {key_words[0]} of Eternal {key_words[1]}", f"Kingdom of {key_words[0]}", f"The Last {key_words[0]}"],
             'sci-fi': [f"The {key_words[0]} Protocol", f"{key_words[0]}: {key_words[1]} Chronicles", f"Project {key_words[0]}"],
@@ -105,7 +212,7 @@ class EnhancedStoryGenerator:
             'comedy': [f"The Amazing {key_words[0]}", f"{key_words[0]} and {key_words[1]}", f"The {key_words[0]} Fiasco"]
         }
         
-        templates = title_templates.get(genre, [f"The {prompt.split()[0]} Story"])
+        templates = title_templates.get(genre, [f"The {key_words[0]} Story"])
         return random.choice(templates)
 
     def adapt_content(self, base_content, new_prompt, length):
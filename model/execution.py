@@ -0,0 +1,208 @@
+import importlib
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+BACKENDS = ('inline', 'thread', 'process')
+
+
+def load_object(spec):
+    """Import a "module:attribute" path, such as 'model.story_generator:story_generator'"""
+    module, attribute = spec.split(':')
+    return getattr(importlib.import_module(module), attribute)
+
+
+def object_spec(obj):
+    """The "module:attribute" path of a module-level object, for load_object() in another process; None if it has none
+
+    Objects defined in a __main__ script have no importable path: a spawned
+    worker would have to re-run the script to find them.
+    """
+    module = sys.modules.get(type(obj).__module__)
+    if module is None or module.__name__ == '__main__':
+        return None
+    for name, value in vars(module).items():
+        if value is obj:
+            return f"{module.__name__}:{name}"
+    return None
+
+
+def generate_variants(generator, prompt, genres, lengths):
+    """Every genre and length of one prompt, in one pass for generators that can share retrieval across them"""
+    if hasattr(generator, 'generate_variants'):
+        return generator.generate_variants(prompt, genres, lengths)
+    return [generator.generate_story(prompt, genre, length) for genre in genres for length in lengths]
+
+
+def _bind(generator, method):
+    # A method name, or a module-level function taking the generator first (picklable by reference)
+    if isinstance(method, str):
+        return getattr(generator, method)
+    return lambda *args, **kwargs: method(generator, *args, **kwargs)
+
+
+_worker_generator = None
+
+
+def _init_worker(factory, factory_args):
+    """Process pool initializer: build the generator, corpus and index included, before any request arrives"""
+    global _worker_generator
+    generator = factory(*factory_args)
+    _worker_generator = generator() if isinstance(generator, type) else generator
+
+
+def _call_in_worker(method, args, kwargs):
+    return _bind(_worker_generator, method)(*args, **kwargs)
+
+
+def _worker_pid():
+    return os.getpid()
+
+
+class GenerationBackend:
+    """Runs story generator methods inline on the calling web thread; the base for the pooled backends"""
+
+    name = 'inline'
+
+    def __init__(self, generator=None):
+        self.generator = generator
+        self.workers = 1
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._errors = 0
+        self._in_flight = 0
+        self._busy_time = 0.0
+
+    def _run(self, method, args, kwargs):
+        return _bind(self.generator, method)(*args, **kwargs)
+
+    def call(self, method, *args, **kwargs):
+        """Call generator.method(*args, **kwargs), or method(generator, *args, **kwargs) for a function, on this backend"""
+        with self._lock:
+            self._calls += 1
+            self._in_flight += 1
+        started = time.perf_counter()
+        try:
+            return self._run(method, args, kwargs)
+        except Exception:
+            with self._lock:
+                self._errors += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._busy_time += time.perf_counter() - started
+
+    def generate_story(self, prompt, genre, length):
+        return self.call('generate_story', prompt, genre, length)
+
+    def generate_variants(self, prompt, genres, lengths):
+        return self.call(generate_variants, prompt, genres, lengths)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': self.name,
+                'workers': self.workers,
+                'calls': self._calls,
+                'errors': self._errors,
+                'in_flight': self._in_flight,
+                'mean_call_ms': self._busy_time / self._calls * 1000 if self._calls else 0.0
+            }
+
+    def shutdown(self):
+        pass
+
+
+class ThreadPoolBackend(GenerationBackend):
+    """Runs the in-process generator on a fixed pool of threads
+
+    Caps how many generations run at once; only generators that release the GIL
+    (numpy, scikit-learn's sparse products) get more than one core out of it.
+    """
+
+    name = 'thread'
+
+    def __init__(self, generator, workers=None):
+        super().__init__(generator)
+        self.workers = workers or os.cpu_count() or 1
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='story-generate')
+
+    def _run(self, method, args, kwargs):
+        return self._executor.submit(_bind(self.generator, method), *args, **kwargs).result()
+
+    def shutdown(self):
+        self._executor.shutdown()
+
+
+class ProcessPoolBackend(GenerationBackend):
+    """Runs generation on a pool of warm worker processes, one GIL each
+
+    Every worker calls factory(*factory_args) once at start-up (a module-level
+    generator instance, or a generator class whose constructor loads the corpus
+    and TF-IDF index), and all workers are started before the backend is used,
+    so no request pays for loading. Arguments and stories cross the process
+    boundary pickled. load_stories() replaces the pool with freshly loaded
+    workers, which makes the backend a CorpusReloader target.
+    """
+
+    name = 'process'
+
+    def __init__(self, factory, factory_args=(), workers=None):
+        super().__init__()
+        self.factory = factory
+        self.factory_args = tuple(factory_args)
+        self.workers = workers or os.cpu_count() or 1
+        self._pool_lock = threading.Lock()
+        self._executor = self._start_pool()
+
+    def _start_pool(self):
+        # Spawned, not forked: the web process runs threads whose locks a fork could copy mid-use
+        executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=_init_worker, initargs=(self.factory, self.factory_args))
+        # Workers are spawned one per submission while none is idle, so this starts (and loads) all of them;
+        # they take far longer to boot than the loop takes to submit
+        for future in [executor.submit(_worker_pid) for _ in range(self.workers)]:
+            future.result()
+        return executor
+
+    def _run(self, method, args, kwargs):
+        executor = self._executor
+        try:
+            return executor.submit(_call_in_worker, method, args, kwargs).result()
+        except BrokenProcessPool:
+            # A worker died (killed, out of memory); fail this call but not every later one
+            with self._pool_lock:
+                if executor is self._executor:
+                    self._executor = self._start_pool()
+            raise
+        except RuntimeError:
+            # The pool was swapped by a reload between reading it and submitting
+            if executor is self._executor:
+                raise
+            return self._executor.submit(_call_in_worker, method, args, kwargs).result()
+
+    def load_stories(self):
+        """Swap in a pool of workers that loaded the corpus afresh; calls in flight finish on the old pool"""
+        with self._pool_lock:
+            executor = self._start_pool()
+            previous, self._executor = self._executor, executor
+        previous.shutdown(wait=False)
+
+    def shutdown(self):
+        self._executor.shutdown()
+
+
+def create_backend(name, generator, factory=None, factory_args=(), workers=None):
+    """Backend by name: 'inline' and 'thread' run `generator`, 'process' builds one per worker from `factory`"""
+    if name == 'inline':
+        return GenerationBackend(generator)
+    if name == 'thread':
+        return ThreadPoolBackend(generator, workers)
+    if name == 'process':
+        return ProcessPoolBackend(factory, factory_args, workers)
+    raise ValueError(f"Unknown generation backend {name!r}, expected one of {', '.join(BACKENDS)}")
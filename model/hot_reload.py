@@ -0,0 +1,168 @@
+import gc
+import os
+import signal
+import threading
+import time
+from datetime import datetime
+
+
+def _status_mb(field):
+    try:
+        with open('/proc/self/status') as f:
+            return next(int(line.split()[1]) for line in f if line.startswith(field)) / 1024
+    except (OSError, StopIteration):
+        return None
+
+
+def _reset_peak_rss():
+    """Restart VmHWM from the current RSS so the next reading is the peak of what follows (Linux only)"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _file_identity(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class CorpusReloader:
+    """Reload corpus-backed generators in the background when their data changes, without a restart
+
+    A target is anything with a load_stories() that builds its new corpus and
+    indexes off to the side and then swaps them in with one reference
+    assignment, so requests in flight finish on the snapshot they started with.
+    Reloads run on a background thread, one at a time; requests that arrive
+    while one is running are coalesced into a single follow-up reload.
+    Triggers: request_reload() (the admin endpoint), SIGHUP, and a watcher
+    polling the data files.
+    """
+
+    def __init__(self, targets, watch_paths=()):
+        self.targets = list(targets)
+        self.watch_paths = list(watch_paths)
+        self.last_report = None
+        self.reloads = 0
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._pending = None
+        self._running = False
+        self._worker = None
+        self._done = threading.Condition(self._lock)
+        self._watcher = None
+        self._stop_watching = threading.Event()
+
+    def request_reload(self, reason='manual', wait=False, timeout=None):
+        """Schedule a reload; with `wait`, block until a reload started after this call has finished"""
+        with self._lock:
+            # A reload already under way may have read the data before this call
+            target_count = self.reloads + (2 if self._running else 1)
+            self._pending = reason
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='corpus-reload', daemon=True)
+                self._worker.start()
+            if wait:
+                self._done.wait_for(lambda: self.reloads >= target_count, timeout)
+            return self.last_report
+
+    def _run(self):
+        while True:
+            with self._lock:
+                reason, self._pending = self._pending, None
+                if reason is None:
+                    self._worker = None
+                    return
+                self._running = True
+            report = self.reload_now(reason)
+            with self._lock:
+                self.last_report = report
+                self.reloads += 1
+                self._running = False
+                self._done.notify_all()
+
+    def reload_now(self, reason='manual'):
+        """Reload every target on the calling thread and return the report"""
+        with self._run_lock:
+            gc.collect()
+            rss_before = _status_mb('VmRSS')
+            peak_tracked = _reset_peak_rss()
+            started = time.perf_counter()
+            targets = []
+            for target in self.targets:
+                target_started = time.perf_counter()
+                try:
+                    target.load_stories()
+                    error = None
+                except Exception as e:
+                    error = str(e)
+                snapshot = getattr(target, 'snapshot', None)
+                targets.append({
+                    'target': type(target).__name__,
+                    'stories': len(target.stories_df) if getattr(target, 'stories_df', None) is not None else 0,
+                    'snapshot_mb': round(snapshot.nbytes / (1024 * 1024), 2) if hasattr(snapshot, 'nbytes') else None,
+                    'duration_ms': round((time.perf_counter() - target_started) * 1000, 1),
+                    'error': error
+                })
+            duration_ms = (time.perf_counter() - started) * 1000
+            peak = _status_mb('VmHWM') if peak_tracked else None
+            # The old snapshots are garbage once no request holds them
+            gc.collect()
+            rss_after = _status_mb('VmRSS')
+
+        report = {
+            'reason': reason,
+            'finished': datetime.now().isoformat(timespec='seconds'),
+            'duration_ms': round(duration_ms, 1),
+            'rss_before_mb': round(rss_before, 1) if rss_before else None,
+            'rss_after_mb': round(rss_after, 1) if rss_after else None,
+            'peak_rss_mb': round(peak, 1) if peak else None,
+            # How far above the steady footprint the process went while old and new snapshots were both alive
+            'overlap_mb': round(peak - rss_before, 1) if peak and rss_before else None,
+            'targets': targets
+        }
+        print(f"Corpus reloaded ({reason}) in {report['duration_ms']} ms, "
+              f"peak overlap {report['overlap_mb']} MB: " + ', '.join(f"{t['target']} {t['stories']} stories" for t in targets))
+        return report
+
+    def install_signal_handler(self, signum=None):
+        """Reload on `signum` (SIGHUP by default); only possible from the main thread"""
+        signum = signum or getattr(signal, 'SIGHUP', None)
+        if signum is None or threading.current_thread() is not threading.main_thread():
+            return False
+
+        def handle(received, frame):
+            # The interrupted main thread may hold our lock, so schedule from another thread
+            threading.Thread(target=self.request_reload, args=('signal',), daemon=True).start()
+
+        signal.signal(signum, handle)
+        return True
+
+    def start_watching(self, interval=2.0):
+        """Poll the watched files and reload once after any of them changes"""
+        if self._watcher is not None or not self.watch_paths:
+            return self._watcher
+
+        def run():
+            seen = [_file_identity(path) for path in self.watch_paths]
+            while not self._stop_watching.wait(interval):
+                current = [_file_identity(path) for path in self.watch_paths]
+                if current != seen:
+                    seen = current
+                    self.request_reload('file change')
+
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(target=run, name='corpus-watch', daemon=True)
+        self._watcher.start()
+        return self._watcher
+
+    def stop_watching(self):
+        if self._watcher is not None:
+            self._stop_watching.set()
+            self._watcher.join()
+            self._watcher = None
@@ -0,0 +1,123 @@
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Fingerprinted static URLs never change content, so browsers may keep them for a year without asking
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/html', 'text/css', 'text/plain', 'text/javascript',
+                          'application/javascript', 'image/svg+xml'}
+
+
+class StaticFingerprints:
+    """Content hashes of static files, for cache-busting URLs like /static/css/styles.css?v=<hash>
+
+    A hash is recomputed only when the file's size or mtime changes, so an edited
+    asset gets a new URL without a restart.
+    """
+
+    def __init__(self, static_folder, length=12):
+        self.static_folder = static_folder
+        self.length = length
+        self._hashes = {}
+        self._lock = threading.Lock()
+
+    def get(self, filename):
+        """The file's fingerprint, or None if it does not exist"""
+        path = os.path.join(self.static_folder, filename)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        key = (stat.st_size, stat.st_mtime_ns)
+        cached = self._hashes.get(filename)
+        if cached and cached[0] == key:
+            return cached[1]
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as handle:
+            for chunk in iter(lambda: handle.read(1 << 16), b''):
+                digest.update(chunk)
+        fingerprint = digest.hexdigest()[:self.length]
+        with self._lock:
+            self._hashes[filename] = (key, fingerprint)
+        return fingerprint
+
+
+class ResponseCompressor:
+    """Brotli or gzip encoding for text responses, negotiated from Accept-Encoding
+
+    Responses with an ETag (static files, /example_prompts) are the same bytes
+    every time, so they are compressed once at the highest level and served from
+    an LRU cache; one-off bodies such as generated stories use a fast level.
+    Brotli is offered only when the `brotli` package is installed.
+    """
+
+    def __init__(self, min_size=500, cache_entries=256, gzip_level=6, brotli_quality=5):
+        self.min_size = min_size
+        self.cache_entries = cache_entries
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.encodings = ['br', 'gzip'] if brotli is not None else ['gzip']
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {'compressed': 0, 'cache_hits': 0, 'bytes_in': 0, 'bytes_out': 0}
+
+    def _encode(self, data, encoding, best):
+        if encoding == 'br':
+            return brotli.compress(data, quality=11 if best else self.brotli_quality)
+        return gzip.compress(data, compresslevel=9 if best else self.gzip_level, mtime=0)
+
+    def compress(self, response, accept_encodings):
+        """Encode the response body in place if the client accepts it and it is worth it; returns the response"""
+        if (response.status_code != 200 or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES or response.is_streamed and not response.direct_passthrough):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = accept_encodings.best_match(self.encodings)
+        if encoding is None:
+            return response
+
+        etag, weak = response.get_etag()
+        key = (etag, encoding)
+        with self._lock:
+            body = self._cache.get(key) if etag else None
+            if body is not None:
+                self._cache.move_to_end(key)
+                self._counts['cache_hits'] += 1
+        if body is None:
+            # Static files arrive as a file wrapper; read them so the body can be encoded
+            response.direct_passthrough = False
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            body = self._encode(data, encoding, best=etag is not None)
+            with self._lock:
+                self._counts['compressed'] += 1
+                self._counts['bytes_in'] += len(data)
+                self._counts['bytes_out'] += len(body)
+                if etag:
+                    self._cache[key] = body
+                    if len(self._cache) > self.cache_entries:
+                        self._cache.popitem(last=False)
+        elif response.direct_passthrough:
+            # The cached copy replaces the file, which would otherwise stay open
+            response.response.close()
+            response.direct_passthrough = False
+
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        if etag:
+            # A different representation needs its own validator
+            response.set_etag(f"{etag}-{encoding}", weak=weak)
+        return response
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts, encodings=self.encodings, cached=len(self._cache),
+                        ratio=self._counts['bytes_out'] / self._counts['bytes_in'] if self._counts['bytes_in'] else 0.0)
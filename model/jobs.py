@@ -0,0 +1,187 @@
+import multiprocessing
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+
+try:
+    from model.execution import load_object
+except ImportError:
+    # Running as a script from inside model/
+    from execution import load_object
+
+
+class JobQueueFull(Exception):
+    """Raised when accepting a job would exceed the limit on items waiting to run"""
+
+
+_worker_generators = {}
+
+
+def generate_in_worker(item, template_generator='model.story_generator:story_generator'):
+    """Generate one job item inside a worker process, loading its generator once per process
+
+    `template_generator` is a "module:attribute" path that the worker imports
+    itself, since generator objects are not sent across processes.
+    """
+    engine = item.get('engine', 'template')
+    if engine not in _worker_generators:
+        if engine == 'model':
+            from model.mapped_model import DEFAULT_WEIGHTS_PATH, MappedStoryModel
+            _worker_generators[engine] = MappedStoryModel(os.environ.get('STORY_MODEL_WEIGHTS', DEFAULT_WEIGHTS_PATH))
+        else:
+            _worker_generators[engine] = load_object(template_generator)
+    return _worker_generators[engine].generate_story(item['prompt'], item['genre'], item['length'])
+
+
+class Job:
+    def __init__(self, job_id, items):
+        self.id = job_id
+        self.items = items
+        self.results = [None] * len(items)
+        self.futures = []
+        self.succeeded = 0
+        self.failed = 0
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+
+    @property
+    def done(self):
+        return self.succeeded + self.failed == len(self.items)
+
+    @property
+    def status(self):
+        if self.done:
+            return 'succeeded' if not self.failed else 'failed' if not self.succeeded else 'partial'
+        return 'running' if self.started else 'queued'
+
+
+class JobManager:
+    """Runs generation jobs (one or more items each) on a pool of background workers
+
+    Submitting only enqueues, and reading a job only copies its state, so a web
+    thread never waits on generation. Every item is its own pool task, so the
+    items of a batch run in parallel and their results appear one by one as
+    partial output. `executor` is 'thread' (run_item runs in this process, best
+    when generation releases the GIL, as the numpy model does) or 'process'
+    (run_item must be picklable, best for pure-Python generators). Finished
+    jobs are dropped `ttl` seconds after they finish.
+    """
+
+    def __init__(self, run_item, workers=2, executor='thread', ttl=3600, max_pending=1000, postprocess=None):
+        self.run_item = run_item
+        self.workers = workers
+        self.executor_kind = executor
+        self.ttl = ttl
+        self.max_pending = max_pending
+        self.postprocess = postprocess
+        if executor == 'process':
+            # Spawned, not forked: the parent runs threads whose locks a fork could copy mid-use
+            self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        elif executor == 'thread':
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='story-job')
+        else:
+            raise ValueError(f"Unknown job executor {executor!r}, expected 'thread' or 'process'")
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._submitted = 0
+        self._expired = 0
+        self._stop_janitor = threading.Event()
+        self._janitor = None
+
+    def submit(self, items):
+        """Queue a job and return its id; raises JobQueueFull instead of letting the backlog grow unbounded"""
+        with self._lock:
+            if self._pending + len(items) > self.max_pending:
+                raise JobQueueFull(f"{self._pending} job items are already waiting")
+            if self._janitor is None:
+                # Started with the first job, so merely importing the app starts no threads
+                self._janitor = threading.Thread(target=self._sweep_periodically, name='story-job-janitor', daemon=True)
+                self._janitor.start()
+            job = Job(secrets.token_hex(8), items)
+            self._jobs[job.id] = job
+            self._pending += len(items)
+            self._submitted += 1
+        for index, item in enumerate(items):
+            future = self._executor.submit(self.run_item, item)
+            job.futures.append(future)
+            future.add_done_callback(lambda future, index=index: self._item_done(job, index, future))
+        return job.id
+
+    def _item_done(self, job, index, future):
+        error = future.exception()
+        result = None
+        if error is None:
+            try:
+                result = self.postprocess(future.result()) if self.postprocess else future.result()
+            except Exception as e:
+                error = e
+        with self._lock:
+            if error is None:
+                job.results[index] = {'index': index, 'story': result}
+                job.succeeded += 1
+            else:
+                job.results[index] = {'index': index, 'error': str(error)}
+                job.failed += 1
+            job.started = job.started or time.time()
+            self._pending -= 1
+            if job.done:
+                job.finished = time.time()
+
+    def get(self, job_id):
+        """A copy of the job's state, with results so far; None if unknown or expired"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.started is None and any(future.running() for future in job.futures):
+                job.started = time.time()
+            return {
+                'id': job.id,
+                'status': job.status,
+                'total': len(job.items),
+                'succeeded': job.succeeded,
+                'failed': job.failed,
+                'created': datetime.fromtimestamp(job.created).isoformat(timespec='seconds'),
+                'started': datetime.fromtimestamp(job.started).isoformat(timespec='seconds') if job.started else None,
+                'finished': datetime.fromtimestamp(job.finished).isoformat(timespec='seconds') if job.finished else None,
+                'expires': datetime.fromtimestamp(job.finished + self.ttl).isoformat(timespec='seconds') if job.finished else None,
+                'results': list(job.results)
+            }
+
+    def sweep(self):
+        """Drop finished jobs older than the TTL; returns how many went"""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items() if job.finished and job.finished < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+            self._expired += len(expired)
+        return len(expired)
+
+    def _sweep_periodically(self):
+        while not self._stop_janitor.wait(min(60.0, max(1.0, self.ttl / 4))):
+            self.sweep()
+
+    def stats(self):
+        with self._lock:
+            statuses = {}
+            for job in self._jobs.values():
+                statuses[job.status] = statuses.get(job.status, 0) + 1
+            return {
+                'executor': self.executor_kind,
+                'workers': self.workers,
+                'ttl_seconds': self.ttl,
+                'submitted': self._submitted,
+                'pending_items': self._pending,
+                'jobs': statuses,
+                'expired': self._expired
+            }
+
+    def shutdown(self, wait=True):
+        self._stop_janitor.set()
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,226 @@
+import json
+import os
+
+import numpy as np
+
+try:
+    from model.tokenizer import StoryTokenizer
+except ImportError:
+    # Running as a script from inside model/
+    from tokenizer import StoryTokenizer
+
+MAGIC = b'STORYW01'
+# Arrays start on cache-line (and SIMD) boundaries
+ALIGNMENT = 64
+DEFAULT_WEIGHTS_PATH = 'model/trained_model/story_model.weights'
+
+
+def tokenizer_json_path(weights_path):
+    return os.path.splitext(weights_path)[0] + '.tokenizer.json'
+
+
+def write_weights(path, arrays, config):
+    """Write named arrays as one flat file: magic, header length, JSON header, then each array aligned
+
+    Written to a temporary name and renamed, so workers mapping the old file keep a consistent view.
+    """
+    header = {'config': config, 'arrays': {}}
+    offset = 0
+    for name, array in arrays.items():
+        offset = -(-offset // ALIGNMENT) * ALIGNMENT
+        header['arrays'][name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset += array.nbytes
+
+    header_bytes = json.dumps(header).encode('utf-8')
+    data_start = -(-(len(MAGIC) + 8 + len(header_bytes)) // ALIGNMENT) * ALIGNMENT
+    staging_path = path + '.tmp'
+    with open(staging_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(np.uint64(len(header_bytes)).tobytes())
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(data_start + header['arrays'][name]['offset'])
+            f.write(np.ascontiguousarray(array).tobytes())
+    os.replace(staging_path, path)
+
+
+class MappedWeights:
+    """Read-only arrays backed by a memory map of a weights file
+
+    Nothing is copied on load: every array is a view into the mapping, so pages
+    come from the OS page cache and are shared by every process mapping the file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._map = np.memmap(path, dtype=np.uint8, mode='r')
+        if bytes(self._map[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path} is not a story model weights file")
+        header_length = int(self._map[len(MAGIC):len(MAGIC) + 8].view(np.uint64)[0])
+        header_end = len(MAGIC) + 8 + header_length
+        header = json.loads(bytes(self._map[len(MAGIC) + 8:header_end]).decode('utf-8'))
+        data_start = -(-header_end // ALIGNMENT) * ALIGNMENT
+
+        self.config = header['config']
+        self.arrays = {}
+        for name, spec in header['arrays'].items():
+            dtype = np.dtype(spec['dtype'])
+            start = data_start + spec['offset']
+            count = int(np.prod(spec['shape'], dtype=np.int64))
+            self.arrays[name] = self._map[start:start + count * dtype.itemsize].view(dtype).reshape(spec['shape'])
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+
+def export_weights(model_path='model/trained_model/story_model.h5', tokenizer_path='model/trained_model/tokenizer.pickle',
+                   output_path=DEFAULT_WEIGHTS_PATH):
+    """Convert the Keras story model to a mappable weights file plus its StoryTokenizer vocab"""
+    import pickle
+    import tensorflow as tf
+    try:
+        from model.model import PromptMask, StoryGeneratorModel
+    except ImportError:
+        # Running as a script from inside model/
+        from model import PromptMask, StoryGeneratorModel
+
+    model = tf.keras.models.load_model(model_path, custom_objects={'PromptMask': PromptMask}, compile=False)
+    with open(tokenizer_path, 'rb') as handle:
+        tokenizer = pickle.load(handle)
+
+    embeddings = {layer.input.name: layer for layer in model.layers if isinstance(layer, tf.keras.layers.Embedding)}
+    lstm = next(layer for layer in model.layers if isinstance(layer, tf.keras.layers.LSTM))
+    title, content = model.get_layer('title_output'), model.get_layer('content_output')
+    dense1, dense2 = [layer for layer in model.layers
+                      if isinstance(layer, tf.keras.layers.Dense) and layer not in (title, content)]
+
+    arrays = {
+        'prompt_embedding': embeddings['prompt_input'].embeddings,
+        'genre_embedding': embeddings['genre_input'].embeddings,
+        'length_embedding': embeddings['length_input'].embeddings,
+        'lstm_kernel': lstm.cell.kernel,
+        'lstm_recurrent_kernel': lstm.cell.recurrent_kernel,
+        'lstm_bias': lstm.cell.bias,
+        'dense1_kernel': dense1.kernel, 'dense1_bias': dense1.bias,
+        'dense2_kernel': dense2.kernel, 'dense2_bias': dense2.bias,
+        'title_kernel': title.kernel, 'title_bias': title.bias,
+        'content_kernel': content.kernel, 'content_bias': content.bias
+    }
+    arrays = {name: np.asarray(variable.numpy(), dtype=np.float32) for name, variable in arrays.items()}
+
+    reference = StoryGeneratorModel()
+    config = {
+        'vocab_size': int(title.kernel.shape[1]),
+        'sequence_length': model.inputs[0].shape[1] or reference.max_sequence_length,
+        # Variable-length models skip padding in the LSTM; fixed-length ones run it
+        'masked': any(isinstance(layer, PromptMask) for layer in model.layers),
+        'genre_mapping': reference.genre_mapping,
+        'length_mapping': reference.length_mapping
+    }
+    write_weights(output_path, arrays, config)
+    StoryTokenizer.from_keras(tokenizer).save(tokenizer_json_path(output_path))
+
+    print(f"Mapped weights saved to {output_path}: {os.path.getsize(output_path) / (1024 * 1024):.1f} MB")
+    return output_path
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+class MappedStoryModel:
+    """Serves the story model in numpy from a memory-mapped weights file, without importing TensorFlow
+
+    Every worker that maps the same file shares one physical copy of the weights.
+    """
+
+    def __init__(self, weights_path=DEFAULT_WEIGHTS_PATH):
+        self.weights_path = weights_path
+        self.weights = None
+        self.tokenizer = None
+        self.load_model()
+
+    def load_model(self):
+        self.weights = MappedWeights(self.weights_path)
+        config = self.weights.config
+        self.vocab_size = config['vocab_size']
+        self.sequence_length = config['sequence_length']
+        self.masked = config['masked']
+        self.genre_mapping = config['genre_mapping']
+        self.length_mapping = config['length_mapping']
+        self.tokenizer = StoryTokenizer.load(tokenizer_json_path(self.weights_path))
+
+    def predict_batch(self, prompt_ids, genre_ids, length_ids):
+        """Title and content probabilities for padded prompt ids and (batch,) genre and length ids"""
+        w = self.weights
+        units = w['lstm_recurrent_kernel'].shape[0]
+        recurrent_kernel = w['lstm_recurrent_kernel']
+
+        if self.masked:
+            # Padding is skipped by the masked LSTM, so trailing pad steps need not run
+            used = np.flatnonzero(prompt_ids.any(axis=0))
+            prompt_ids = prompt_ids[:, :used[-1] + 1] if len(used) else prompt_ids[:, :1]
+        # Input projections of every step at once; the embedding gather only touches the prompt's rows
+        projected = w['prompt_embedding'][prompt_ids] @ w['lstm_kernel'] + w['lstm_bias']
+
+        h = np.zeros((len(prompt_ids), units), dtype=np.float32)
+        c = np.zeros_like(h)
+        for t in range(prompt_ids.shape[1]):
+            z = projected[:, t] + h @ recurrent_kernel
+            # Keras gate order: input, forget, cell, output
+            i = _sigmoid(z[:, :units])
+            f = _sigmoid(z[:, units:2 * units])
+            g = np.tanh(z[:, 2 * units:3 * units])
+            o = _sigmoid(z[:, 3 * units:])
+            c_next = f * c + i * g
+            h_next = o * np.tanh(c_next)
+            if self.masked:
+                keep = (prompt_ids[:, t] != 0)[:, None]
+                h, c = np.where(keep, h_next, h), np.where(keep, c_next, c)
+            else:
+                h, c = h_next, c_next
+
+        features = np.concatenate([h, w['genre_embedding'][genre_ids], w['length_embedding'][length_ids]], axis=1)
+        hidden = np.maximum(features @ w['dense1_kernel'] + w['dense1_bias'], 0)
+        hidden = np.maximum(hidden @ w['dense2_kernel'] + w['dense2_bias'], 0)
+        return self._softmax(hidden @ w['title_kernel'] + w['title_bias']), \
+            self._softmax(hidden @ w['content_kernel'] + w['content_bias'])
+
+    @staticmethod
+    def _softmax(logits):
+        exp = np.exp(logits - logits.max(axis=-1, keepdims=True))
+        return exp / exp.sum(axis=-1, keepdims=True)
+
+    def generate_stories(self, requests):
+        """Generate several stories with one forward pass; `requests` is a list of (prompt, genre, length)"""
+        prompt_ids = self.tokenizer.encode_batch([prompt for prompt, _, _ in requests], self.sequence_length)
+        genre_ids = np.array([self.genre_mapping[genre] for _, genre, _ in requests])
+        length_ids = np.array([self.length_mapping[length] for _, _, length in requests])
+        title_pred, content_pred = self.predict_batch(prompt_ids, genre_ids, length_ids)
+
+        return [{
+            'title': self._sequence_to_text(title_pred[i]),
+            'content': self._sequence_to_text(content_pred[i]),
+            'prompt': prompt,
+            'genre': genre,
+            'length': length
+        } for i, (prompt, genre, length) in enumerate(requests)]
+
+    def generate_story(self, prompt, genre, length):
+        return self.generate_stories([(prompt, genre, length)])[0]
+
+    def _sequence_to_text(self, sequence):
+        word_indices = np.atleast_1d(np.argmax(sequence, axis=-1))
+        return self.tokenizer.decode_batch([word_indices[word_indices < self.vocab_size]])[0]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export story_model.h5 to a memory-mappable weights file")
+    parser.add_argument('--model-path', default='model/trained_model/story_model.h5')
+    parser.add_argument('--tokenizer-path', default='model/trained_model/tokenizer.pickle')
+    parser.add_argument('--output-path', default=DEFAULT_WEIGHTS_PATH)
+    args = parser.parse_args()
+
+    export_weights(args.model_path, args.tokenizer_path, args.output_path)
@@ -4,9 +4,173 @@ from tensorflow.keras.layers import Input, LSTM, Dense, Embedding, Dropout, conc
 from tensorflow.keras.preprocessing.text import Tokenizer
 from tensorflow.keras.preprocessing.sequence import pad_sequences
 import numpy as np
-import json
 import pickle
 import os
+import threading
+from collections import OrderedDict
+
+try:
+    from model.batching import MicroBatcher
+    from model.conditioning import GENRE_MAPPING, LENGTH_MAPPING
+    from model.data_pipeline import build_dataset, fit_tokenizer, iter_records, split_paths
+    from model.decoder import LSTMDecoder
+    from model.preprocess_cache import DEFAULT_CACHE_DIR, cache_key, load_cached, save_cached
+    from model.tokenizer import StoryTokenizer
+except ImportError:
+    # Running as a script from inside model/
+    from batching import MicroBatcher
+    from conditioning import GENRE_MAPPING, LENGTH_MAPPING
+    from data_pipeline import build_dataset, fit_tokenizer, iter_records, split_paths
+    from decoder import LSTMDecoder
+    from preprocess_cache import DEFAULT_CACHE_DIR, cache_key, load_cached, save_cached
+    from tokenizer import StoryTokenizer
+
+# Sequence markers for the autoregressive decoder. They are plain words because
+# the Keras tokenizer filters out punctuation such as '<' and '>'.
+START_TOKEN = 'startseq'
+END_TOKEN = 'endseq'
+
+# Upper bound on generated content tokens per story length
+DECODE_LENGTHS = {'short': 60, 'medium': 120, 'long': 200}
+
+@tf.keras.utils.register_keras_serializable(package='story_model')
+def sequence_token_loss(y_true, y_pred):
+    """Mean negative log-likelihood of every non-padding target token under the single output distribution
+
+    The title/content heads emit one distribution over the vocabulary while the
+    targets are padded token sequences, so each real token is scored against that
+    distribution. Padding (id 0) is masked, which lets batches use any padded width.
+    """
+    y_true = tf.cast(y_true, tf.int32)
+    log_probs = tf.math.log(tf.clip_by_value(y_pred, 1e-7, 1.0))
+    token_log_probs = tf.gather(log_probs, y_true, batch_dims=1)
+    mask = tf.cast(y_true > 0, log_probs.dtype)
+    return -tf.reduce_sum(token_log_probs * mask, axis=-1) / tf.maximum(tf.reduce_sum(mask, axis=-1), 1.0)
+
+def sampled_candidates(y_true, vocab_size, num_sampled):
+    """Shared candidate classes of a sampled-softmax batch
+
+    Every target token in the batch, then up to `num_sampled` negatives drawn
+    log-uniformly (tokenizer ids are ranked by frequency, so this approximates the
+    unigram distribution). Returns (candidates, correction, target_positions):
+    the log expected count to subtract from each candidate's logit (0 for
+    targets) and the index into candidates of every nonzero target token.
+    """
+    y_true = tf.cast(y_true, tf.int64)
+    positives, target_positions = tf.unique(tf.boolean_mask(y_true, y_true > 0), out_idx=tf.int64)
+    sampled, _, sampled_expected = tf.random.log_uniform_candidate_sampler(
+        true_classes=tf.zeros([1, 1], tf.int64), num_true=1, num_sampled=num_sampled,
+        unique=True, range_max=vocab_size
+    )
+    # Negatives that are also targets in this batch are already candidates
+    is_new = tf.logical_not(tf.reduce_any(tf.equal(sampled[:, None], positives[None, :]), axis=1))
+    candidates = tf.concat([positives, tf.boolean_mask(sampled, is_new)], axis=0)
+    correction = tf.concat([
+        tf.zeros(tf.shape(positives), tf.float32),
+        tf.math.log(tf.boolean_mask(sampled_expected, is_new))
+    ], axis=0)
+    return candidates, correction, target_positions
+
+def candidate_token_loss(hidden, candidate_kernel, candidate_bias, correction, y_true, target_positions):
+    """Per-example token NLL like sequence_token_loss, with the softmax taken over the candidate columns only"""
+    mask = tf.cast(y_true, tf.int64) > 0
+    rows = tf.where(mask)[:, 0]
+    logits = tf.matmul(hidden, candidate_kernel) + candidate_bias - tf.cast(correction, hidden.dtype)
+    log_probs = tf.nn.log_softmax(logits)
+    token_log_probs = tf.gather_nd(log_probs, tf.stack([rows, target_positions], axis=1))
+    totals = tf.math.unsorted_segment_sum(token_log_probs, rows, tf.shape(y_true, out_type=tf.int64)[0])
+    return -totals / tf.maximum(tf.reduce_sum(tf.cast(mask, hidden.dtype), axis=-1), 1.0)
+
+def sampled_sequence_token_loss(hidden, kernel, bias, y_true, num_sampled):
+    """Sampled-softmax estimate of sequence_token_loss for one Dense(vocab_size) head, computed from its input
+
+    Cost grows with the candidate set instead of the vocabulary.
+    """
+    candidates, correction, target_positions = sampled_candidates(y_true, kernel.shape[1], num_sampled)
+    return candidate_token_loss(hidden, tf.gather(kernel, candidates, axis=1), tf.gather(bias, candidates),
+                                correction, y_true, target_positions)
+
+@tf.keras.utils.register_keras_serializable(package='story_model')
+class PromptMask(tf.keras.layers.Layer):
+    """Marks the non-padding prompt positions
+
+    An explicit layer rather than Embedding(mask_zero=True): Keras records the
+    latter as a bare op that legacy .h5 files cannot load back.
+    """
+
+    def call(self, inputs):
+        return tf.not_equal(inputs, 0)
+
+class SampledSoftmaxTrainer:
+    """Trains a story model's title and content heads with sampled softmax
+
+    While training, each head's weights live in a (vocab_size, units + 1) copy,
+    one row per vocabulary id holding its kernel column and bias, so a batch only
+    gathers and updates the rows of its candidates. Those rows get a lazy Adam
+    update (moments of a row only move when it is a candidate); the rest of the
+    network uses the model's compiled optimizer. sync_heads() writes the rows back
+    into the Dense layers, which inference and saving keep reading with the full softmax.
+    """
+
+    def __init__(self, model, num_sampled=512):
+        self.model = model
+        self.num_sampled = num_sampled
+        self.heads = [model.get_layer('title_output'), model.get_layer('content_output')]
+        # Both heads read the same hidden layer
+        self.hidden_model = Model(model.inputs, self.heads[0].input)
+        self.optimizer = model.optimizer
+        if not self.optimizer.built:
+            self.optimizer.build(model.trainable_variables)
+        
+        self.rows = [tf.Variable(tf.concat([tf.transpose(layer.kernel), layer.bias[:, None]], axis=1), trainable=False)
+                     for layer in self.heads]
+        self.moments = [tf.Variable(tf.zeros_like(rows), trainable=False) for rows in self.rows]
+        self.velocities = [tf.Variable(tf.zeros_like(rows), trainable=False) for rows in self.rows]
+        self._train_step = tf.function(self._step)
+
+    def train_step(self, inputs, y_title, y_content):
+        """One batch; returns the sampled (title_loss, content_loss)"""
+        return self._train_step(inputs, y_title, y_content)
+
+    def sync_heads(self):
+        for layer, rows in zip(self.heads, self.rows):
+            layer.kernel.assign(tf.transpose(rows[:, :-1]))
+            layer.bias.assign(rows[:, -1])
+
+    def _step(self, inputs, y_title, y_content):
+        targets = (y_title, y_content)
+        sampled = [sampled_candidates(y, rows.shape[0], self.num_sampled) for rows, y in zip(self.rows, targets)]
+        body_variables = self.hidden_model.trainable_variables
+        with tf.GradientTape() as tape:
+            hidden = self.hidden_model(inputs, training=True)
+            candidate_rows = []
+            losses = []
+            for rows, y, (candidates, correction, target_positions) in zip(self.rows, targets, sampled):
+                selected = tf.gather(rows, candidates)
+                tape.watch(selected)
+                candidate_rows.append(selected)
+                losses.append(tf.reduce_mean(candidate_token_loss(
+                    hidden, tf.transpose(selected[:, :-1]), selected[:, -1], correction, y, target_positions)))
+            loss = tf.add_n(losses)
+        gradients = tape.gradient(loss, body_variables + candidate_rows)
+        self.optimizer.apply_gradients(zip(gradients[:len(body_variables)], body_variables))
+        
+        step_count = tf.cast(self.optimizer.iterations, tf.float32)
+        for i, (candidates, _, _) in enumerate(sampled):
+            self._update_rows(i, candidates, gradients[len(body_variables) + i], step_count)
+        return losses[0], losses[1]
+
+    def _update_rows(self, head, candidates, gradient, step_count):
+        optimizer = self.optimizer
+        beta_1, beta_2 = optimizer.beta_1, optimizer.beta_2
+        m = beta_1 * tf.gather(self.moments[head], candidates) + (1 - beta_1) * gradient
+        v = beta_2 * tf.gather(self.velocities[head], candidates) + (1 - beta_2) * tf.square(gradient)
+        self.moments[head].scatter_update(tf.IndexedSlices(m, candidates))
+        self.velocities[head].scatter_update(tf.IndexedSlices(v, candidates))
+        
+        learning_rate = tf.cast(optimizer.learning_rate, tf.float32)
+        alpha = learning_rate * tf.sqrt(1 - tf.pow(beta_2, step_count)) / (1 - tf.pow(beta_1, step_count))
+        self.rows[head].scatter_sub(tf.IndexedSlices(alpha * m / (tf.sqrt(v) + optimizer.epsilon), candidates))
 
 class StoryGeneratorModel:
     def __init__(self, vocab_size=10000, max_sequence_length=50, embedding_dim=100, lstm_units=256):
@@ -16,19 +180,31 @@ class StoryGeneratorModel:
         self.lstm_units = lstm_units
         self.tokenizer = None
         self.model = None
-        self.genre_mapping = {
-            'fantasy': 0, 'sci-fi': 1, 'mystery': 2, 'adventure': 3,
-            'romance': 4, 'comedy': 5, 'horror': 6
-        }
-        self.length_mapping = {
-            'short': 0, 'medium': 1, 'long': 2
-        }
+        self.batcher = None
+        self.decoder_model = None
+        self.decoder = None
+        self._infer = None
+        self.text_tokenizer = None
+        self._input_dtypes = None
+        self.prompt_encoder = None
+        self.conditioned_head = None
+        self._encode_fn = None
+        self._head_fn = None
+        self.encoding_cache_size = 1024
+        self._encoding_cache = OrderedDict()
+        self._encoding_cache_lock = threading.Lock()
+        self.genre_mapping = dict(GENRE_MAPPING)
+        self.length_mapping = dict(LENGTH_MAPPING)
 
-    def build_model(self):
-        # Prompt input
-        prompt_input = Input(shape=(self.max_sequence_length,), name='prompt_input')
+    def build_model(self, variable_length=False):
+        # Prompt input. A variable-length prompt masks its padding, so the encoding
+        # does not depend on how far a batch was padded (needed for bucketed training).
+        prompt_input = Input(shape=(None if variable_length else self.max_sequence_length,), name='prompt_input')
         prompt_embedding = Embedding(self.vocab_size, self.embedding_dim)(prompt_input)
-        prompt_lstm = LSTM(self.lstm_units, return_sequences=False)(prompt_embedding)
+        if variable_length:
+            prompt_lstm = LSTM(self.lstm_units, return_sequences=False)(prompt_embedding, mask=PromptMask()(prompt_input))
+        else:
+            prompt_lstm = LSTM(self.lstm_units, return_sequences=False)(prompt_embedding)
         
         # Genre input
         genre_input = Input(shape=(1,), name='genre_input')
@@ -57,19 +233,18 @@ class StoryGeneratorModel:
             inputs=[prompt_input, genre_input, length_input],
             outputs=[title_output, content_output]
         )
+        self._infer = None
+        self._head_fn = None
         
         self.model.compile(
             optimizer='adam',
-            loss='sparse_categorical_crossentropy',
-            metrics=['accuracy']
+            loss=sequence_token_loss
         )
         
         return self.model
 
     def preprocess_data(self, data):
         prompts = [item['prompt'] for item in data]
-        genres = [self.genre_mapping[item['genre']] for item in data]
-        lengths = [self.length_mapping[item['length']] for item in data]
         titles = [item['title'] for item in data]
         contents = [item['content'] for item in data]
         
@@ -77,25 +252,64 @@ class StoryGeneratorModel:
         all_text = prompts + titles + contents
         self.tokenizer = Tokenizer(num_words=self.vocab_size, oov_token='<OOV>')
         self.tokenizer.fit_on_texts(all_text)
+        self._tokenizer_changed()
         
-        # Convert to sequences
-        prompt_sequences = self.tokenizer.texts_to_sequences(prompts)
-        title_sequences = self.tokenizer.texts_to_sequences(titles)
-        content_sequences = self.tokenizer.texts_to_sequences(contents)
+        return self.encode_data(data)
+
+    def encode_data(self, data):
+        """Padded arrays for data with the current tokenizer, e.g. a held-out split"""
+        prompts = [item['prompt'] for item in data]
+        genres = [self.genre_mapping[item['genre']] for item in data]
+        lengths = [self.length_mapping[item['length']] for item in data]
+        titles = [item['title'] for item in data]
+        contents = [item['content'] for item in data]
         
-        # Pad sequences
-        X_prompt = pad_sequences(prompt_sequences, maxlen=self.max_sequence_length, padding='post')
+        # Convert to padded sequences
+        X_prompt = self.text_tokenizer.encode_batch(prompts, self.max_sequence_length)
         X_genre = np.array(genres).reshape(-1, 1)
         X_length = np.array(lengths).reshape(-1, 1)
         
         # For training, we'll use the same input for both outputs (simplified approach)
-        y_title = pad_sequences(title_sequences, maxlen=self.max_sequence_length, padding='post')
-        y_content = pad_sequences(content_sequences, maxlen=self.max_sequence_length * 3, padding='post')
+        y_title = self.text_tokenizer.encode_batch(titles, self.max_sequence_length)
+        y_content = self.text_tokenizer.encode_batch(contents, self.max_sequence_length * 3)
         
         return [X_prompt, X_genre, X_length], [y_title, y_content]
 
-    def train(self, data, epochs=10, batch_size=32, validation_split=0.2):
+    def preprocess_file(self, data_path, cache_dir=DEFAULT_CACHE_DIR):
+        """preprocess_data for a JSON/JSONL file, memoized on disk by a hash of the file and the settings
+
+        A hit restores the tokenizer and memory-maps the padded arrays, so reruns
+        skip parsing, tokenizer fitting and padding entirely. A shuffle_split
+        directory stands for its train split.
+        """
+        splits = split_paths(data_path) if os.path.isdir(data_path) else None
+        if splits:
+            data_path = splits['train']
+        settings = {
+            'vocab_size': self.vocab_size,
+            'max_sequence_length': self.max_sequence_length,
+            'oov_token': '<OOV>',
+            'genre_mapping': self.genre_mapping,
+            'length_mapping': self.length_mapping
+        }
+        key = cache_key(data_path, settings)
+        cached = load_cached(key, cache_dir)
+        if cached is None:
+            X, y = self.preprocess_data(list(iter_records(data_path)))
+            save_cached(key, self.tokenizer, X, y, cache_dir)
+            print(f"Preprocessed {data_path} and cached it as {key}")
+            return X, y
+        
+        self.tokenizer, X, y = cached
+        self._tokenizer_changed()
+        print(f"Loaded preprocessed {data_path} from cache {key}")
+        return X, y
+
+    def train(self, data, epochs=10, batch_size=32, validation_split=0.2, num_sampled=None):
+        """Fit on in-memory data; with `num_sampled`, train the output heads with sampled softmax"""
         X, y = self.preprocess_data(data)
+        if num_sampled:
+            return self._fit_sampled(X, y, epochs, batch_size, validation_split, num_sampled)
         
         history = self.model.fit(
             X, y,
@@ -107,6 +321,97 @@ class StoryGeneratorModel:
         
         return history
 
+    def _fit_sampled(self, X, y, epochs, batch_size, validation_split, num_sampled, validation_data=None):
+        num_train = int(len(X[0]) * (1 - validation_split)) if validation_split and not validation_data else len(X[0])
+        if validation_data is None and num_train < len(X[0]):
+            validation_data = ([a[num_train:] for a in X], [a[num_train:] for a in y])
+        dataset = tf.data.Dataset.from_tensor_slices(
+            (tuple(a[:num_train] for a in X), tuple(a[:num_train] for a in y))
+        ).shuffle(num_train).batch(batch_size)
+        trainer = SampledSoftmaxTrainer(self.model, num_sampled)
+        
+        history = tf.keras.callbacks.History()
+        history.history = {}
+        for epoch in range(epochs):
+            losses = []
+            for inputs, (y_title, y_content) in dataset:
+                losses.append([float(loss) for loss in trainer.train_step(list(inputs), y_title, y_content)])
+            trainer.sync_heads()
+            title_loss, content_loss = np.mean(losses, axis=0)
+            logs = {'loss': title_loss + content_loss, 'title_output_loss': title_loss, 'content_output_loss': content_loss}
+            if validation_data is not None:
+                # Validation always uses the full softmax
+                val_logs = self.model.evaluate(*validation_data, batch_size=batch_size, verbose=0, return_dict=True)
+                logs.update({f'val_{name}': value for name, value in val_logs.items()})
+            for name, value in logs.items():
+                history.history.setdefault(name, []).append(float(value))
+            print(f"Epoch {epoch + 1}/{epochs} (sampled softmax): " + ', '.join(f"{k}={v:.4f}" for k, v in logs.items()))
+        
+        return history
+
+    def train_from_file(self, data_path, epochs=10, batch_size=32, validation_split=0.2, cache_dir=DEFAULT_CACHE_DIR,
+                        num_sampled=None):
+        """Like train, but with the data read from disk through the preprocessing cache
+
+        A directory written by data/shuffle_split.py trains on its train split
+        and validates on its validation split instead of the last rows.
+        """
+        splits = split_paths(data_path) if os.path.isdir(data_path) else None
+        X, y = self.preprocess_file(data_path, cache_dir)
+        validation_data = self.encode_data(list(iter_records(splits['validation']))) if splits else None
+        if num_sampled:
+            return self._fit_sampled(X, y, epochs, batch_size, validation_split, num_sampled, validation_data)
+        
+        history = self.model.fit(
+            X, y,
+            epochs=epochs,
+            batch_size=batch_size,
+            validation_split=0 if validation_data else validation_split,
+            validation_data=validation_data,
+            verbose=1
+        )
+        
+        return history
+
+    def train_streaming(self, data_path, epochs=10, batch_size=32, validation_split=0.2, shuffle_buffer=1000,
+                        validation_path=None):
+        """Train from a JSON/JSONL file or shard directory through the streaming tf.data pipeline
+
+        Memory stays flat as the dataset grows: the tokenizer is fitted in chunks
+        and batches are tokenized on the fly. Build the model with
+        variable_length=True to also get length-bucketed (less padded) prompts.
+        A directory written by data/shuffle_split.py trains on its train split
+        and validates on its validation split; so does an explicit
+        `validation_path`. Otherwise every k-th record is held out.
+        """
+        splits = split_paths(data_path) if os.path.isdir(data_path) else None
+        if splits:
+            data_path, validation_path = splits['train'], validation_path or splits['validation']
+        if self.tokenizer is None:
+            self.tokenizer = fit_tokenizer(data_path, self.vocab_size)
+            self._tokenizer_changed()
+        
+        holdout_every = int(round(1 / validation_split)) if validation_split and not validation_path else None
+        dataset_args = dict(
+            tokenizer=self.tokenizer, genre_mapping=self.genre_mapping,
+            length_mapping=self.length_mapping, max_sequence_length=self.max_sequence_length,
+            batch_size=batch_size, prompt_length=self.model.inputs[0].shape[1], holdout_every=holdout_every
+        )
+        train_dataset = build_dataset(data_path, shuffle_buffer=shuffle_buffer, **dataset_args)
+        if validation_path or holdout_every:
+            validation_dataset = build_dataset(validation_path or data_path, validation=True, **dataset_args)
+        else:
+            validation_dataset = None
+        
+        history = self.model.fit(
+            train_dataset,
+            epochs=epochs,
+            validation_data=validation_dataset,
+            verbose=1
+        )
+        
+        return history
+
     def save_model(self, model_path='model/trained_model/story_model.h5', tokenizer_path='model/trained_model/tokenizer.pickle'):
         if not os.path.exists('model/trained_model'):
             os.makedirs('model/trained_model')
@@ -115,42 +420,376 @@ class StoryGeneratorModel:
         
         with open(tokenizer_path, 'wb') as handle:
             pickle.dump(self.tokenizer, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        # Compact vocab for consumers that should not need TensorFlow to unpickle
+        self.text_tokenizer.save(os.path.splitext(tokenizer_path)[0] + '.json')
 
-    def load_model(self, model_path='model/trained_model/story_model.h5', tokenizer_path='model/trained_model/tokenizer.pickle'):
+    def load_model(self, model_path='model/trained_model/story_model.h5', tokenizer_path='model/trained_model/tokenizer.pickle', compile_inference=True):
         self.model = tf.keras.models.load_model(model_path)
         
         with open(tokenizer_path, 'rb') as handle:
             self.tokenizer = pickle.load(handle)
+        self._tokenizer_changed()
+        
+        if compile_inference:
+            self.compile_inference()
+
+    def compile_inference(self, warmup_batch_sizes=(1, 8, 32)):
+        """Trace the model once into a tf.function with fixed input signatures and warm it up
+
+        After this, generate_stories bypasses model.predict (which rebuilds its data
+        adapter and may retrace on every call) and tokenizes prompts in numpy.
+        """
+        model = self.model
+        signature = [
+            tf.TensorSpec([None, self.max_sequence_length], model.inputs[0].dtype, name='prompt_input'),
+            tf.TensorSpec([None, 1], model.inputs[1].dtype, name='genre_input'),
+            tf.TensorSpec([None, 1], model.inputs[2].dtype, name='length_input')
+        ]
+
+        @tf.function(input_signature=signature)
+        def infer(prompt_input, genre_input, length_input):
+            return model([prompt_input, genre_input, length_input], training=False)
+
+        self._input_dtypes = [spec.dtype.as_numpy_dtype for spec in signature]
+        self._infer = infer
+
+        # Every batch size shares the same concrete function; warming several sizes
+        # also primes the CPU kernels' per-shape caches.
+        for batch_size in warmup_batch_sizes:
+            self._infer(
+                np.zeros((batch_size, self.max_sequence_length), dtype=self._input_dtypes[0]),
+                np.zeros((batch_size, 1), dtype=self._input_dtypes[1]),
+                np.zeros((batch_size, 1), dtype=self._input_dtypes[2])
+            )
+
+        self.split_model(warmup_batch_sizes)
+        return self._infer
+
+    def split_model(self, warmup_batch_sizes=(1, 8, 32)):
+        """Split the trained model into a prompt encoder and a cheap genre/length-conditioned head
+
+        Both halves reuse the layers (and therefore the weights) of self.model, so
+        models saved with the single-graph architecture load unchanged. build_model
+        never named the embeddings, so they are keyed by the named input they read.
+        """
+        model = self.model
+        lstm_layer = next(layer for layer in model.layers if isinstance(layer, LSTM))
+        embeddings = {layer.input.name: layer for layer in model.layers if isinstance(layer, Embedding)}
+        denses = [layer for layer in model.layers if isinstance(layer, Dense)]
+        title_layer = model.get_layer('title_output')
+        content_layer = model.get_layer('content_output')
+        hidden_layers = [layer for layer in denses if layer not in (title_layer, content_layer)]
+
+        self.prompt_encoder = Model(model.inputs[0], lstm_layer.output, name='prompt_encoder')
+
+        encoded_input = Input(shape=(lstm_layer.units,), name='encoded_prompt')
+        genre_input = Input(shape=(1,), name='genre_input')
+        length_input = Input(shape=(1,), name='length_input')
+        genre_embedding = tf.keras.layers.Flatten()(embeddings['genre_input'](genre_input))
+        length_embedding = tf.keras.layers.Flatten()(embeddings['length_input'](length_input))
+        hidden = concatenate([encoded_input, genre_embedding, length_embedding])
+        # Dropout is the identity at inference, so the head only chains the Dense layers
+        for layer in hidden_layers:
+            hidden = layer(hidden)
+        self.conditioned_head = Model(
+            inputs=[encoded_input, genre_input, length_input],
+            outputs=[title_layer(hidden), content_layer(hidden)],
+            name='conditioned_head'
+        )
+
+        encoder, head = self.prompt_encoder, self.conditioned_head
+
+        @tf.function(input_signature=[tf.TensorSpec([None, self.max_sequence_length], model.inputs[0].dtype)])
+        def encode(prompt_input):
+            return encoder(prompt_input, training=False)
+
+        @tf.function(input_signature=[
+            tf.TensorSpec([None, lstm_layer.units], tf.float32),
+            tf.TensorSpec([None, 1], model.inputs[1].dtype),
+            tf.TensorSpec([None, 1], model.inputs[2].dtype)
+        ])
+        def head_fn(encoded_prompt, genre_input, length_input):
+            return head([encoded_prompt, genre_input, length_input], training=False)
+
+        self._encode_fn = encode
+        self._head_fn = head_fn
+        self._clear_encoding_cache()
+
+        for batch_size in warmup_batch_sizes:
+            encoded = self._encode_fn(np.zeros((batch_size, self.max_sequence_length), dtype=self._input_dtypes[0]))
+            self._head_fn(
+                encoded,
+                np.zeros((batch_size, 1), dtype=self._input_dtypes[1]),
+                np.zeros((batch_size, 1), dtype=self._input_dtypes[2])
+            )
+
+        return self.prompt_encoder, self.conditioned_head
+
+    def _clear_encoding_cache(self):
+        with self._encoding_cache_lock:
+            self._encoding_cache.clear()
+
+    def encode_prompts(self, prompts):
+        """Prompt encodings for a batch, served from an LRU keyed by the prompt's token ids
+
+        Keying on token ids normalizes case, punctuation and spacing exactly the way
+        the model sees them. Only distinct, uncached prompts go through the LSTM.
+        """
+        prompt_ids = self._encode_prompts(prompts)
+        keys = [row.tobytes() for row in prompt_ids]
+        encodings = [None] * len(keys)
+        missing = OrderedDict()
+
+        with self._encoding_cache_lock:
+            for i, key in enumerate(keys):
+                cached = self._encoding_cache.get(key)
+                if cached is not None:
+                    self._encoding_cache.move_to_end(key)
+                    encodings[i] = cached
+                else:
+                    missing.setdefault(key, i)
+
+        if missing:
+            computed = self._encode_fn(prompt_ids[list(missing.values())]).numpy()
+            with self._encoding_cache_lock:
+                for key, encoding in zip(missing, computed):
+                    self._encoding_cache[key] = encoding
+                    self._encoding_cache.move_to_end(key)
+                while len(self._encoding_cache) > self.encoding_cache_size:
+                    self._encoding_cache.popitem(last=False)
+            fresh = dict(zip(missing, computed))
+            encodings = [encoding if encoding is not None else fresh[key] for encoding, key in zip(encodings, keys)]
+
+        return np.stack(encodings)
+
+    def _tokenizer_changed(self):
+        """Rebuild the fast tokenizer (and drop cached encodings) after self.tokenizer was fitted or loaded"""
+        self.text_tokenizer = StoryTokenizer.from_keras(self.tokenizer)
+        self._clear_encoding_cache()
+
+    def _encode_prompts(self, prompts):
+        """Padded prompt ids, identical to texts_to_sequences followed by pad_sequences(padding='post')"""
+        dtype = self._input_dtypes[0] if self._input_dtypes else np.int32
+        return self.text_tokenizer.encode_batch(prompts, self.max_sequence_length, dtype=dtype)
 
     def generate_story(self, prompt, genre, length):
+        if self.batcher is not None:
+            return self.batcher.process((prompt, genre, length))
+        return self.generate_stories([(prompt, genre, length)])[0]
+
+    def generate_stories(self, requests):
+        """Generate several stories with a single forward pass; `requests` is a list of (prompt, genre, length)"""
         if self.model is None or self.tokenizer is None:
             raise Exception("Model not loaded. Please load the model first.")
         
-        # Preprocess inputs
-        prompt_sequence = self.tokenizer.texts_to_sequences([prompt])
-        prompt_padded = pad_sequences(prompt_sequence, maxlen=self.max_sequence_length, padding='post')
+        prompts = [prompt for prompt, _, _ in requests]
+        genre_encoded = np.array([[self.genre_mapping[genre]] for _, genre, _ in requests])
+        length_encoded = np.array([[self.length_mapping[length]] for _, _, length in requests])
         
-        genre_encoded = np.array([[self.genre_mapping[genre]]])
-        length_encoded = np.array([[self.length_mapping[length]]])
-        
-        # Generate predictions
-        title_pred, content_pred = self.model.predict([prompt_padded, genre_encoded, length_encoded])
+        if self._head_fn is not None:
+            # Split path: cached prompt encodings, then one pass through the conditioned head
+            title_pred, content_pred = self._head_fn(
+                self.encode_prompts(prompts),
+                genre_encoded.astype(self._input_dtypes[1]),
+                length_encoded.astype(self._input_dtypes[2])
+            )
+            title_pred, content_pred = title_pred.numpy(), content_pred.numpy()
+        elif self._infer is not None:
+            # Compiled path: numpy preprocessing and a direct call into the traced graph
+            title_pred, content_pred = self._infer(
+                self._encode_prompts(prompts),
+                genre_encoded.astype(self._input_dtypes[1]),
+                length_encoded.astype(self._input_dtypes[2])
+            )
+            title_pred, content_pred = title_pred.numpy(), content_pred.numpy()
+        else:
+            # Generate predictions
+            title_pred, content_pred = self.model.predict(
+                [self._encode_prompts(prompts), genre_encoded, length_encoded], batch_size=len(requests), verbose=0
+            )
         
         # Convert predictions to text
-        title = self._sequence_to_text(title_pred[0])
-        content = self._sequence_to_text(content_pred[0])
-        
-        return {
-            'title': title,
-            'content': content,
-            'prompt': prompt,
-            'genre': genre,
-            'length': length
-        }
+        stories = []
+        for i, (prompt, genre, length) in enumerate(requests):
+            stories.append({
+                'title': self._sequence_to_text(title_pred[i]),
+                'content': self._sequence_to_text(content_pred[i]),
+                'prompt': prompt,
+                'genre': genre,
+                'length': length
+            })
+        
+        return stories
+
+    def generate_variants(self, prompt, genres=None, lengths=None):
+        """Render one prompt in many genres and lengths: one prompt encode plus a single head batch"""
+        genres = genres or list(self.genre_mapping)
+        lengths = lengths or list(self.length_mapping)
+        return self.generate_stories([(prompt, genre, length) for genre in genres for length in lengths])
+
+    def enable_micro_batching(self, max_batch_size=32, max_wait_ms=5):
+        """Route generate_story through a MicroBatcher so concurrent callers share one forward pass"""
+        self.batcher = MicroBatcher(self.generate_stories, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+        return self.batcher
+
+    def build_decoder_model(self):
+        """Seq2seq variant: the prompt encoder conditions an LSTM decoder that emits content token by token"""
+        prompt_input = Input(shape=(self.max_sequence_length,), name='prompt_input')
+        genre_input = Input(shape=(1,), name='genre_input')
+        length_input = Input(shape=(1,), name='length_input')
+        decoder_input = Input(shape=(None,), name='decoder_input')
+        
+        # Encoder
+        prompt_embedding = Embedding(self.vocab_size, self.embedding_dim, name='encoder_embedding')(prompt_input)
+        _, state_h, state_c = LSTM(self.lstm_units, return_state=True, name='encoder_lstm')(prompt_embedding)
+        
+        # Genre and length condition the decoder's initial state
+        genre_embedding = tf.keras.layers.Flatten()(Embedding(7, 10, name='decoder_genre_embedding')(genre_input))
+        length_embedding = tf.keras.layers.Flatten()(Embedding(3, 5, name='decoder_length_embedding')(length_input))
+        init_h = Dense(self.lstm_units, activation='tanh', name='decoder_init_h')(
+            concatenate([state_h, genre_embedding, length_embedding]))
+        init_c = Dense(self.lstm_units, name='decoder_init_c')(
+            concatenate([state_c, genre_embedding, length_embedding]))
+        
+        # Decoder (teacher forcing during training)
+        decoder_embedding = Embedding(self.vocab_size, self.embedding_dim, name='decoder_embedding')(decoder_input)
+        decoder_sequence = LSTM(self.lstm_units, return_sequences=True, name='decoder_lstm')(
+            decoder_embedding, initial_state=[init_h, init_c])
+        decoder_output = Dense(self.vocab_size, activation='softmax', name='decoder_output')(decoder_sequence)
+        
+        self.decoder_model = Model(
+            inputs=[prompt_input, genre_input, length_input, decoder_input],
+            outputs=decoder_output
+        )
+        
+        self.decoder_model.compile(
+            optimizer='adam',
+            loss='sparse_categorical_crossentropy',
+            metrics=['accuracy']
+        )
+        
+        return self.decoder_model
+
+    def preprocess_decoder_data(self, data, max_decode_length=DECODE_LENGTHS['long']):
+        """Build teacher-forcing inputs: decoder input is START + content, target is content + END"""
+        prompts = [item['prompt'] for item in data]
+        genres = [self.genre_mapping[item['genre']] for item in data]
+        lengths = [self.length_mapping[item['length']] for item in data]
+        titles = [item['title'] for item in data]
+        contents = [f"{START_TOKEN} {item['content']} {END_TOKEN}" for item in data]
+        
+        # Wrapping every content text keeps the markers among the most frequent words, inside num_words
+        if self.tokenizer is None or END_TOKEN not in self.tokenizer.word_index:
+            self.tokenizer = Tokenizer(num_words=self.vocab_size, oov_token='<OOV>')
+            self.tokenizer.fit_on_texts(prompts + titles + contents)
+            self._tokenizer_changed()
+        
+        content_sequences = self.text_tokenizer.texts_to_sequences(contents)
+        
+        X_prompt = self.text_tokenizer.encode_batch(prompts, self.max_sequence_length)
+        X_genre = np.array(genres).reshape(-1, 1)
+        X_length = np.array(lengths).reshape(-1, 1)
+        
+        # Long stories are cut to max_decode_length, keeping the END marker as the last target
+        decoder_in_sequences = []
+        decoder_target_sequences = []
+        for sequence in content_sequences:
+            inputs, targets = sequence[:-1], sequence[1:]
+            if len(inputs) > max_decode_length:
+                inputs = inputs[:max_decode_length]
+                targets = targets[:max_decode_length - 1] + [sequence[-1]]
+            decoder_in_sequences.append(inputs)
+            decoder_target_sequences.append(targets)
+        
+        decoder_in = pad_sequences(decoder_in_sequences, maxlen=max_decode_length, padding='post')
+        decoder_target = pad_sequences(decoder_target_sequences, maxlen=max_decode_length, padding='post')
+        
+        return [X_prompt, X_genre, X_length, decoder_in], decoder_target
+
+    def train_decoder(self, data, epochs=10, batch_size=32, validation_split=0.2):
+        X, y = self.preprocess_decoder_data(data)
+        
+        history = self.decoder_model.fit(
+            X, y,
+            epochs=epochs,
+            batch_size=batch_size,
+            validation_split=validation_split,
+            verbose=1
+        )
+        
+        self._build_decoder()
+        return history
+
+    def save_decoder(self, decoder_path='model/trained_model/story_decoder.h5', tokenizer_path='model/trained_model/tokenizer.pickle'):
+        if not os.path.exists('model/trained_model'):
+            os.makedirs('model/trained_model')
+            
+        self.decoder_model.save(decoder_path)
+        
+        with open(tokenizer_path, 'wb') as handle:
+            pickle.dump(self.tokenizer, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        self.text_tokenizer.save(os.path.splitext(tokenizer_path)[0] + '.json')
+
+    def load_decoder(self, decoder_path='model/trained_model/story_decoder.h5', tokenizer_path='model/trained_model/tokenizer.pickle'):
+        self.decoder_model = tf.keras.models.load_model(decoder_path)
+        
+        with open(tokenizer_path, 'rb') as handle:
+            self.tokenizer = pickle.load(handle)
+        self._tokenizer_changed()
+        
+        self._build_decoder()
+
+    def _build_decoder(self):
+        word_index = self.tokenizer.word_index
+        if START_TOKEN not in word_index or END_TOKEN not in word_index:
+            raise Exception("Tokenizer has no start/end markers. Train it with preprocess_decoder_data.")
+        self.decoder = LSTMDecoder.from_keras_model(self.decoder_model, word_index[START_TOKEN], word_index[END_TOKEN])
+        return self.decoder
+
+    def decode_stories(self, requests, strategy='greedy', top_k=10, beam_width=4, temperature=1.0, seed=None):
+        """Autoregressively generate content for a batch of (prompt, genre, length) requests
+
+        `strategy` is 'greedy', 'top_k' or 'beam'. All requests (and beams) are
+        decoded together, each for at most DECODE_LENGTHS[length] tokens.
+        """
+        if self.decoder is None or self.tokenizer is None:
+            raise Exception("Decoder not loaded. Please load or train the decoder first.")
+        
+        prompt_ids = self._encode_prompts([prompt for prompt, _, _ in requests])
+        genre_ids = [self.genre_mapping[genre] for _, genre, _ in requests]
+        length_ids = [self.length_mapping[length] for _, _, length in requests]
+        max_length = max(DECODE_LENGTHS[length] for _, _, length in requests)
+        
+        sequences = self.decoder.decode(
+            prompt_ids, genre_ids, length_ids, max_length=max_length, strategy=strategy,
+            top_k=top_k, beam_width=beam_width, temperature=temperature, seed=seed
+        )
+        
+        stories = []
+        for (prompt, genre, length), sequence in zip(requests, sequences):
+            content = self._ids_to_text(sequence[:DECODE_LENGTHS[length]])
+            stories.append({
+                'title': f"The {genre.title()} Adventure",
+                'content': content if content else f"This is a story about {prompt}. In the world of {genre}, anything is possible.",
+                'prompt': prompt,
+                'genre': genre,
+                'length': length,
+                'source': f'decoder_{strategy}'
+            })
+        
+        return stories
+
+    def _ids_to_text(self, ids):
+        words = []
+        for idx in ids:
+            word = self.tokenizer.index_word.get(idx, '')
+            if word and word not in ('<OOV>', START_TOKEN, END_TOKEN):
+                words.append(word)
+        return ' '.join(words)
 
     def _sequence_to_text(self, sequence):
         # Convert probability sequence to text
-        word_indices = np.argmax(sequence, axis=-1)
+        word_indices = np.atleast_1d(np.argmax(sequence, axis=-1))
         words = []
         
         for idx in word_indices:
@@ -162,16 +801,14 @@ class StoryGeneratorModel:
         return ' '.join(words)
 
 def train_model():
-    # Load synthetic data
-    with open('data/training_data.json', 'r') as f:
-        data = json.load(f)
-    
-    # Initialize and train model
+    # Initialize and train model, streaming the synthetic data from disk
     model = StoryGeneratorModel()
-    model.build_model()
+    model.build_model(variable_length=True)
     
     print("Training model...")
-    history = model.train(data, epochs=5, batch_size=32)
+    # Prefer the shuffled train/validation shards from data/shuffle_split.py when they exist
+    data_path = 'data/splits' if split_paths('data/splits') else 'data/training_data.jsonl'
+    history = model.train_streaming(data_path, epochs=5, batch_size=32)
     
     # Save model
     model.save_model()
@@ -179,5 +816,21 @@ def train_model():
     
     return model, history
 
+def train_decoder_model():
+    # Load synthetic data
+    data = list(iter_records('data/training_data.jsonl'))
+    
+    # Initialize and train the autoregressive decoder
+    model = StoryGeneratorModel()
+    model.build_decoder_model()
+    
+    print("Training decoder...")
+    history = model.train_decoder(data, epochs=5, batch_size=32)
+    
+    model.save_decoder()
+    print("Decoder trained and saved successfully!")
+    
+    return model, history
+
 if __name__ == "__main__":
     train_model()
\ No newline at end of file
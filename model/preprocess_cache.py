@@ -0,0 +1,60 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from tensorflow.keras.preprocessing.text import tokenizer_from_json
+
+# Bump when the preprocessing itself changes so stale caches are not reused
+CACHE_VERSION = 1
+ARRAY_NAMES = ('X_prompt', 'X_genre', 'X_length', 'y_title', 'y_content')
+DEFAULT_CACHE_DIR = 'model/trained_model/preprocess_cache'
+
+
+def cache_key(data_path, settings):
+    """Hash of the raw data file plus every setting that changes the tokenized arrays"""
+    digest = hashlib.sha256()
+    if os.path.isdir(data_path):
+        # A shard directory: its manifest already carries every shard's checksum
+        data_path = os.path.join(data_path, 'manifest.json')
+    with open(data_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    digest.update(json.dumps(dict(settings, cache_version=CACHE_VERSION), sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()[:24]
+
+
+def load_cached(key, cache_dir=DEFAULT_CACHE_DIR):
+    """Return (tokenizer, [X_prompt, X_genre, X_length], [y_title, y_content]) or None on a miss
+
+    Arrays are memory-mapped read-only, so a hit costs no parsing and pages are
+    only read as training touches them.
+    """
+    entry = os.path.join(cache_dir, key)
+    if not os.path.isdir(entry):
+        return None
+    with open(os.path.join(entry, 'tokenizer.json'), 'r') as f:
+        tokenizer = tokenizer_from_json(f.read())
+    arrays = [np.load(os.path.join(entry, f'{name}.npy'), mmap_mode='r') for name in ARRAY_NAMES]
+    return tokenizer, arrays[:3], arrays[3:]
+
+
+def save_cached(key, tokenizer, X, y, cache_dir=DEFAULT_CACHE_DIR):
+    """Write one cache entry; the directory only appears once it is complete"""
+    os.makedirs(cache_dir, exist_ok=True)
+    entry = os.path.join(cache_dir, key)
+    staging = tempfile.mkdtemp(prefix=f'.{key}-', dir=cache_dir)
+    try:
+        with open(os.path.join(staging, 'tokenizer.json'), 'w') as f:
+            f.write(tokenizer.to_json())
+        for name, array in zip(ARRAY_NAMES, list(X) + list(y)):
+            np.save(os.path.join(staging, f'{name}.npy'), np.ascontiguousarray(array))
+        os.rename(staging, entry)
+    except OSError:
+        # Another run finished the same entry first
+        shutil.rmtree(staging, ignore_errors=True)
+        if not os.path.isdir(entry):
+            raise
+    return entry
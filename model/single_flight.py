@@ -0,0 +1,63 @@
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time; callers arriving while it runs wait and share its result
+
+    Unlike a cache, nothing is kept once the call finishes: the next request for
+    the key runs again. Exceptions are shared the same way as results.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._executions = 0
+        self._coalesced = 0
+        self._errors = 0
+        self._largest_group = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        """Return (result, shared); shared is True when the result came from another caller's call"""
+        with self._lock:
+            self._requests += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+                call.group_size = 1
+                self._executions += 1
+            else:
+                self._coalesced += 1
+                call.group_size += 1
+                self._largest_group = max(self._largest_group, call.group_size)
+
+        if not leader:
+            return call.result(), True
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            # Waiters must be released whatever happened, or they would block forever
+            with self._lock:
+                self._errors += 1
+                del self._calls[key]
+            call.set_exception(e)
+            raise
+        with self._lock:
+            del self._calls[key]
+        call.set_result(result)
+        return result, False
+
+    def stats(self):
+        with self._lock:
+            return {
+                'requests': self._requests,
+                'executions': self._executions,
+                'coalesced': self._coalesced,
+                'coalesced_ratio': self._coalesced / self._requests if self._requests else 0.0,
+                'errors': self._errors,
+                'in_flight': len(self._calls),
+                'largest_group': self._largest_group
+            }
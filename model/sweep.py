@@ -0,0 +1,224 @@
+"""Hyperparameter sweep for StoryGeneratorModel.
+
+Trials run in a pool of worker processes. Each worker is pinned to its own set of
+cores, with TensorFlow's thread pools sized to match, so trials do not
+oversubscribe the machine. The data file is preprocessed once per distinct
+(vocab_size, max_sequence_length) before any trial starts; trials then
+memory-map the same cached arrays.
+
+Usage: python -m model.sweep --spec sweep.json [--data data/training_data.jsonl] [--threads-per-trial 2]
+
+A spec is JSON:
+    {"search": "grid", "params": {"lstm_units": [128, 256], "embedding_dim": [64, 100]}, "epochs": 3}
+    {"search": "random", "trials": 8, "seed": 0,
+     "params": {"vocab_size": [2000, 5000], "lstm_units": {"low": 64, "high": 512, "log": true}}}
+Each param is a constant, a list of choices, or (random search only) an integer range.
+"""
+import argparse
+import csv
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    from model.preprocess_cache import DEFAULT_CACHE_DIR
+    from model.training import configure_threads, peak_rss_mb
+except ImportError:
+    # Running as a script from inside model/
+    from preprocess_cache import DEFAULT_CACHE_DIR
+    from training import configure_threads, peak_rss_mb
+
+SEARCHABLE_PARAMS = ('vocab_size', 'max_sequence_length', 'embedding_dim', 'lstm_units')
+RESULT_COLUMNS = ('trial', 'vocab_size', 'max_sequence_length', 'embedding_dim', 'lstm_units', 'val_loss',
+                  'train_seconds', 'parameters', 'model_mb', 'latency_p50_ms', 'latency_p95_ms', 'peak_rss_mb',
+                  'cores', 'error')
+
+
+def expand_spec(spec):
+    """Trial parameter dicts for a grid or random search spec"""
+    params = spec.get('params', {})
+    unknown = set(params) - set(SEARCHABLE_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown sweep params {sorted(unknown)}; searchable: {', '.join(SEARCHABLE_PARAMS)}")
+
+    search = spec.get('search', 'grid')
+    if search == 'grid':
+        names = sorted(params)
+        choices = [params[name] if isinstance(params[name], list) else [params[name]] for name in names]
+        if any(isinstance(choice, dict) for values in choices for choice in values):
+            raise ValueError("Ranges are only supported by random search; list the grid values instead")
+        return [dict(zip(names, values)) for values in itertools.product(*choices)]
+    if search != 'random':
+        raise ValueError(f"Unknown search {search!r}; use 'grid' or 'random'")
+
+    rng = random.Random(spec.get('seed', 0))
+    trials = []
+    for _ in range(spec.get('trials', 10)):
+        trial = {}
+        for name in sorted(params):
+            choice = params[name]
+            if isinstance(choice, list):
+                trial[name] = rng.choice(choice)
+            elif isinstance(choice, dict):
+                low, high = choice['low'], choice['high']
+                if choice.get('log'):
+                    trial[name] = int(round(math.exp(rng.uniform(math.log(low), math.log(high)))))
+                else:
+                    trial[name] = rng.randint(low, high)
+            else:
+                trial[name] = choice
+        trials.append(trial)
+    return trials
+
+
+def core_slots(threads_per_trial, workers=None):
+    """Disjoint lists of CPU ids, one per worker"""
+    cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(range(os.cpu_count() or 1))
+    threads_per_trial = max(1, min(threads_per_trial, len(cpus)))
+    slots = [cpus[i:i + threads_per_trial] for i in range(0, len(cpus) - threads_per_trial + 1, threads_per_trial)]
+    return slots[:workers] if workers else slots
+
+
+def _init_worker(slots):
+    # Each worker takes one slot for its lifetime; thread pools must be sized before TensorFlow runs anything
+    cores = slots.get()
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cores)
+    configure_threads(intra_op=len(cores), inter_op=1)
+
+
+def run_trial(trial_id, params, data_path, settings):
+    """Train one configuration and measure it; runs inside a worker process"""
+    import numpy as np
+    import tensorflow as tf
+    try:
+        from model.model import StoryGeneratorModel
+    except ImportError:
+        from model import StoryGeneratorModel
+
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else []
+    result = dict(params, trial=trial_id, cores=' '.join(map(str, cores)))
+    try:
+        tf.keras.utils.set_random_seed(settings['seed'])
+        model = StoryGeneratorModel(**params)
+        model.build_model()
+        result.update({name: getattr(model, name) for name in SEARCHABLE_PARAMS})
+
+        start = time.perf_counter()
+        history = model.train_from_file(data_path, epochs=settings['epochs'], batch_size=settings['batch_size'],
+                                        validation_split=settings['validation_split'],
+                                        cache_dir=settings['cache_dir'], num_sampled=settings['num_sampled'])
+        result['train_seconds'] = round(time.perf_counter() - start, 2)
+        val_loss = history.history.get('val_loss')
+        result['val_loss'] = round(val_loss[-1], 4) if val_loss else None
+        result['parameters'] = model.model.count_params()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'story_model.h5')
+            model.model.save(path)
+            result['model_mb'] = round(os.path.getsize(path) / (1024 * 1024), 2)
+
+        # Single-request latency through the same compiled path the app serves with
+        model.compile_inference(warmup_batch_sizes=(1,))
+        latencies = []
+        for _ in range(settings['latency_runs']):
+            start = time.perf_counter()
+            model.generate_story("A detective who can speak to ghosts", 'mystery', 'short')
+            latencies.append((time.perf_counter() - start) * 1000)
+        result['latency_p50_ms'] = round(float(np.percentile(latencies, 50)), 2)
+        result['latency_p95_ms'] = round(float(np.percentile(latencies, 95)), 2)
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    finally:
+        tf.keras.backend.clear_session()
+    result['peak_rss_mb'] = round(peak_rss_mb(), 1)
+    return result
+
+
+def prepare_data(trials, data_path, cache_dir):
+    """Fill the preprocessing cache for every distinct tokenization, so trials only memory-map it"""
+    try:
+        from model.model import StoryGeneratorModel
+    except ImportError:
+        from model import StoryGeneratorModel
+
+    prepared = set()
+    for trial in trials:
+        model = StoryGeneratorModel(**{name: trial[name] for name in ('vocab_size', 'max_sequence_length') if name in trial})
+        if (model.vocab_size, model.max_sequence_length) not in prepared:
+            model.preprocess_file(data_path, cache_dir)
+            prepared.add((model.vocab_size, model.max_sequence_length))
+
+
+def run_sweep(spec, data_path='data/training_data.jsonl', output_path='model/trained_model/sweep_results.csv',
+              threads_per_trial=1, workers=None, cache_dir=DEFAULT_CACHE_DIR):
+    """Run every trial of `spec` and write the results table; returns the rows sorted by validation loss"""
+    trials = expand_spec(spec)
+    settings = {
+        'epochs': spec.get('epochs', 3),
+        'batch_size': spec.get('batch_size', 32),
+        'validation_split': spec.get('validation_split', 0.2),
+        'num_sampled': spec.get('num_sampled'),
+        'seed': spec.get('seed', 0),
+        'latency_runs': spec.get('latency_runs', 50),
+        'cache_dir': cache_dir
+    }
+    prepare_data(trials, data_path, cache_dir)
+
+    slots = core_slots(threads_per_trial, workers)
+    context = multiprocessing.get_context('spawn')
+    slot_queue = context.Queue()
+    for cores in slots:
+        slot_queue.put(cores)
+    print(f"Running {len(trials)} trials on {len(slots)} workers, {len(slots[0])} core(s) each")
+
+    results = []
+    with ProcessPoolExecutor(max_workers=len(slots), mp_context=context,
+                             initializer=_init_worker, initargs=(slot_queue,)) as pool:
+        futures = [pool.submit(run_trial, i, params, data_path, settings) for i, params in enumerate(trials)]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            print(f"Trial {result['trial']} {json.dumps(trials[result['trial']])}: "
+                  f"{result.get('error') or 'val_loss=%s in %ss' % (result['val_loss'], result['train_seconds'])}")
+
+    results.sort(key=lambda r: (r.get('val_loss') is None, r.get('val_loss') or 0.0))
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(output_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(results)
+    return results
+
+
+def print_table(results):
+    columns = [c for c in RESULT_COLUMNS if c not in ('cores', 'error') and any(c in r for r in results)]
+    widths = {c: max(len(c), *(len(str(r.get(c, ''))) for r in results)) for c in columns}
+    print('  '.join(c.rjust(widths[c]) for c in columns))
+    for result in results:
+        print('  '.join(str(result.get(c, '')).rjust(widths[c]) for c in columns))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Grid or random hyperparameter search for the story model")
+    parser.add_argument('--spec', required=True, help="JSON sweep spec")
+    parser.add_argument('--data', default='data/training_data.jsonl')
+    parser.add_argument('--output', default='model/trained_model/sweep_results.csv')
+    parser.add_argument('--threads-per-trial', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=None, help="defaults to cores / threads-per-trial")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    args = parser.parse_args()
+
+    with open(args.spec, 'r') as f:
+        spec = json.load(f)
+    results = run_sweep(spec, args.data, args.output, args.threads_per_trial, args.workers, args.cache_dir)
+    print_table(results)
+    print(f"Results written to {args.output}")
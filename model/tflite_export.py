@@ -0,0 +1,156 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+try:
+    from model.conditioning import GENRE_MAPPING, LENGTH_MAPPING
+    from model.tokenizer import StoryTokenizer
+except ImportError:
+    # Running as a script from inside model/
+    from conditioning import GENRE_MAPPING, LENGTH_MAPPING
+    from tokenizer import StoryTokenizer
+
+# The lightweight interpreter is preferred; full TensorFlow is only a last resort
+try:
+    from ai_edge_litert.interpreter import Interpreter
+except ImportError:
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        Interpreter = None
+
+
+def export_tflite(model_path='model/trained_model/story_model.h5', tokenizer_path='model/trained_model/tokenizer.pickle',
+                  output_path='model/trained_model/story_model.tflite', quantization='dynamic', sequence_length=50):
+    """Convert the Keras story model to a quantized TFLite flatbuffer
+
+    `quantization` is 'dynamic' (int8 weights, float activations), 'float16'
+    (half-precision weights) or None for a plain float32 export. The tokenizer is
+    written next to the model as a StoryTokenizer vocab file, so the serving side
+    never has to unpickle a Keras object. `sequence_length` fixes the prompt width of models built with a
+    variable-length prompt input.
+    """
+    import pickle
+    import tensorflow as tf
+    try:
+        from model.model import PromptMask
+    except ImportError:
+        # Running as a script from inside model/
+        from model import PromptMask
+
+    model = tf.keras.models.load_model(model_path, custom_objects={'PromptMask': PromptMask}, compile=False)
+    with open(tokenizer_path, 'rb') as handle:
+        tokenizer = pickle.load(handle)
+
+    sequence_length = model.inputs[0].shape[1] or sequence_length
+    signature = [
+        tf.TensorSpec([1, sequence_length], tf.int32, name='prompt_input'),
+        tf.TensorSpec([1, 1], tf.int32, name='genre_input'),
+        tf.TensorSpec([1, 1], tf.int32, name='length_input')
+    ]
+
+    def serve(prompt_input, genre_input, length_input):
+        title, content = model([prompt_input, genre_input, length_input], training=False)
+        return {'title_output': title, 'content_output': content}
+
+    # Export through a SavedModel archive with a fixed batch of 1: the converter
+    # then freezes the weights into the flatbuffer and can lower the LSTM loop.
+    saved_model_dir = tempfile.mkdtemp(prefix='story_model_savedmodel_')
+    archive = tf.keras.export.ExportArchive()
+    archive.track(model)
+    archive.add_endpoint('serving_default', serve, input_signature=signature)
+    archive.write_out(saved_model_dir)
+    converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_dir)
+    if quantization in ('dynamic', 'float16'):
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+
+    try:
+        tflite_model = converter.convert()
+    finally:
+        shutil.rmtree(saved_model_dir, ignore_errors=True)
+    with open(output_path, 'wb') as handle:
+        handle.write(tflite_model)
+
+    StoryTokenizer.from_keras(tokenizer).save(tokenizer_json_path(output_path))
+
+    print(f"TFLite model ({quantization or 'float32'}) saved to {output_path}: {len(tflite_model) / 1024:.0f} KB")
+    return output_path
+
+
+def tokenizer_json_path(tflite_path):
+    return os.path.splitext(tflite_path)[0] + '.tokenizer.json'
+
+
+class TFLiteStoryModel:
+    """Serves the exported story model through the TFLite interpreter, without importing TensorFlow"""
+
+    def __init__(self, model_path='model/trained_model/story_model.tflite', num_threads=None):
+        self.model_path = model_path
+        self.num_threads = num_threads
+        self.interpreter = None
+        self.tokenizer = None
+        self.load_model()
+
+    def load_model(self):
+        if Interpreter is None:
+            # Fall back to the interpreter bundled with TensorFlow
+            import tensorflow as tf
+            interpreter_class = tf.lite.Interpreter
+        else:
+            interpreter_class = Interpreter
+
+        self.interpreter = interpreter_class(model_path=self.model_path, num_threads=self.num_threads)
+        self.interpreter.allocate_tensors()
+        self._runner = self.interpreter.get_signature_runner()
+        self.sequence_length = self._runner.get_input_details()['prompt_input']['shape'][1]
+        self.vocab_size = self._runner.get_output_details()['title_output']['shape'][-1]
+
+        # Also reads the Keras tokenizer JSON written by earlier exports
+        self.tokenizer = StoryTokenizer.load(tokenizer_json_path(self.model_path))
+
+    def encode_prompt(self, prompt):
+        """Same ids as the Keras texts_to_sequences + pad_sequences(padding='post') pipeline"""
+        return self.tokenizer.encode_batch([prompt], self.sequence_length, dtype=np.int32)
+
+    def predict(self, prompt, genre, length):
+        """Return the (title, content) probability vectors for one request"""
+        outputs = self._runner(
+            prompt_input=self.encode_prompt(prompt),
+            genre_input=np.array([[GENRE_MAPPING[genre]]], dtype=np.int32),
+            length_input=np.array([[LENGTH_MAPPING[length]]], dtype=np.int32)
+        )
+        return outputs['title_output'][0], outputs['content_output'][0]
+
+    def generate_story(self, prompt, genre, length):
+        title_pred, content_pred = self.predict(prompt, genre, length)
+        return {
+            'title': self._sequence_to_text(title_pred),
+            'content': self._sequence_to_text(content_pred),
+            'prompt': prompt,
+            'genre': genre,
+            'length': length
+        }
+
+    def _sequence_to_text(self, sequence):
+        word_indices = np.atleast_1d(np.argmax(sequence, axis=-1))
+        return self.tokenizer.decode_batch([word_indices[word_indices < self.vocab_size]])[0]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export story_model.h5 to a quantized TFLite model")
+    parser.add_argument('--model-path', default='model/trained_model/story_model.h5')
+    parser.add_argument('--tokenizer-path', default='model/trained_model/tokenizer.pickle')
+    parser.add_argument('--output-path', default='model/trained_model/story_model.tflite')
+    parser.add_argument('--quantization', choices=['none', 'dynamic', 'float16'], default='dynamic')
+    parser.add_argument('--sequence-length', type=int, default=50)
+    args = parser.parse_args()
+
+    export_tflite(args.model_path, args.tokenizer_path, args.output_path,
+                  quantization=None if args.quantization == 'none' else args.quantization,
+                  sequence_length=args.sequence_length)
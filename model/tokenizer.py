@@ -0,0 +1,151 @@
+import itertools
+import json
+
+import numpy as np
+
+# Same defaults as tf.keras.preprocessing.text.Tokenizer
+DEFAULT_FILTERS = '!"#$%&()*+,-./:;<=>?@[\\]^_`{|}~\t\n'
+# Joins a batch into one string so lowercasing and filtering run once per batch
+_BATCH_SEPARATOR = '\x00'
+
+
+def _ranked_words(word_index, num_words):
+    """Words ordered by id. Ids at or past num_words encode exactly like unknown words, so they are not kept."""
+    words = sorted(word_index, key=word_index.get)
+    return words[:num_words - 1] if num_words else words
+
+
+class StoryTokenizer:
+    """Word-level tokenizer with the same ids as the Keras Tokenizer, without importing TensorFlow
+
+    The vocabulary is a plain list of words ordered by id (id = position + 1), so
+    the JSON file is compact and loads in milliseconds. encode_batch and
+    decode_batch work on whole lists of texts at once.
+    """
+
+    def __init__(self, words=(), num_words=None, oov_token='<OOV>', filters=DEFAULT_FILTERS, lower=True, split=' '):
+        self.words = list(words)
+        self.num_words = num_words
+        self.oov_token = oov_token
+        self.filters = filters
+        self.lower = lower
+        self.split = split
+        self._translate_table = str.maketrans({c: split for c in filters})
+
+        self.word_index = {word: index for index, word in enumerate(self.words, start=1)}
+        self.oov_index = self.word_index.get(oov_token) if oov_token else None
+        # Ids at or past num_words collapse to OOV (or are dropped) exactly as in texts_to_sequences
+        self._word_ids = {}
+        for word, index in self.word_index.items():
+            if num_words and index >= num_words:
+                if self.oov_index is not None:
+                    self._word_ids[word] = self.oov_index
+            else:
+                self._word_ids[word] = index
+
+        # Decoding table: id -> word. Ids outside num_words read as the OOV token, or
+        # as nothing without one, like sequences_to_texts.
+        self._id_words = dict(enumerate(self.words, start=1))
+        if num_words:
+            for index in range(num_words, len(self.words) + 1):
+                if self.oov_index is not None:
+                    self._id_words[index] = oov_token
+                else:
+                    del self._id_words[index]
+
+    @classmethod
+    def from_keras(cls, tokenizer):
+        return cls(_ranked_words(tokenizer.word_index, tokenizer.num_words), num_words=tokenizer.num_words,
+                   oov_token=tokenizer.oov_token, filters=tokenizer.filters, lower=tokenizer.lower,
+                   split=tokenizer.split)
+
+    @classmethod
+    def load(cls, path):
+        """Load a vocab file written by save(), or a Keras tokenizer.to_json() export"""
+        with open(path, 'r') as handle:
+            config = json.load(handle)
+
+        if config.get('class_name') == 'Tokenizer':
+            config = config['config']
+            word_index = json.loads(config['word_index'])
+            return cls(_ranked_words(word_index, config['num_words']), num_words=config['num_words'],
+                       oov_token=config['oov_token'], filters=config['filters'],
+                       lower=config['lower'], split=config['split'])
+
+        return cls(config['words'], num_words=config['num_words'], oov_token=config['oov_token'],
+                   filters=config['filters'], lower=config['lower'], split=config['split'])
+
+    def save(self, path):
+        config = {
+            'num_words': self.num_words,
+            'oov_token': self.oov_token,
+            'filters': self.filters,
+            'lower': self.lower,
+            'split': self.split,
+            'words': self.words
+        }
+        with open(path, 'w') as handle:
+            json.dump(config, handle, ensure_ascii=False, separators=(',', ':'))
+
+    def _normalized(self, texts):
+        """Lowercase and strip the filter characters of a whole batch in two C-level calls"""
+        joined = _BATCH_SEPARATOR.join(texts)
+        if _BATCH_SEPARATOR in self.filters or joined.count(_BATCH_SEPARATOR) != len(texts) - 1:
+            # Some text contains the separator itself
+            return [self._normalize_one(text) for text in texts]
+        return self._normalize_one(joined).split(_BATCH_SEPARATOR)
+
+    def _normalize_one(self, text):
+        if self.lower:
+            text = text.lower()
+        return text.translate(self._translate_table)
+
+    def split_words(self, text):
+        """Normalized words of one text; usable as a scikit-learn `tokenizer=` callable"""
+        return [word for word in self._normalize_one(text).split(self.split) if word]
+
+    def texts_to_sequences(self, texts):
+        """Unpadded id lists, identical to the Keras method of the same name"""
+        get = self._word_ids.get
+        oov_index = self.oov_index
+        split = self.split
+        sequences = []
+        for text in self._normalized(list(texts)):
+            ids = [get(word, oov_index) for word in text.split(split) if word]
+            if oov_index is None:
+                ids = [index for index in ids if index is not None]
+            sequences.append(ids)
+        return sequences
+
+    def encode_batch(self, texts, max_length=None, dtype=np.int32):
+        """Encode a list of texts
+
+        With `max_length`, returns one array padded at the end and truncated at the
+        front, like pad_sequences(padding='post'). Otherwise returns id lists.
+        """
+        sequences = self.texts_to_sequences(texts)
+        if max_length is None:
+            return sequences
+
+        lengths = np.fromiter(map(len, sequences), dtype=np.int64, count=len(sequences))
+        total = int(lengths.sum())
+        flat = np.fromiter(itertools.chain.from_iterable(sequences), dtype=dtype, count=total)
+        rows = np.repeat(np.arange(len(sequences)), lengths)
+        position = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        # Keep the last max_length ids of every sequence
+        overflow = np.repeat(np.maximum(lengths - max_length, 0), lengths)
+        keep = position >= overflow
+
+        encoded = np.zeros((len(sequences), max_length), dtype=dtype)
+        encoded[rows[keep], (position - overflow)[keep]] = flat[keep]
+        return encoded
+
+    def decode_batch(self, sequences):
+        """Turn id sequences (lists or a 2-D array) back into space-joined text; padding and unknown ids are skipped"""
+        get = self._id_words.get
+        texts = []
+        for sequence in sequences:
+            if isinstance(sequence, np.ndarray):
+                sequence = sequence.tolist()
+            texts.append(' '.join(filter(None, map(get, sequence))))
+        return texts
@@ -1,13 +1,21 @@
+import argparse
 import tensorflow as tf
 import numpy as np
 import json
 import pickle
 import os
+import sys
 from tensorflow.keras.models import Model
 from tensorflow.keras.layers import Input, LSTM, Dense, Embedding, Dropout, concatenate
 from tensorflow.keras.preprocessing.text import Tokenizer
 from tensorflow.keras.preprocessing.sequence import pad_sequences
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from model.conditioning import GENRE_MAPPING, LENGTH_MAPPING
+from model.model import sequence_token_loss
+from model.training import CheckpointedTrainer, configure_threads
+
 class CompleteStoryGeneratorModel:
     def __init__(self, vocab_size=5000, max_sequence_length=30, embedding_dim=64, lstm_units=128):
         self.vocab_size = vocab_size
@@ -17,14 +25,9 @@ class CompleteStoryGeneratorModel:
         self.tokenizer = None
         self.model = None
         
-        self.genre_mapping = {
-            'fantasy': 0, 'sci-fi': 1, 'mystery': 2, 'adventure': 3,
-            'romance': 4, 'comedy': 5, 'horror': 6
-        }
+        self.genre_mapping = dict(GENRE_MAPPING)
         
-        self.length_mapping = {
-            'short': 0, 'medium': 1, 'long': 2
-        }
+        self.length_mapping = dict(LENGTH_MAPPING)
 
     def build_model(self):
         # Prompt input
@@ -62,15 +65,15 @@ class CompleteStoryGeneratorModel:
         
         self.model.compile(
             optimizer='adam',
-            loss='sparse_categorical_crossentropy',
-            metrics=['accuracy']
+            loss=sequence_token_loss
         )
         
         print("Model built successfully!")
         return self.model
 
-    def create_synthetic_training_data(self, num_samples=1000):
-        """Create simple synthetic training data for demonstration"""
+    def create_synthetic_training_data(self, num_samples=1000, seed=0):
+        """Create simple synthetic training data for demonstration (deterministic per seed, so resumed runs see the same data)"""
+        rng = np.random.default_rng(seed)
         prompts = []
         titles = []
         contents = []
@@ -85,12 +88,12 @@ class CompleteStoryGeneratorModel:
         }
         
         for i in range(num_samples):
-            char = np.random.choice(story_elements['characters'])
-            action = np.random.choice(story_elements['actions'])
-            obj = np.random.choice(story_elements['objects'])
-            place = np.random.choice(story_elements['places'])
-            genre = np.random.choice(list(self.genre_mapping.keys()))
-            length = np.random.choice(list(self.length_mapping.keys()))
+            char = rng.choice(story_elements['characters'])
+            action = rng.choice(story_elements['actions'])
+            obj = rng.choice(story_elements['objects'])
+            place = rng.choice(story_elements['places'])
+            genre = rng.choice(list(self.genre_mapping.keys()))
+            length = rng.choice(list(self.length_mapping.keys()))
             
             prompt = f"{char} {action} {obj} in the {place}"
             title = f"The {obj} of {place}"
@@ -145,21 +148,30 @@ class CompleteStoryGeneratorModel:
         
         return [X_prompt, X_genre, X_length], [y_title, y_content]
 
-    def train(self, epochs=5, batch_size=32):
+    def train(self, epochs=5, batch_size=32, checkpoint_dir='model/trained_model/checkpoints', checkpoint_every=100,
+              resume=True, thread_config=None, seed=0):
+        """Train with periodic checkpoints; an interrupted run picks up from the last one when resume is set
+
+        Without resume the checkpoint directory is cleared first: checkpoints are
+        ordered by step, so a previous run's would otherwise be resumed from later
+        and outlive this run's in pruning.
+        """
         print("Generating training data...")
-        data = self.create_synthetic_training_data(1000)
+        data = self.create_synthetic_training_data(1000, seed=seed)
         
         print("Preprocessing data...")
         X, y = self.preprocess_data(data)
         
+        trainer = CheckpointedTrainer(self.model, checkpoint_dir, checkpoint_every=checkpoint_every, seed=seed)
+        if resume:
+            trainer.restore_latest()
+        else:
+            trainer.clear_checkpoints()
+        
         print("Starting training...")
-        history = self.model.fit(
-            X, y,
-            epochs=epochs,
-            batch_size=batch_size,
-            validation_split=0.2,
-            verbose=1
-        )
+        history = trainer.fit(X, y, epochs=epochs, batch_size=batch_size, validation_split=0.2,
+                              thread_config=thread_config)
+        print(f"Telemetry written to {trainer.log_path}")
         
         return history
 
@@ -215,7 +227,7 @@ class CompleteStoryGeneratorModel:
         }
 
     def _sequence_to_text(self, sequence):
-        word_indices = np.argmax(sequence, axis=-1)
+        word_indices = np.atleast_1d(np.argmax(sequence, axis=-1))
         words = []
         
         for idx in word_indices:
@@ -227,12 +239,30 @@ class CompleteStoryGeneratorModel:
         return ' '.join(words) if words else ""
 
 def main():
+    parser = argparse.ArgumentParser(description="Train the complete story model with resumable checkpoints")
+    parser.add_argument('--epochs', type=int, default=3)  # Reduced epochs for faster training
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--checkpoint-dir', default='model/trained_model/checkpoints')
+    parser.add_argument('--checkpoint-every', type=int, default=100, help="steps between checkpoints")
+    parser.add_argument('--fresh', action='store_true', help="delete existing checkpoints and start over")
+    parser.add_argument('--intra-op-threads', type=int, default=None)
+    parser.add_argument('--inter-op-threads', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    
+    # Thread pools can only be sized before TensorFlow runs its first op
+    thread_config = configure_threads(args.intra_op_threads, args.inter_op_threads)
+    print(f"CPU threads: {thread_config}")
+    
     # Create and train the model
     model = CompleteStoryGeneratorModel()
     model.build_model()
     
     print("Training the model...")
-    history = model.train(epochs=3)  # Reduced epochs for faster training
+    history = model.train(
+        epochs=args.epochs, batch_size=args.batch_size, checkpoint_dir=args.checkpoint_dir,
+        checkpoint_every=args.checkpoint_every, resume=not args.fresh, thread_config=thread_config, seed=args.seed
+    )
     
     # Save the model
     model.save_model()
@@ -0,0 +1,202 @@
+import json
+import os
+import resource
+import shutil
+import time
+
+import numpy as np
+import tensorflow as tf
+
+
+def configure_threads(intra_op=None, inter_op=None):
+    """Pin TensorFlow's CPU thread pools; must run before the first TensorFlow op executes
+
+    intra_op bounds the threads a single op (a matmul, an LSTM step) may use,
+    inter_op how many independent ops run at once. None keeps TensorFlow's
+    default of one thread per core for each.
+    """
+    try:
+        if intra_op is not None:
+            tf.config.threading.set_intra_op_parallelism_threads(intra_op)
+        if inter_op is not None:
+            tf.config.threading.set_inter_op_parallelism_threads(inter_op)
+    except RuntimeError as e:
+        print(f"Thread pools are already initialized, keeping the current sizes: {e}")
+    return {
+        'intra_op': tf.config.threading.get_intra_op_parallelism_threads(),
+        'inter_op': tf.config.threading.get_inter_op_parallelism_threads()
+    }
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far"""
+    try:
+        with open('/proc/self/status') as f:
+            return next(int(line.split()[1]) for line in f if line.startswith('VmHWM')) / 1024
+    except (OSError, StopIteration):
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if peak > 1 << 32 else peak / 1024
+
+
+class CheckpointedTrainer:
+    """Mini-batch training loop for a compiled Keras model that can be killed and resumed exactly
+
+    A checkpoint holds every model variable (weights and dropout RNG state), every
+    optimizer variable, and the position in the data: the epoch, the step within
+    it and the shuffle seed. Each epoch's order is a pure function of the seed and
+    the epoch number, so a resumed run replays the same batches it would have seen.
+    """
+
+    def __init__(self, model, checkpoint_dir, checkpoint_every=100, keep=3, log_path=None, seed=0):
+        self.model = model
+        self.checkpoint_dir = checkpoint_dir
+        self.checkpoint_every = checkpoint_every
+        self.keep = keep
+        self.log_path = log_path or os.path.join(checkpoint_dir, 'training_log.jsonl')
+        self.seed = seed
+        self.epoch = 0
+        self.step_in_epoch = 0
+        self.global_step = 0
+        # Sample-weighted sums of this epoch's per-batch logs, checkpointed so a resumed epoch still averages all of it
+        self.epoch_log_sums = {}
+        self.epoch_samples = 0
+
+    def _variables(self):
+        optimizer = self.model.optimizer
+        if not optimizer.built:
+            optimizer.build(self.model.trainable_variables)
+        return list(self.model.variables) + list(optimizer.variables)
+
+    def save_checkpoint(self):
+        """Write the checkpoint atomically: a crash mid-write leaves the previous one intact"""
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        name = f'ckpt-{self.global_step:08d}'
+        final_path = os.path.join(self.checkpoint_dir, name)
+        staging_path = final_path + '.tmp'
+        shutil.rmtree(staging_path, ignore_errors=True)
+        os.makedirs(staging_path)
+
+        np.savez(os.path.join(staging_path, 'variables.npz'), *[v.numpy() for v in self._variables()])
+        with open(os.path.join(staging_path, 'state.json'), 'w') as f:
+            json.dump({'epoch': self.epoch, 'step_in_epoch': self.step_in_epoch,
+                       'global_step': self.global_step, 'seed': self.seed,
+                       'epoch_log_sums': self.epoch_log_sums, 'epoch_samples': self.epoch_samples}, f)
+        shutil.rmtree(final_path, ignore_errors=True)
+        os.rename(staging_path, final_path)
+
+        for old in self._checkpoints()[:-self.keep]:
+            shutil.rmtree(os.path.join(self.checkpoint_dir, old), ignore_errors=True)
+        return final_path
+
+    def _checkpoints(self):
+        if not os.path.isdir(self.checkpoint_dir):
+            return []
+        return sorted(name for name in os.listdir(self.checkpoint_dir)
+                      if name.startswith('ckpt-') and not name.endswith('.tmp'))
+
+    def clear_checkpoints(self):
+        """Delete every checkpoint and the telemetry log, so a fresh run's steps do not sort behind a previous run's"""
+        for name in os.listdir(self.checkpoint_dir) if os.path.isdir(self.checkpoint_dir) else []:
+            if name.startswith('ckpt-'):
+                shutil.rmtree(os.path.join(self.checkpoint_dir, name), ignore_errors=True)
+        if os.path.exists(self.log_path):
+            os.remove(self.log_path)
+
+    def restore_latest(self):
+        """Load the newest checkpoint if there is one; returns True when training resumes from it"""
+        checkpoints = self._checkpoints()
+        if not checkpoints:
+            return False
+        path = os.path.join(self.checkpoint_dir, checkpoints[-1])
+
+        variables = self._variables()
+        with np.load(os.path.join(path, 'variables.npz')) as saved:
+            values = [saved[f'arr_{i}'] for i in range(len(saved.files))]
+        if len(values) != len(variables):
+            raise ValueError(f"{path} holds {len(values)} variables, the model has {len(variables)}")
+        for variable, value in zip(variables, values):
+            variable.assign(value)
+
+        with open(os.path.join(path, 'state.json')) as f:
+            state = json.load(f)
+        self.epoch = state['epoch']
+        self.step_in_epoch = state['step_in_epoch']
+        self.global_step = state['global_step']
+        self.seed = state['seed']
+        # Checkpoints written before the epoch means were kept start the sums over
+        self.epoch_log_sums = state.get('epoch_log_sums', {})
+        self.epoch_samples = state.get('epoch_samples', 0)
+        print(f"Resumed from {path}: epoch {self.epoch + 1}, step {self.step_in_epoch}")
+        return True
+
+    def fit(self, X, y, epochs=10, batch_size=32, validation_split=0.2, thread_config=None):
+        """Train on lists of arrays (as returned by preprocess_data) up to `epochs` total epochs"""
+        num_samples = len(X[0])
+        num_train = int(num_samples * (1 - validation_split)) if validation_split else num_samples
+        # The validation rows are the tail, as with Keras' validation_split
+        X_val = [a[num_train:] for a in X]
+        y_val = [a[num_train:] for a in y]
+        steps_per_epoch = -(-num_train // batch_size)
+
+        history = []
+        while self.epoch < epochs:
+            order = np.random.default_rng([self.seed, self.epoch]).permutation(num_train)
+            self.model.reset_metrics()
+            step_times = []
+            samples = 0
+            epoch_start = time.perf_counter()
+
+            while self.step_in_epoch < steps_per_epoch:
+                batch = np.sort(order[self.step_in_epoch * batch_size:(self.step_in_epoch + 1) * batch_size])
+                step_start = time.perf_counter()
+                logs = self.model.train_on_batch([a[batch] for a in X], [a[batch] for a in y], return_dict=True)
+                step_times.append(time.perf_counter() - step_start)
+                samples += len(batch)
+                # train_on_batch resets the metrics, so its logs cover this batch alone
+                for name, value in logs.items():
+                    self.epoch_log_sums[name] = self.epoch_log_sums.get(name, 0.0) + float(value) * len(batch)
+                self.epoch_samples += len(batch)
+                self.step_in_epoch += 1
+                self.global_step += 1
+                if self.checkpoint_every and self.global_step % self.checkpoint_every == 0:
+                    self.save_checkpoint()
+
+            seconds = time.perf_counter() - epoch_start
+            record = {
+                'epoch': self.epoch + 1,
+                'global_step': self.global_step,
+                'samples': samples,
+                'seconds': round(seconds, 3),
+                'samples_per_sec': round(samples / seconds, 1) if seconds else 0.0,
+                'step_ms': {
+                    'mean': round(float(np.mean(step_times)) * 1000, 2) if step_times else 0.0,
+                    'p50': round(float(np.percentile(step_times, 50)) * 1000, 2) if step_times else 0.0,
+                    'p95': round(float(np.percentile(step_times, 95)) * 1000, 2) if step_times else 0.0
+                },
+                'peak_rss_mb': round(peak_rss_mb(), 1),
+                'threads': thread_config or configure_threads(),
+                'loss': {name: total / self.epoch_samples for name, total in self.epoch_log_sums.items()}
+            }
+            if len(X_val[0]):
+                val_logs = self.model.evaluate(X_val, y_val, batch_size=batch_size, verbose=0, return_dict=True)
+                record['val_loss'] = {name: float(value) for name, value in val_logs.items()}
+
+            self.epoch += 1
+            self.step_in_epoch = 0
+            self.epoch_log_sums = {}
+            self.epoch_samples = 0
+            self.save_checkpoint()
+            self._log(record)
+            history.append(record)
+            print(f"Epoch {record['epoch']}/{epochs}: {record['samples_per_sec']} samples/sec, "
+                  f"{record['step_ms']['mean']} ms/step, peak {record['peak_rss_mb']} MB")
+
+        return history
+
+    def _log(self, record):
+        log_dir = os.path.dirname(self.log_path)
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+        with open(self.log_path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
@@ -0,0 +1,115 @@
+"""Latency of /generate_story under overload, with and without admission control.
+
+First measures capacity (stories/s from one client back to back), then offers
+open-loop Poisson load at --load times that rate for --seconds, each request a
+distinct prompt so nothing coalesces. "unbounded" admits everything, which is
+what Flask did before; "shed" answers what does not fit with 503; "degraded"
+serves it from the template generator instead. The app's generator is swapped
+for the CSV-backed one over a synthetic corpus of --stories rows.
+
+Usage: python scripts/bench_admission.py [--load 2.0] [--seconds 10] [--stories 20000]
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.bench_variants import PROMPTS, build_corpus
+
+
+def post(client, index):
+    payload = {'prompt': f"{PROMPTS[index % len(PROMPTS)]} {index}", 'genre': 'mystery', 'length': 'medium'}
+    start = time.perf_counter()
+    response = client.post('/generate_story', json=payload)
+    latency = (time.perf_counter() - start) * 1000
+    kind = 'shed' if response.status_code == 503 else 'degraded' if response.headers.get('X-Degraded') else 'full'
+    return kind, latency
+
+
+def offer_load(client, rate, seconds, seed=0):
+    rng = random.Random(seed)
+    arrivals, t = [], 0.0
+    while t < seconds:
+        t += rng.expovariate(rate)
+        arrivals.append(t)
+
+    results = []
+    lock = threading.Lock()
+
+    def run(index):
+        result = post(client, index)
+        with lock:
+            results.append(result)
+
+    with ThreadPoolExecutor(max_workers=1024) as pool:
+        start = time.perf_counter()
+        for index, arrival in enumerate(arrivals):
+            delay = start + arrival - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(run, index)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--load', type=float, default=2.0, help="offered load as a multiple of capacity")
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--stories', type=int, default=20000)
+    parser.add_argument('--max-concurrency', type=int, default=2)
+    parser.add_argument('--max-queue', type=int, default=8)
+    parser.add_argument('--max-wait-ms', type=float, default=500)
+    args = parser.parse_args()
+
+    logging.disable(logging.ERROR)
+    import app
+    from model.admission import AdmissionController
+    from model.enhanced_story_generator import EnhancedStoryGenerator
+    from model.execution import GenerationBackend
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'stories.csv')
+        build_corpus(csv_path, args.stories)
+        app.STORY_GENERATOR = EnhancedStoryGenerator(csv_path)
+        app.generation_backend = GenerationBackend(app.STORY_GENERATOR)
+    client = app.app.test_client()
+
+    app.generate_admission = AdmissionController(max_concurrency=1 << 30, max_queue=0)
+    start = time.perf_counter()
+    for index in range(50):
+        post(client, index)
+    capacity = 50 / (time.perf_counter() - start)
+    rate = capacity * args.load
+    print(f"capacity {capacity:.1f} stories/s, offering {rate:.1f}/s ({args.load}x) for {args.seconds:.0f} s, "
+          f"{os.cpu_count()} cores")
+    print(f"{'mode':10} {'full':>6} {'degraded':>9} {'shed':>6} {'full p50 ms':>12} {'full p99 ms':>12} "
+          f"{'all p99 ms':>11} {'max ms':>8}")
+
+    modes = [
+        ('unbounded', AdmissionController(max_concurrency=1 << 30, max_queue=0), False),
+        ('shed', AdmissionController(args.max_concurrency, args.max_queue, args.max_wait_ms), False),
+        ('degraded', AdmissionController(args.max_concurrency, args.max_queue, args.max_wait_ms), True)
+    ]
+    for name, controller, degraded in modes:
+        app.generate_admission = controller
+        app.DEGRADED_MODE = degraded
+        results = offer_load(client, rate, args.seconds)
+        counts = {kind: sum(1 for k, _ in results if k == kind) for kind in ('full', 'degraded', 'shed')}
+        full = [latency for kind, latency in results if kind == 'full'] or [0.0]
+        every = [latency for _, latency in results]
+        print(f"{name:10} {counts['full']:>6} {counts['degraded']:>9} {counts['shed']:>6} "
+              f"{np.percentile(full, 50):>12.0f} {np.percentile(full, 99):>12.0f} "
+              f"{np.percentile(every, 99):>11.0f} {max(every):>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
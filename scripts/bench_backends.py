@@ -0,0 +1,87 @@
+"""Throughput of CSV-backed story generation on the inline, thread pool and process pool backends as workers scale.
+
+Each run keeps 2 x workers client threads (the web threads) busy calling
+generate_story back to back with distinct prompts for --seconds. Inline runs
+every call on its client thread and threads share one GIL, so both stay near
+one core; process pool workers each load the --stories corpus and TF-IDF index
+at start-up and run on their own cores. Speedups are against inline with the
+same number of client threads.
+
+Usage: python scripts/bench_backends.py [--workers 1 2 4] [--seconds 5] [--stories 20000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.bench_variants import PROMPTS, build_corpus
+
+
+def offer_load(backend, clients, seconds):
+    """Closed-loop load from `clients` threads; returns per-call latencies in ms"""
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client(index):
+        count = 0
+        while time.perf_counter() < deadline:
+            prompt = f"{PROMPTS[(index + count) % len(PROMPTS)]} {index}-{count}"
+            start = time.perf_counter()
+            backend.generate_story(prompt, 'mystery', 'medium')
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+            count += 1
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, 4, os.cpu_count() or 1} & set(range(1, (os.cpu_count() or 1) + 1))))
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--stories', type=int, default=20000)
+    args = parser.parse_args()
+
+    from model.enhanced_story_generator import EnhancedStoryGenerator
+    from model.execution import create_backend
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'stories.csv')
+        build_corpus(csv_path, args.stories)
+        generator = EnhancedStoryGenerator(csv_path)
+
+        print(f"{args.stories} stories, {args.seconds:.0f} s per run, {os.cpu_count()} cores")
+        print(f"{'backend':8} {'workers':>8} {'clients':>8} {'start s':>8} {'stories/s':>10} {'speedup':>8} "
+              f"{'p50 ms':>8} {'p99 ms':>8}")
+        for workers in args.workers:
+            clients = 2 * workers
+            baseline = None
+            for name in ('inline', 'thread', 'process'):
+                start = time.perf_counter()
+                backend = create_backend(name, generator, factory=EnhancedStoryGenerator, factory_args=(csv_path,),
+                                         workers=workers)
+                startup = time.perf_counter() - start
+                latencies = offer_load(backend, clients, args.seconds)
+                backend.shutdown()
+                throughput = len(latencies) / args.seconds
+                baseline = baseline or throughput
+                print(f"{name:8} {workers:>8} {clients:>8} {startup:>8.2f} {throughput:>10.1f} "
+                      f"{throughput / baseline:>7.2f}x {np.percentile(latencies, 50):>8.1f} "
+                      f"{np.percentile(latencies, 99):>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Throughput of StoryGeneratorModel under concurrent load, with and without micro-batching.
+
+Uses an untrained model of the production shape, so only speed is meaningful.
+
+Usage: python scripts/bench_batching.py [--clients 32] [--requests 2000] [--max-wait-ms 5]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model.model import StoryGeneratorModel
+
+SAMPLE_DATA = [
+    {'prompt': 'A robot who falls in love with a human', 'genre': 'sci-fi', 'length': 'short',
+     'title': 'The Robot Heart', 'content': 'The robot learned to love.'},
+    {'prompt': 'A detective who can speak to ghosts', 'genre': 'mystery', 'length': 'medium',
+     'title': 'Ghost Whisper', 'content': 'The ghosts told the detective everything.'},
+]
+
+
+def run_load(model, clients, num_requests):
+    prompts = [item['prompt'] for item in SAMPLE_DATA]
+    genres = list(model.genre_mapping)
+
+    def one(i):
+        return model.generate_story(prompts[i % len(prompts)], genres[i % len(genres)], 'medium')
+
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        # Warm up graph tracing outside the timed region
+        list(pool.map(one, range(clients)))
+        start = time.perf_counter()
+        list(pool.map(one, range(num_requests)))
+        return num_requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--max-batch-size', type=int, default=32)
+    parser.add_argument('--max-wait-ms', type=float, default=5)
+    args = parser.parse_args()
+
+    model = StoryGeneratorModel()
+    model.build_model()
+    model.preprocess_data(SAMPLE_DATA)
+
+    unbatched = run_load(model, args.clients, args.requests)
+    print(f"batch size 1:   {unbatched:8.1f} requests/sec")
+
+    batcher = model.enable_micro_batching(args.max_batch_size, args.max_wait_ms)
+    batched = run_load(model, args.clients, args.requests)
+    print(f"micro-batched:  {batched:8.1f} requests/sec ({batched / unbatched:.1f}x)")
+    print(json.dumps(batcher.stats(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Thundering herd on /generate_story: identical concurrent requests with and without single-flight coalescing.
+
+Each wave releases --clients threads at once, all posting the same example
+prompt, like many users clicking it right after the homepage loads. The app's
+generator is swapped for the CSV-backed one over a synthetic corpus of
+--stories rows, so every generation does real retrieval work.
+
+Usage: python scripts/bench_coalescing.py [--clients 16] [--waves 10] [--stories 20000]
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.bench_variants import build_corpus
+
+
+class NoCoalescing:
+    def do(self, key, fn, *args, **kwargs):
+        return fn(*args, **kwargs), False
+
+
+class CountingGenerator:
+    def __init__(self, generator):
+        self.generator = generator
+        self.calls = 0
+
+    def generate_story(self, prompt, genre, length):
+        self.calls += 1
+        return self.generator.generate_story(prompt, genre, length)
+
+
+def run_waves(client, clients, waves):
+    latencies = []
+    wave_times = []
+    for wave in range(waves):
+        barrier = threading.Barrier(clients + 1)
+        payload = {'prompt': "A detective who can speak to ghosts", 'genre': 'mystery', 'length': 'medium',
+                   'seed': wave}
+
+        def request():
+            barrier.wait()
+            start = time.perf_counter()
+            response = client.post('/generate_story', json=payload)
+            assert response.status_code == 200, response.get_json()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        threads = [threading.Thread(target=request) for _ in range(clients)]
+        for thread in threads:
+            thread.start()
+        start = time.perf_counter()
+        barrier.wait()
+        for thread in threads:
+            thread.join()
+        wave_times.append((time.perf_counter() - start) * 1000)
+    return latencies, wave_times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--waves', type=int, default=10)
+    parser.add_argument('--stories', type=int, default=20000)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    import app
+    from model.enhanced_story_generator import EnhancedStoryGenerator
+    from model.execution import GenerationBackend
+    from model.single_flight import SingleFlight
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'stories.csv')
+        build_corpus(csv_path, args.stories)
+        generator = EnhancedStoryGenerator(csv_path)
+
+    client = app.app.test_client()
+    print(f"{args.clients} identical concurrent requests per wave, {args.waves} waves, {os.cpu_count()} cores")
+    print(f"{'mode':14} {'generations':>12} {'wave ms':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, flight in (('uncoalesced', NoCoalescing()), ('single-flight', SingleFlight())):
+        app.STORY_GENERATOR = counting = CountingGenerator(generator)
+        app.generation_backend = GenerationBackend(counting)
+        app.story_flight = flight
+        latencies, wave_times = run_waves(client, args.clients, args.waves)
+        print(f"{name:14} {counting.calls:>12} {np.mean(wave_times):>9.1f} "
+              f"{np.percentile(latencies, 50):>8.1f} {np.percentile(latencies, 99):>8.1f}")
+    print(f"counters: {client.get('/metrics').get_json()['generate_story']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Samples/sec of synthetic training data generation: serial vs sharded across a process pool.
+
+The serial baseline is create_training_data.py's default: one process streaming
+samples into a single JSONL file. Both modes include writing to disk.
+
+The sharded run also checks reproducibility: the same seed with a different
+worker count must produce byte-identical shards.
+
+Usage: python scripts/bench_data_generation.py [--num-samples 200000] [--shard-size 25000] [--workers 1 2 4]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.jsonl_io import write_jsonl
+from data.synthetic_data_generator import SyntheticDataGenerator, generate_sharded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--num-samples', type=int, default=200000)
+    parser.add_argument('--shard-size', type=int, default=25000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        write_jsonl(os.path.join(tmp, 'training_data.jsonl'), SyntheticDataGenerator(seed=0).iter_samples(args.num_samples))
+        serial = args.num_samples / (time.perf_counter() - start)
+    print(f"{os.cpu_count()} cores, {args.num_samples} samples")
+    print(f"{'mode':24} {'samples/s':>10} {'speedup':>8}")
+    print(f"{'serial, one JSONL file':24} {serial:>10.0f} {1.0:>7.1f}x")
+
+    checksums = set()
+    for workers in sorted(set(args.workers)):
+        with tempfile.TemporaryDirectory() as tmp:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                manifest = generate_sharded(args.num_samples, tmp, seed=0, shard_size=args.shard_size,
+                                            workers=workers)
+            rate = args.num_samples / (time.perf_counter() - start)
+        checksums.add(json.dumps([shard['sha256'] for shard in manifest['shards']]))
+        print(f"{f'sharded, {workers} workers':24} {rate:>10.0f} {rate / serial:>7.1f}x")
+    print(f"shards identical across worker counts: {len(checksums) == 1}")
+
+
+if __name__ == '__main__':
+    main()
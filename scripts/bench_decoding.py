@@ -0,0 +1,63 @@
+"""Tokens/sec of autoregressive decoding with cached LSTM state.
+
+Uses an untrained seq2seq model of the production shape and disables the end
+token so every run decodes the full length; only speed is meaningful. The
+baseline re-runs the Keras decoder over the whole prefix for every new token.
+
+Usage: python scripts/bench_decoding.py [--tokens 100] [--baseline-tokens 30]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model.decoder import LSTMDecoder
+from model.model import StoryGeneratorModel
+
+
+def bench(decoder, batch_size, tokens, **options):
+    prompt_ids = np.random.default_rng(0).integers(1, decoder.vocab_size, (batch_size, 50))
+    genre_ids = np.arange(batch_size) % 7
+    length_ids = np.arange(batch_size) % 3
+    start = time.perf_counter()
+    decoder.decode(prompt_ids, genre_ids, length_ids, max_length=tokens, seed=0, **options)
+    return batch_size * tokens / (time.perf_counter() - start)
+
+
+def bench_reencode(model, tokens):
+    """Naive decoding: feed the growing prefix back through the full Keras decoder at every step"""
+    prompt = np.random.default_rng(0).integers(1, model.vocab_size, (1, model.max_sequence_length))
+    prefix = [1]
+    start = time.perf_counter()
+    for _ in range(tokens):
+        probs = model.decoder_model([prompt, np.array([[0]]), np.array([[1]]), np.array([prefix])], training=False)
+        prefix.append(int(np.argmax(probs[0, -1])))
+    return tokens / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tokens', type=int, default=100)
+    parser.add_argument('--baseline-tokens', type=int, default=30)
+    args = parser.parse_args()
+
+    model = StoryGeneratorModel()
+    model.build_decoder_model()
+    decoder = LSTMDecoder.from_keras_model(model.decoder_model, start_id=1, end_id=-1)
+
+    print(f"{'strategy':<28} {'tokens/sec':>12}")
+    print(f"{'re-encode prefix, batch 1':<28} {bench_reencode(model, args.baseline_tokens):>12.1f}")
+    for batch_size in (1, 16):
+        print(f"{f'greedy, batch {batch_size}':<28} {bench(decoder, batch_size, args.tokens):>12.1f}")
+        print(f"{f'top-k (k=10), batch {batch_size}':<28} "
+              f"{bench(decoder, batch_size, args.tokens, strategy='top_k', top_k=10):>12.1f}")
+        print(f"{f'beam (width 4), batch {batch_size}':<28} "
+              f"{bench(decoder, batch_size, args.tokens, strategy='beam', beam_width=4):>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Corpus hot reload: reload duration, peak memory overlap, and requests served while reloading.
+
+Builds a corpus of --stories rows and an EnhancedStoryGenerator over it, then
+keeps --clients threads ranking prompts against it while the corpus grows and
+CorpusReloader swaps in --reloads new snapshots. A request that saw a new
+DataFrame with an old TF-IDF index (or the reverse) would fail or pick rows out
+of range; the run counts such errors.
+
+Usage: python scripts/bench_hot_reload.py [--stories 50000] [--reloads 3] [--clients 2]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.story_store import COLUMNS, StoryStore
+from data.synthetic_data_generator import SyntheticDataGenerator
+from model.enhanced_story_generator import EnhancedStoryGenerator
+from model.hot_reload import CorpusReloader
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--stories', type=int, default=50000)
+    parser.add_argument('--reloads', type=int, default=3)
+    parser.add_argument('--clients', type=int, default=2)
+    parser.add_argument('--added-per-reload', type=int, default=100)
+    args = parser.parse_args()
+
+    samples = SyntheticDataGenerator(seed=0)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'stories_dataset.csv')
+        rows = [dict(story, id=i + 1, rating=8.0) for i, story in enumerate(samples.iter_samples(args.stories))]
+        pd.DataFrame(rows, columns=COLUMNS).to_csv(path, index=False)
+        del rows
+
+        generator = EnhancedStoryGenerator(path)
+        reloader = CorpusReloader([generator])
+        prompts = [samples.generate_prompt(genre) for genre in samples.genres for _ in range(5)]
+        stop = threading.Event()
+        reloading = threading.Event()
+        latencies = {True: [], False: []}
+        errors = []
+
+        def client(index):
+            for n in range(index, 1 << 62, args.clients):
+                if stop.is_set():
+                    return
+                during_reload = reloading.is_set()
+                start = time.perf_counter()
+                try:
+                    generator.find_similar_stories(prompts[n % len(prompts)], samples.genres[n % 7], n=5)
+                except Exception as e:
+                    errors.append(repr(e))
+                latencies[during_reload].append((time.perf_counter() - start) * 1000)
+
+        clients = [threading.Thread(target=client, args=(index,)) for index in range(args.clients)]
+        for thread in clients:
+            thread.start()
+        time.sleep(1)
+
+        store = StoryStore(path)
+        reports = []
+        for _ in range(args.reloads):
+            store.put_stories(list(samples.iter_samples(args.added_per_reload)))
+            reloading.set()
+            reports.append(reloader.request_reload('bench', wait=True))
+            reloading.clear()
+            time.sleep(0.5)
+        stop.set()
+        for thread in clients:
+            thread.join()
+
+    print(f"corpus {args.stories} stories, {args.clients} client threads, {os.cpu_count()} cores")
+    print(f"{'reload':>6} {'stories':>8} {'duration ms':>12} {'snapshot MB':>12} {'RSS before':>11} "
+          f"{'peak RSS':>9} {'RSS after':>10} {'overlap MB':>11}")
+    for index, report in enumerate(reports):
+        target = report['targets'][0]
+        print(f"{index + 1:>6} {target['stories']:>8} {report['duration_ms']:>12.0f} {target['snapshot_mb']:>12.1f} "
+              f"{report['rss_before_mb']:>11.1f} {report['peak_rss_mb']:>9.1f} {report['rss_after_mb']:>10.1f} "
+              f"{report['overlap_mb']:>11.1f}")
+    for during_reload, label in ((False, 'steady'), (True, 'during reload')):
+        values = latencies[during_reload]
+        if values:
+            print(f"requests {label:14} {len(values):>7}  p50 {np.percentile(values, 50):7.2f} ms  "
+                  f"p99 {np.percentile(values, 99):7.2f} ms")
+    print(f"request errors: {len(errors)}" + (f" (first: {errors[0]})" if errors else ''))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Bytes on the wire and web-tier CPU per request: plain vs compressed, cached and orjson-serialized responses.
+
+Replays a first page load (index, stylesheet, script, example prompts), a repeat
+visit revalidating with the ETags it got, and /generate_story responses, first
+with compression and the orjson provider turned off and then on. Repeat visits
+with fingerprinted URLs do not hit the server at all for static files or, within
+the hour, /example_prompts; they are counted here anyway, revalidating, as the
+worst case. CPU times include the test client's own overhead.
+
+Usage: python scripts/bench_http.py [--stories 200] [--repeat 200]
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.bench_variants import PROMPTS
+
+
+class NoCompression:
+    def compress(self, response, accept_encodings):
+        return response
+
+
+def page_load(client, headers, etags=None):
+    """GET everything a page load fetches; returns (bytes received, ETags seen)"""
+    paths = ['/', '/static/css/styles.css', '/static/js/script.js', '/example_prompts']
+    received, seen = 0, {}
+    for path in paths:
+        request_headers = dict(headers)
+        if etags and path in etags:
+            request_headers['If-None-Match'] = etags[path]
+        response = client.get(path, headers=request_headers)
+        received += len(response.data)
+        if response.headers.get('ETag'):
+            seen[path] = response.headers['ETag']
+        response.close()
+    return received, seen
+
+
+def cpu_per_request(fn, repeat):
+    start = time.process_time()
+    for _ in range(repeat):
+        fn()
+    return (time.process_time() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--stories', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    import app
+    from flask.json.provider import DefaultJSONProvider
+    from model.http_cache import ResponseCompressor
+    from model.json_provider import install_json_provider
+
+    client = app.app.test_client()
+    headers = {'Accept-Encoding': 'br, gzip'}
+    stories = [client.post('/generate_story', json={'prompt': PROMPTS[i % len(PROMPTS)], 'length': 'long'}).get_json()
+               for i in range(args.stories)]
+
+    print(f"{'mode':10} {'first load B':>13} {'repeat B':>9} {'story B':>8} {'story ms':>9} "
+          f"{'prompts ms':>11} {'304 ms':>7} {'jsonify us':>11}")
+    for name in ('before', 'after'):
+        if name == 'before':
+            app.response_compressor = NoCompression()
+            app.app.json = DefaultJSONProvider(app.app)
+        else:
+            app.response_compressor = ResponseCompressor()
+            install_json_provider(app.app)
+
+        first, etags = page_load(client, headers)
+        repeat, _ = page_load(client, headers, etags)
+        story_bytes = sum(len(client.post('/generate_story', json={'prompt': PROMPTS[i % len(PROMPTS)], 'length': 'long'},
+                                          headers=headers).data) for i in range(20)) / 20
+        story_ms = cpu_per_request(lambda: client.post('/generate_story', json={'prompt': PROMPTS[0], 'length': 'long'},
+                                                       headers=headers), args.repeat)
+        prompts_ms = cpu_per_request(lambda: client.get('/example_prompts', headers=headers), args.repeat)
+        etag = client.get('/example_prompts', headers=headers).headers['ETag']
+        revalidate_ms = cpu_per_request(lambda: client.get('/example_prompts', headers=dict(headers, **{'If-None-Match': etag})),
+                                        args.repeat)
+        with app.app.app_context():
+            start = time.perf_counter()
+            for story in stories:
+                app.jsonify(story)
+            jsonify_us = (time.perf_counter() - start) / len(stories) * 1e6
+        print(f"{name:10} {first:>13} {repeat:>9} {story_bytes:>8.0f} {story_ms:>9.2f} "
+              f"{prompts_ms:>11.2f} {revalidate_ms:>7.2f} {jsonify_us:>11.1f}")
+
+    payload = json.dumps(stories).encode()
+    print(f"{len(stories)} stories, {len(payload) / len(stories):.0f} B each as plain JSON; "
+          f"encodings offered: {ResponseCompressor().encodings}")
+    app.job_manager.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Single-request latency of StoryGeneratorModel: model.predict path vs compiled, warmed-up path.
+
+Uses an untrained model of the production shape, so only speed is meaningful.
+
+Usage: python scripts/bench_inference_latency.py [--iterations 500]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.jsonl_io import iter_records
+from model.model import StoryGeneratorModel
+
+PROMPTS = [
+    'A time traveler who accidentally changes a minor historical event',
+    'A detective who can speak to ghosts',
+    'A chef who discovers magical ingredients',
+    'A robot who falls in love with a human',
+]
+
+
+def measure(model, iterations):
+    genres = list(model.genre_mapping)
+    latencies = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        model.generate_story(PROMPTS[i % len(PROMPTS)], genres[i % len(genres)], 'medium')
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--data', default='data/training_data.jsonl')
+    args = parser.parse_args()
+
+    data = list(iter_records(args.data))
+
+    model = StoryGeneratorModel()
+    model.build_model()
+    model.preprocess_data(data)
+
+    # Let predict() build its function once so the comparison is steady-state
+    measure(model, 5)
+    predict_p50, predict_p99 = measure(model, args.iterations)
+
+    start = time.perf_counter()
+    model.compile_inference()
+    warmup_ms = (time.perf_counter() - start) * 1000
+    compiled_p50, compiled_p99 = measure(model, args.iterations)
+
+    print(f"{'path':<10} {'p50 ms':>8} {'p99 ms':>8}")
+    print(f"{'predict':<10} {predict_p50:>8.2f} {predict_p99:>8.2f}")
+    print(f"{'compiled':<10} {compiled_p50:>8.2f} {compiled_p99:>8.2f}")
+    print(f"speedup: p50 {predict_p50 / compiled_p50:.1f}x, p99 {predict_p99 / compiled_p99:.1f}x "
+          f"(one-off trace + warmup: {warmup_ms:.0f} ms)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Epoch time and peak memory of in-memory vs streaming (length-bucketed) training by dataset size.
+
+Each run trains one epoch in a fresh process on a synthetic JSONL file.
+
+Usage: python scripts/bench_input_pipeline.py [--records 1000 4000 16000] [--vocab-size 5000]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'data'))
+
+TRAIN = """
+import json, time
+from model.data_pipeline import iter_records
+from model.model import StoryGeneratorModel
+
+def peak_rss_kb():
+    with open('/proc/self/status') as f:
+        return next(int(line.split()[1]) for line in f if line.startswith('VmHWM'))
+
+model = StoryGeneratorModel(vocab_size={vocab_size})
+start = time.perf_counter()
+if {streaming}:
+    model.build_model(variable_length=True)
+    model.train_streaming({path!r}, epochs=1, validation_split=0)
+else:
+    model.build_model()
+    model.train(list(iter_records({path!r})), epochs=1, validation_split=0)
+print(time.perf_counter() - start, peak_rss_kb())
+"""
+
+
+def write_records(path, num_records):
+    from synthetic_data_generator import SyntheticDataGenerator
+
+    generator = SyntheticDataGenerator()
+    with open(path, 'w') as f:
+        for i in range(num_records):
+            genre = generator.genres[i % len(generator.genres)]
+            story = generator.generate_story(generator.generate_prompt(genre), genre, ['short', 'medium', 'long'][i % 3])
+            f.write(json.dumps(story) + '\n')
+
+
+def run(path, vocab_size, streaming):
+    code = TRAIN.format(path=path, vocab_size=vocab_size, streaming=streaming)
+    env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL='3')
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    seconds, peak_kb = output.stdout.strip().splitlines()[-1].split()
+    return float(seconds), int(peak_kb) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, nargs='+', default=[1000, 4000, 16000])
+    parser.add_argument('--vocab-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f"{'records':>8} {'pipeline':>10} {'epoch s':>9} {'peak MB':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for num_records in args.records:
+            path = os.path.join(tmp, f'stories_{num_records}.jsonl')
+            write_records(path, num_records)
+            for name, streaming in (('in-memory', False), ('streaming', True)):
+                seconds, peak_mb = run(path, args.vocab_size, streaming)
+                print(f"{num_records:>8} {name:>10} {seconds:>9.1f} {peak_mb:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
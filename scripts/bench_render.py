@@ -0,0 +1,72 @@
+"""Pages-per-second benchmark for comic page rendering by worker count.
+
+Usage: python scripts/bench_render.py [--stories 40] [--max-workers N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model.comic_layout import ComicLayout
+from model.comic_renderer import ComicRenderer
+from model.story_generator import StoryGenerator
+
+
+def build_pages(num_stories):
+    generator = StoryGenerator()
+    pages = []
+    for i in range(num_stories):
+        story = generator.generate_story(f"Story number {i} about a brave robot", 'sci-fi', 'long')
+        # Make every story unique so content addressing does not dedupe the work
+        story['title'] = f"{story['title']} #{i}"
+        layout = ComicLayout(story)
+        page_number = 0
+        while True:
+            page = layout.get_page(page_number)
+            if page is None:
+                break
+            pages.append(page)
+            page_number += 1
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--stories', type=int, default=40)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    pages = build_pages(args.stories)
+    print(f"Rendering {len(pages)} pages from {args.stories} stories")
+
+    worker_counts = sorted({1, 2, 4, 8, 16, args.max_workers})
+    worker_counts = [w for w in worker_counts if w <= args.max_workers]
+    baseline = None
+
+    print(f"{'workers':>8} {'seconds':>10} {'pages/sec':>10} {'speedup':>8}")
+    for workers in worker_counts:
+        with tempfile.TemporaryDirectory() as output_dir:
+            renderer = ComicRenderer(output_dir=output_dir, workers=workers)
+            # Spin the pool up before timing so process start-up is not counted
+            renderer._get_pool().submit(os.getpid).result()
+
+            start = time.perf_counter()
+            renderer.render_pages(pages)
+            elapsed = time.perf_counter() - start
+
+            repeat_start = time.perf_counter()
+            renderer.render_pages(pages)
+            repeat_elapsed = time.perf_counter() - repeat_start
+            renderer.shutdown()
+
+        rate = len(pages) / elapsed
+        baseline = baseline or rate
+        print(f"{workers:>8} {elapsed:>10.2f} {rate:>10.1f} {rate / baseline:>7.2f}x"
+              f"   (cached repeat: {len(pages) / repeat_elapsed:.0f} pages/sec)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Step time and final loss of full vs sampled-softmax training of the story model's output heads.
+
+Data is synthetic: token ids drawn from a Zipf distribution over the vocabulary,
+like the frequency-ranked ids of the real tokenizer. Both modes start from the
+same initial weights and run the same number of steps; the final loss is the
+full-softmax loss on held-out rows, i.e. what inference actually sees.
+
+Usage: python scripts/bench_sampled_softmax.py [--vocab-sizes 5000 10000 50000] [--steps 30] [--num-sampled 512]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def synthetic_arrays(vocab_size, num_samples, max_sequence_length, rng):
+    def tokens(width):
+        ids = rng.zipf(1.2, size=(num_samples, width)) + 1
+        ids[ids >= vocab_size] = 1
+        # Variable lengths, padded with zeros at the end
+        lengths = rng.integers(width // 3, width + 1, size=(num_samples, 1))
+        ids[np.arange(width)[None, :] >= lengths] = 0
+        return ids.astype(np.int32)
+
+    X = [tokens(max_sequence_length),
+         rng.integers(0, 7, size=(num_samples, 1)).astype(np.int32),
+         rng.integers(0, 3, size=(num_samples, 1)).astype(np.int32)]
+    y = [tokens(max_sequence_length), tokens(max_sequence_length * 3)]
+    return X, y
+
+
+def run(vocab_size, num_sampled, args):
+    import tensorflow as tf
+    from model.model import SampledSoftmaxTrainer, StoryGeneratorModel
+
+    rng = np.random.default_rng(0)
+    X, y = synthetic_arrays(vocab_size, args.steps * args.batch_size + args.holdout, args.max_sequence_length, rng)
+    X_train, y_train = [a[:-args.holdout] for a in X], [a[:-args.holdout] for a in y]
+    X_val, y_val = [a[-args.holdout:] for a in X], [a[-args.holdout:] for a in y]
+
+    tf.keras.utils.set_random_seed(0)
+    model = StoryGeneratorModel(vocab_size=vocab_size, max_sequence_length=args.max_sequence_length)
+    model.build_model()
+    if num_sampled:
+        trainer = SampledSoftmaxTrainer(model.model, num_sampled)
+
+        def step(inputs, targets):
+            trainer.train_step([tf.constant(a) for a in inputs], *targets)
+    else:
+        def step(inputs, targets):
+            model.model.train_on_batch(inputs, targets)
+
+    step_times = []
+    for i in range(args.steps):
+        batch = slice(i * args.batch_size, (i + 1) * args.batch_size)
+        start = time.perf_counter()
+        step([a[batch] for a in X_train], [a[batch] for a in y_train])
+        step_times.append(time.perf_counter() - start)
+    if num_sampled:
+        trainer.sync_heads()
+
+    loss = model.model.evaluate(X_val, y_val, batch_size=args.batch_size, verbose=0, return_dict=True)['loss']
+    tf.keras.backend.clear_session()
+    # The first steps include tracing
+    return float(np.median(step_times[2:])) * 1000, loss
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--vocab-sizes', type=int, nargs='+', default=[5000, 10000, 50000])
+    parser.add_argument('--steps', type=int, default=30)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--num-sampled', type=int, default=512)
+    parser.add_argument('--max-sequence-length', type=int, default=50)
+    parser.add_argument('--holdout', type=int, default=256)
+    args = parser.parse_args()
+
+    print(f"{args.steps} steps of batch {args.batch_size}, {args.num_sampled} sampled negatives per head")
+    print(f"{'vocab':>7} {'full ms/step':>13} {'sampled ms/step':>16} {'speedup':>8} {'full loss':>10} {'sampled loss':>13}")
+    for vocab_size in args.vocab_sizes:
+        full_ms, full_loss = run(vocab_size, None, args)
+        sampled_ms, sampled_loss = run(vocab_size, args.num_sampled, args)
+        print(f"{vocab_size:>7} {full_ms:>13.1f} {sampled_ms:>16.1f} {full_ms / sampled_ms:>7.1f}x "
+              f"{full_loss:>10.3f} {sampled_loss:>13.3f}")
+
+
+if __name__ == '__main__':
+    main()
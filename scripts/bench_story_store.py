@@ -0,0 +1,92 @@
+"""Story ingest throughput: WAL appends from concurrent processes vs rewriting the CSV per story.
+
+"rewrite" is what data/expand_dataset.py used to do for every addition:
+read_csv, concat, to_csv over the whole corpus. "wal" appends one fsync'd log
+line per story through StoryStore, from --processes writers at once while a
+compactor folds the log into the base. Both start from a corpus of
+--base-stories rows. The wal run also checks that no write was lost.
+
+Usage: python scripts/bench_story_store.py [--base-stories 20000] [--stories 200] [--processes 4]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.story_store import COLUMNS, StoryStore
+
+
+def make_story(writer, index):
+    return {'genre': 'fantasy', 'title': f'Story {writer}-{index}', 'prompt': f'Prompt {writer}-{index}',
+            'content': 'Once upon a time, ' * 40, 'length': 'medium', 'rating': 8.0}
+
+
+def write_base(path, count):
+    pd.DataFrame([dict(make_story('base', i), id=i + 1) for i in range(count)], columns=COLUMNS).to_csv(path, index=False)
+
+
+def rewrite_writer(path, stories):
+    for index in range(stories):
+        df = pd.read_csv(path)
+        df = pd.concat([df, pd.DataFrame([dict(make_story('rewrite', index), id=len(df) + 1)])], ignore_index=True)
+        df.to_csv(path, index=False)
+
+
+def wal_writer(path, writer, stories, start):
+    start.wait()
+    store = StoryStore(path)
+    for index in range(stories):
+        store.put_story(make_story(writer, index))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--base-stories', type=int, default=20000)
+    parser.add_argument('--stories', type=int, default=200, help="stories added per writer process")
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--compact-threshold', type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'stories_dataset.csv')
+        write_base(path, args.base_stories)
+        rewrite_count = max(1, args.stories // 10)
+        start = time.perf_counter()
+        rewrite_writer(path, rewrite_count)
+        rewrite_rate = rewrite_count / (time.perf_counter() - start)
+
+        write_base(path, args.base_stories)
+        compactor = StoryStore(path)
+        compactor.start_compactor(interval=0.2, threshold=args.compact_threshold)
+        ready = multiprocessing.Event()
+        writers = [multiprocessing.Process(target=wal_writer, args=(path, writer, args.stories, ready))
+                   for writer in range(args.processes)]
+        for process in writers:
+            process.start()
+        start = time.perf_counter()
+        ready.set()
+        for process in writers:
+            process.join()
+        wal_rate = args.processes * args.stories / (time.perf_counter() - start)
+        compactor.stop_compactor()
+
+        df = StoryStore(path).dataframe()
+        expected = args.base_stories + args.processes * args.stories
+        intact = len(df) == expected and df['id'].is_unique
+        pending = compactor.pending_entries()
+
+    print(f"base corpus {args.base_stories} stories, {os.cpu_count()} cores")
+    print(f"{'mode':32} {'stories/s':>10} {'speedup':>8}")
+    print(f"{'rewrite CSV per story, 1 proc':32} {rewrite_rate:>10.1f} {1:>7.1f}x")
+    print(f"{f'wal append, {args.processes} procs':32} {wal_rate:>10.1f} {wal_rate / rewrite_rate:>7.1f}x")
+    print(f"all {expected} stories present with unique ids: {intact} ({pending} log entries left uncompacted)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Throughput of StoryTokenizer against the pickled Keras Tokenizer, plus cold load time of each.
+
+Encoding is texts_to_sequences + pad_sequences for Keras and encode_batch for
+StoryTokenizer; the ids are checked to be identical before anything is timed.
+
+Usage: python scripts/bench_tokenizer.py [--data data/training_data.jsonl] [--batch-size 256]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+KERAS_LOAD = """
+import pickle, time
+start = time.perf_counter()
+with open({path!r}, 'rb') as handle:
+    pickle.load(handle)
+print(time.perf_counter() - start)
+"""
+
+STORY_LOAD = """
+import time
+start = time.perf_counter()
+from model.tokenizer import StoryTokenizer
+StoryTokenizer.load({path!r})
+print(time.perf_counter() - start)
+"""
+
+
+def cold_load(code):
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def throughput(fn, batches, repeats=3):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for batch in batches:
+            fn(batch)
+        best = min(best, time.perf_counter() - start)
+    return sum(len(batch) for batch in batches) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data', default='data/training_data.jsonl')
+    parser.add_argument('--vocab-size', type=int, default=10000)
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--max-length', type=int, default=150)
+    args = parser.parse_args()
+
+    import pickle
+    from tensorflow.keras.preprocessing.sequence import pad_sequences
+    from tensorflow.keras.preprocessing.text import Tokenizer
+    from data.jsonl_io import iter_records
+    from model.tokenizer import StoryTokenizer
+
+    texts = [item[field] for item in iter_records(args.data) for field in ('prompt', 'title', 'content')]
+    batches = [texts[i:i + args.batch_size] for i in range(0, len(texts), args.batch_size)]
+
+    keras_tokenizer = Tokenizer(num_words=args.vocab_size, oov_token='<OOV>')
+    keras_tokenizer.fit_on_texts(texts)
+    story_tokenizer = StoryTokenizer.from_keras(keras_tokenizer)
+
+    def keras_encode(batch):
+        return pad_sequences(keras_tokenizer.texts_to_sequences(batch), maxlen=args.max_length, padding='post')
+
+    def story_encode(batch):
+        return story_tokenizer.encode_batch(batch, args.max_length)
+
+    sequences = [keras_tokenizer.texts_to_sequences(batch) for batch in batches]
+    assert all(np.array_equal(keras_encode(batch), story_encode(batch)) for batch in batches), "ids differ"
+    assert keras_tokenizer.sequences_to_texts(sequences[0]) == story_tokenizer.decode_batch(sequences[0]), "texts differ"
+
+    rows = [
+        ('encode', throughput(keras_encode, batches), throughput(story_encode, batches)),
+        ('decode', throughput(keras_tokenizer.sequences_to_texts, sequences),
+         throughput(story_tokenizer.decode_batch, sequences)),
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pickle_path = os.path.join(tmp, 'tokenizer.pickle')
+        json_path = os.path.join(tmp, 'tokenizer.json')
+        with open(pickle_path, 'wb') as handle:
+            pickle.dump(keras_tokenizer, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        story_tokenizer.save(json_path)
+        pickle_kb, json_kb = os.path.getsize(pickle_path) / 1024, os.path.getsize(json_path) / 1024
+        keras_load = cold_load(KERAS_LOAD.format(path=pickle_path))
+        story_load = cold_load(STORY_LOAD.format(path=json_path))
+
+    print(f"{len(texts)} texts, batches of {args.batch_size}")
+    print(f"{'':8} {'keras texts/s':>14} {'story texts/s':>14} {'speedup':>8}")
+    for name, keras_rate, story_rate in rows:
+        print(f"{name:8} {keras_rate:>14.0f} {story_rate:>14.0f} {story_rate / keras_rate:>7.1f}x")
+    print(f"cold load: pickle {keras_load * 1000:.0f} ms ({pickle_kb:.0f} KB), "
+          f"json {story_load * 1000:.0f} ms ({json_kb:.0f} KB)")
+
+
+if __name__ == '__main__':
+    main()
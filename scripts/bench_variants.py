@@ -0,0 +1,79 @@
+"""Speed of generating every genre/length variant of a prompt: one shared ranking vs sequential calls.
+
+Builds a synthetic corpus of --stories rows so the TF-IDF retrieval has realistic work to do.
+
+Usage: python scripts/bench_variants.py [--stories 5000] [--repeats 20]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data'))
+
+from model.enhanced_story_generator import EnhancedStoryGenerator
+from synthetic_data_generator import SyntheticDataGenerator
+
+GENRES = ['fantasy', 'sci-fi', 'mystery', 'adventure', 'romance', 'comedy', 'horror']
+LENGTHS = ['short', 'medium', 'long']
+PROMPTS = [
+    "A detective who can speak to ghosts",
+    "A world where dreams become reality",
+    "A librarian who finds a book that writes itself",
+    "A robot who falls in love with a human",
+]
+
+
+def build_corpus(path, num_stories):
+    generator = SyntheticDataGenerator()
+    rows = []
+    for i in range(num_stories):
+        genre = GENRES[i % len(GENRES)]
+        prompt = generator.generate_prompt(genre)
+        story = generator.generate_story(prompt, genre, LENGTHS[i % len(LENGTHS)])
+        rows.append({'id': i, 'genre': genre, 'title': story['title'], 'prompt': prompt,
+                     'content': story['content'], 'length': story['length'], 'rating': 5})
+    pd.DataFrame(rows).to_csv(path, index=False)
+
+
+def time_calls(fn, repeats):
+    start = time.perf_counter()
+    for i in range(repeats):
+        fn(PROMPTS[i % len(PROMPTS)])
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--stories', type=int, default=5000)
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'stories.csv')
+        build_corpus(csv_path, args.stories)
+        generator = EnhancedStoryGenerator(csv_path)
+
+    def sequential(prompt):
+        return [generator.generate_story(prompt, genre, length) for genre in GENRES for length in LENGTHS]
+
+    def shared(prompt):
+        return generator.generate_variants(prompt, GENRES, LENGTHS)
+
+    # Warm up
+    sequential(PROMPTS[0])
+    shared(PROMPTS[0])
+
+    sequential_ms = time_calls(sequential, args.repeats)
+    shared_ms = time_calls(shared, args.repeats)
+    print(f"{len(GENRES) * len(LENGTHS)} variants over {args.stories} stories")
+    print(f"sequential generate_story: {sequential_ms:8.2f} ms per prompt")
+    print(f"generate_variants:         {shared_ms:8.2f} ms per prompt ({sequential_ms / shared_ms:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Per-worker memory of N serving workers holding the story model, for N = 1..8.
+
+Each worker is a fresh process that loads the model and answers one request,
+then stays alive until every worker of the round is up. RSS counts shared pages
+in full for every process; PSS splits them between the processes sharing them,
+so the summed PSS is what the workers really cost. "keras" loads story_model.h5
+privately per worker; "mapped" maps one read-only weights file shared by all.
+
+Usage: python scripts/bench_worker_memory.py [--max-workers 8] [--backends mapped keras]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+WORKERS = {
+    'keras': """
+from model.model import StoryGeneratorModel
+model = StoryGeneratorModel()
+model.load_model({model_path!r}, {tokenizer_path!r})
+""",
+    'mapped': """
+from model.mapped_model import MappedStoryModel
+model = MappedStoryModel({weights_path!r})
+"""
+}
+
+SERVE = """
+import sys
+model.generate_story("A detective who can speak to ghosts", 'mystery', 'short')
+print('ready', flush=True)
+sys.stdin.readline()
+"""
+
+
+def memory_kb(pid, mapping_path):
+    """Rss and Pss of the whole process, and Pss of the pages mapped from `mapping_path`"""
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        rollup = {line.split(':')[0]: int(line.split()[1]) for line in f if line.split(':')[0] in ('Rss', 'Pss')}
+    mapped_pss = 0
+    in_mapping = False
+    with open(f'/proc/{pid}/smaps') as f:
+        for line in f:
+            fields = line.split()
+            if not fields[0].endswith(':'):
+                # A new mapping header: address range, perms, offset, device, inode, path
+                in_mapping = len(fields) >= 6 and fields[-1] == mapping_path
+            elif in_mapping and fields[0] == 'Pss:':
+                mapped_pss += int(fields[1])
+    return rollup['Rss'], rollup['Pss'], mapped_pss
+
+
+def measure(backend, workers, args):
+    code = WORKERS[backend].format(model_path=args.model_path, tokenizer_path=args.tokenizer_path,
+                                   weights_path=args.weights_path) + SERVE
+    env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL='3')
+    processes = [subprocess.Popen([sys.executable, '-c', code], cwd=ROOT, env=env, text=True,
+                                  stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+                 for _ in range(workers)]
+    try:
+        for process in processes:
+            if not any(line.strip() == 'ready' for line in iter(process.stdout.readline, '')):
+                raise RuntimeError(f"{backend} worker exited before loading the model")
+        weights_file = os.path.abspath(args.weights_path if backend == 'mapped' else args.model_path)
+        return [memory_kb(process.pid, weights_file) for process in processes]
+    finally:
+        for process in processes:
+            process.stdin.close()
+            process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model-path', default='model/trained_model/story_model.h5')
+    parser.add_argument('--tokenizer-path', default='model/trained_model/tokenizer.pickle')
+    parser.add_argument('--weights-path', default='model/trained_model/story_model.weights')
+    parser.add_argument('--max-workers', type=int, default=8)
+    parser.add_argument('--backends', nargs='+', choices=sorted(WORKERS), default=['mapped', 'keras'])
+    args = parser.parse_args()
+
+    if 'mapped' in args.backends and not os.path.exists(args.weights_path):
+        from model.mapped_model import export_weights
+        export_weights(args.model_path, args.tokenizer_path, args.weights_path)
+
+    print(f"{'backend':8} {'workers':>7} {'RSS/worker MB':>14} {'PSS/worker MB':>14} "
+          f"{'weights PSS/worker MB':>22} {'total PSS MB':>13}")
+    for backend in args.backends:
+        for workers in range(1, args.max_workers + 1):
+            rows = measure(backend, workers, args)
+            rss, pss, weights_pss = (sum(column) / len(rows) / 1024 for column in zip(*rows))
+            print(f"{backend:8} {workers:>7} {rss:>14.1f} {pss:>14.1f} {weights_pss:>22.2f} {pss * workers:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Compare the Keras story model against its TFLite export.
+
+Reports file size, cold load time and peak RSS (each measured in a fresh
+process), single-request latency, and top-1 token agreement of both heads.
+
+Usage: python scripts/compare_tflite.py [--tflite-path model/trained_model/story_model.tflite] [--samples 200]
+"""
+import argparse
+import itertools
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+PEAK_RSS = """
+def peak_rss_kb():
+    # VmHWM belongs to this process image; ru_maxrss can carry over the parent's peak across exec
+    with open('/proc/self/status') as f:
+        return next(int(line.split()[1]) for line in f if line.startswith('VmHWM'))
+"""
+
+KERAS_LOAD = PEAK_RSS + """
+import time
+start = time.perf_counter()
+from model.model import StoryGeneratorModel
+model = StoryGeneratorModel()
+model.load_model({model_path!r}, {tokenizer_path!r}, compile_inference=False)
+print(time.perf_counter() - start, peak_rss_kb())
+"""
+
+TFLITE_LOAD = PEAK_RSS + """
+import time
+start = time.perf_counter()
+from model.tflite_export import TFLiteStoryModel
+model = TFLiteStoryModel({tflite_path!r})
+print(time.perf_counter() - start, peak_rss_kb())
+"""
+
+
+def cold_load(code):
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    seconds, max_rss_kb = output.stdout.strip().splitlines()[-1].split()
+    return float(seconds), int(max_rss_kb) / 1024
+
+
+def latency(fn, requests):
+    timings = []
+    for request in requests:
+        start = time.perf_counter()
+        fn(*request)
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.percentile(timings, 50), np.percentile(timings, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model-path', default='model/trained_model/story_model.h5')
+    parser.add_argument('--tokenizer-path', default='model/trained_model/tokenizer.pickle')
+    parser.add_argument('--tflite-path', default='model/trained_model/story_model.tflite')
+    parser.add_argument('--data', default='data/training_data.jsonl')
+    parser.add_argument('--samples', type=int, default=200)
+    args = parser.parse_args()
+
+    from data.jsonl_io import iter_records
+    from model.model import StoryGeneratorModel
+    from model.tflite_export import TFLiteStoryModel
+
+    data = list(itertools.islice(iter_records(args.data), args.samples))
+    genres = ['fantasy', 'sci-fi', 'mystery', 'adventure', 'romance', 'comedy', 'horror']
+    lengths = ['short', 'medium', 'long']
+    requests = [(item['prompt'], genres[i % len(genres)], lengths[i % len(lengths)]) for i, item in enumerate(data)]
+
+    keras_model = StoryGeneratorModel()
+    keras_model.load_model(args.model_path, args.tokenizer_path)
+    tflite_model = TFLiteStoryModel(args.tflite_path)
+
+    def keras_predict(prompt, genre, length):
+        title, content = keras_model._infer(
+            keras_model._encode_prompts([prompt]),
+            np.array([[keras_model.genre_mapping[genre]]], dtype=keras_model._input_dtypes[1]),
+            np.array([[keras_model.length_mapping[length]]], dtype=keras_model._input_dtypes[2])
+        )
+        return title.numpy()[0], content.numpy()[0]
+
+    title_agree = content_agree = 0
+    for request in requests:
+        keras_title, keras_content = keras_predict(*request)
+        lite_title, lite_content = tflite_model.predict(*request)
+        title_agree += int(np.argmax(keras_title) == np.argmax(lite_title))
+        content_agree += int(np.argmax(keras_content) == np.argmax(lite_content))
+
+    keras_p50, keras_p99 = latency(keras_model.generate_story, requests)
+    lite_p50, lite_p99 = latency(tflite_model.generate_story, requests)
+
+    keras_load, keras_rss = cold_load(KERAS_LOAD.format(model_path=args.model_path, tokenizer_path=args.tokenizer_path))
+    lite_load, lite_rss = cold_load(TFLITE_LOAD.format(tflite_path=args.tflite_path))
+
+    print(f"{'':<22} {'keras':>10} {'tflite':>10}")
+    print(f"{'file size (KB)':<22} {os.path.getsize(args.model_path) / 1024:>10.0f} {os.path.getsize(args.tflite_path) / 1024:>10.0f}")
+    print(f"{'cold load (s)':<22} {keras_load:>10.2f} {lite_load:>10.2f}")
+    print(f"{'peak RSS (MB)':<22} {keras_rss:>10.0f} {lite_rss:>10.0f}")
+    print(f"{'latency p50 (ms)':<22} {keras_p50:>10.2f} {lite_p50:>10.2f}")
+    print(f"{'latency p99 (ms)':<22} {keras_p99:>10.2f} {lite_p99:>10.2f}")
+    print(f"top-1 agreement over {len(requests)} requests: "
+          f"title {title_agree / len(requests):.1%}, content {content_agree / len(requests):.1%}")
+
+
+if __name__ == '__main__':
+    main()
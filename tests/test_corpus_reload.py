@@ -0,0 +1,42 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.story_store import COLUMNS, StoryStore
+from model.enhanced_story_generator import EnhancedStoryGenerator
+from model.hot_reload import CorpusReloader
+
+
+def write_corpus(path):
+    rows = [
+        (1, 'fantasy', 'The Crystal', 'A young mage discovers a crystal that controls time', 'Elara found it.', 'long', 9.2),
+        (2, 'sci-fi', 'The Last Memory', 'A robot becomes the last keeper of human memories', 'Unit 734 waited.', 'medium', 8.8),
+        (3, 'mystery', 'The Locked Room', 'A detective investigates a murder in a locked room', 'Nobody got out.', 'short', 8.1),
+    ]
+    pd.DataFrame(rows, columns=COLUMNS).to_csv(path, index=False)
+
+
+def top_title(generator, prompt):
+    return generator.stories_df.iloc[generator.rank_stories(prompt)[0]]['title']
+
+
+def test_appended_story_is_ranked_after_reload(tmp_path):
+    csv_path = str(tmp_path / 'stories.csv')
+    write_corpus(csv_path)
+    generator = EnhancedStoryGenerator(csv_path)
+    reloader = CorpusReloader([generator], watch_paths=[csv_path, csv_path + '.wal'])
+    prompt = 'A lighthouse keeper hears whales singing in the fog'
+    assert top_title(generator, prompt) != 'The Fog Bell'
+
+    StoryStore(csv_path).put_story({'genre': 'mystery', 'title': 'The Fog Bell', 'prompt': prompt,
+                                    'content': 'The fog came in at dusk.'})
+    # The running snapshot does not see the append until a reload swaps it
+    assert len(generator.stories_df) == 3
+
+    report = reloader.reload_now('test')
+    assert report['targets'][0]['error'] is None
+    assert len(generator.stories_df) == 4
+    assert top_title(generator, prompt) == 'The Fog Bell'